@@ -0,0 +1,260 @@
+import asyncio
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+# How long to wait before retrying AWS setup after a failure
+RETRY_AFTER_SECONDS = 30
+
+# Default number of concurrent calls per AWS service; override with AWS_MAX_CONCURRENCY_<SERVICE>
+SERVICE_CONCURRENCY = {
+    'dynamodb': 16,
+    'sns': 8,
+    's3': 8,
+}
+DEFAULT_SERVICE_CONCURRENCY = 8
+
+T = TypeVar('T')
+
+
+class AwsBootstrap:
+    """Lazily set up the AWS session and clients, and run blocking boto3 calls off the event loop.
+
+    Nothing touches the network at import time. The session and DynamoDB
+    resource are created on first use or by a background warm-up started
+    after the server is up; the warm-up also verifies the credentials with
+    STS. Each step is timed and the result is reported by status() instead
+    of leaving a None client behind.
+
+    Low-level clients are cached per service and region and shared between
+    threads. DynamoDB resources are not thread-safe, so each worker thread
+    gets its own. Blocking calls go through run(), which uses a bounded
+    thread pool (AWS_MAX_WORKERS) and caps how many calls each service may
+    have in flight at once.
+
+    With a metrics registry, every API call made by clients and resources
+    from the session is timed per service and operation, retries included.
+    """
+
+    def __init__(self, profile_name: str = 'default', metrics: Any = None):
+        self.profile_name = profile_name
+        self.metrics = metrics
+        self.state = 'cold'
+        self.error: Optional[str] = None
+        self.identity: Optional[dict] = None
+        self.timings: dict[str, float] = {}
+        self._session: Optional[boto3.Session] = None
+        self._dynamodb = None
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._clients: dict[tuple[str, Optional[str]], Any] = {}
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self.max_workers = int(os.environ.get('AWS_MAX_WORKERS', 32))
+        self.in_flight: dict[str, int] = {}
+        self.waiting: dict[str, int] = {}
+        self.calls: dict[str, int] = {}
+
+    def _timed(self, name: str, fn):
+        started = time.perf_counter()
+        result = fn()
+        self.timings[name] = round(time.perf_counter() - started, 4)
+        return result
+
+    def _ensure_session(self) -> boto3.Session:
+        """Create the session using credentials from ~/.aws/credentials (blocking)."""
+        if self._session is None:
+            session = self._timed('session_seconds', lambda: boto3.Session(profile_name=self.profile_name))
+            if self.metrics is not None:
+                # Clients copy the session's handlers when created, so register before any exist
+                session.events.register('before-call.*.*', self._before_call)
+                session.events.register('after-call.*.*', self._after_call)
+                session.events.register('after-call-error.*.*', self._after_call_error)
+                self.metrics.describe('aws_calls_total', 'counter', "AWS API calls by service, operation and status.")
+                self.metrics.describe('aws_call_seconds', 'histogram', "Time taken by each AWS API call, retries included.")
+            self._session = session
+        return self._session
+
+    def _before_call(self, event_name: str, context: dict, **kwargs) -> None:
+        _, service, operation = event_name.split('.', 2)
+        context['metrics_call'] = (service, operation, time.perf_counter())
+
+    def _record_call(self, context: dict, status: str) -> None:
+        call = context.pop('metrics_call', None)
+        if call is not None:
+            service, operation, started = call
+            self.metrics.observe('aws_call_seconds', time.perf_counter() - started, service=service, operation=operation)
+            self.metrics.inc('aws_calls_total', service=service, operation=operation, status=status)
+
+    def _after_call(self, http_response, parsed: dict, context: dict, **kwargs) -> None:
+        if http_response.status_code < 300:
+            status = 'ok'
+        else:
+            status = parsed.get('Error', {}).get('Code') or str(http_response.status_code)
+        self._record_call(context, status)
+
+    def _after_call_error(self, exception: Exception, context: dict, **kwargs) -> None:
+        self._record_call(context, type(exception).__name__)
+
+    def _ensure_dynamodb(self):
+        """Create the DynamoDB resource (blocking), or return None if AWS setup failed recently."""
+        with self._lock:
+            if self._dynamodb is not None:
+                return self._dynamodb
+            if self.state == 'error' and time.monotonic() - self._failed_at < RETRY_AFTER_SECONDS:
+                return None
+            try:
+                session = self._ensure_session()
+                # Get the region from ~/.aws/config
+                region = session.region_name or 'us-east-1'
+                self._dynamodb = self._timed(
+                    'dynamodb_resource_seconds', lambda: session.resource('dynamodb', region_name=region)
+                )
+                if self.state != 'ready':
+                    self.state = 'clients_ready'
+                self.error = None
+                return self._dynamodb
+            except Exception as e:
+                logger.error(f"Failed to initialize DynamoDB client: {str(e)}")
+                self._fail(e)
+                return None
+
+    def _fail(self, error: Exception) -> None:
+        self.state = 'error'
+        self.error = str(error)
+        self._failed_at = time.monotonic()
+
+    def _warm_up(self) -> None:
+        """Create clients and verify the credentials with STS (blocking)."""
+        started = time.perf_counter()
+        if self._ensure_dynamodb() is None:
+            return
+        try:
+            sts = self.client('sts')
+            identity = self._timed('sts_identity_seconds', sts.get_caller_identity)
+            self.identity = {'account': identity.get('Account'), 'arn': identity.get('Arn')}
+            self.state = 'ready'
+            self.timings['warmup_seconds'] = round(time.perf_counter() - started, 4)
+            logger.info(
+                f"Successfully connected to AWS using credentials from ~/.aws/credentials "
+                f"in {self.timings['warmup_seconds']:.3f}s"
+            )
+        except Exception as e:
+            logger.error(f"Failed to connect to AWS: {str(e)}")
+            self._fail(e)
+
+    def start_warmup(self) -> None:
+        """Warm up AWS clients in the background; safe to call more than once."""
+        if self._warmup_task is not None and not self._warmup_task.done():
+            return
+        if self.state == 'ready':
+            return
+        if self.state == 'cold':
+            self.state = 'warming'
+        loop = asyncio.get_running_loop()
+        self._warmup_task = asyncio.ensure_future(loop.run_in_executor(self.executor, self._warm_up))
+
+    async def get_dynamodb(self):
+        """Return the DynamoDB resource, creating it off the event loop on first use."""
+        if self._dynamodb is not None:
+            return self._dynamodb
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._ensure_dynamodb)
+
+    def dynamodb(self):
+        """Return this thread's DynamoDB resource (blocking; call from run())."""
+        resource = getattr(self._local, 'dynamodb', None)
+        if resource is None:
+            if self._ensure_dynamodb() is None:
+                raise RuntimeError(f"DynamoDB client not initialized: {self.error}")
+            with self._lock:
+                # Sessions aren't thread-safe either, so resources are created one at a time
+                resource = self._session.resource('dynamodb', region_name=self._session.region_name or 'us-east-1')
+            self._local.dynamodb = resource
+        return resource
+
+    def dynamodb_client(self):
+        """Return the shared low-level DynamoDB client, in the same region as the resource (blocking)."""
+        if self._ensure_dynamodb() is None:
+            raise RuntimeError(f"DynamoDB client not initialized: {self.error}")
+        return self.client('dynamodb', self._session.region_name or 'us-east-1')
+
+    def client(self, service: str, region_name: Optional[str] = None):
+        """Return the shared low-level client for a service and region (blocking on first use)."""
+        key = (service, region_name)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._timed(
+                        f"{service}_client_seconds",
+                        lambda: self._ensure_session().client(service, region_name=region_name),
+                    )
+                    self._clients[key] = client
+        return client
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='aws')
+        return self._executor
+
+    def _semaphore(self, service: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(service)
+        if semaphore is None:
+            default = SERVICE_CONCURRENCY.get(service, DEFAULT_SERVICE_CONCURRENCY)
+            limit = int(os.environ.get(f"AWS_MAX_CONCURRENCY_{service.upper()}", default))
+            semaphore = self._semaphores[service] = asyncio.Semaphore(limit)
+        return semaphore
+
+    async def run(self, service: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run a blocking boto3 call in the AWS thread pool, within the service's concurrency limit."""
+        semaphore = self._semaphore(service)
+        self.waiting[service] = self.waiting.get(service, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting[service] -= 1
+        self.in_flight[service] = self.in_flight.get(service, 0) + 1
+        self.calls[service] = self.calls.get(service, 0) + 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.in_flight[service] -= 1
+            semaphore.release()
+
+    def shutdown(self) -> None:
+        """Stop the AWS thread pool once the calls in flight finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @property
+    def session(self) -> Optional[boto3.Session]:
+        return self._session
+
+    def status(self) -> dict[str, Any]:
+        """Report readiness, the last error and how long each setup step took."""
+        return {
+            'state': self.state,
+            'ready': self.state == 'ready',
+            'dynamodb_available': self._dynamodb is not None,
+            'error': self.error,
+            'identity': self.identity,
+            'timings': dict(self.timings),
+            'clients': sorted(f"{service}:{region or 'default'}" for service, region in self._clients),
+            'calls': dict(self.calls),
+            'in_flight': dict(self.in_flight),
+            'waiting': dict(self.waiting),
+        }
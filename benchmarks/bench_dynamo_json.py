@@ -0,0 +1,139 @@
+"""Micro-benchmark for serializing DynamoDB items to JSON.
+
+Compares the old two-pass path (convert_decimals copy + json.dumps with
+indent) against dynamo_json's single-pass encoder, in indented and compact
+form, and the raw attribute-value path against TypeDeserializer. Items are
+shaped like the ones the MCP tools return: a user's list of Strava
+activities and a weekly meal plan with per-meal nutrients.
+
+Run from the repository root:
+    python benchmarks/bench_dynamo_json.py
+"""
+import json
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dynamo_json
+
+
+def convert_decimals(obj):
+    """The previous conversion: copy the whole structure with Decimals turned into floats."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    elif isinstance(obj, dict):
+        return {k: convert_decimals(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_decimals(i) for i in obj]
+    return obj
+
+
+def activity_list_item(count=300):
+    """A user document holding a list of Strava activities."""
+    rng = random.Random(1)
+    return {
+        'userId': 'test-user-123',
+        'activities': [
+            {
+                'activityId': Decimal(10003455924 + i),
+                'name': rng.choice(['Evening Run', 'Afternoon Walk', 'Night Run']),
+                'type': rng.choice(['Run', 'Walk']),
+                'elapsedTime': Decimal(rng.randint(600, 9000)),
+                'movingTime': Decimal(rng.randint(600, 9000)),
+                'distance': Decimal(str(round(rng.uniform(1000, 40000), 1))),
+                'averageSpeed': Decimal(str(round(rng.uniform(1, 5), 3))),
+                'maxSpeed': Decimal(str(round(rng.uniform(3, 30), 3))),
+                'averageHeartrate': Decimal(str(round(rng.uniform(90, 180), 1))),
+                'maxHeartrate': Decimal(rng.randint(120, 200)),
+                'totalElevationGain': Decimal(str(round(rng.uniform(0, 400), 1))),
+                'calories': Decimal(rng.randint(100, 1200)),
+                'startDate': '2024-08-01T04:49:26Z',
+                'updatedAt': '2025-05-01T20:00:03.482876',
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def meal_plan_item(days=7):
+    """A weekly meal plan with per-meal nutrient breakdowns."""
+    rng = random.Random(2)
+    nutrients = ['Calories', 'Protein', 'Fat', 'Carbohydrates', 'Fiber', 'Sugar', 'Sodium',
+                 'Vitamin A', 'Vitamin C', 'Calcium', 'Iron', 'Potassium']
+    return {
+        'userId': 'test-user-123',
+        'week': '2025-05-05',
+        'days': [
+            {
+                'day': Decimal(day),
+                'meals': [
+                    {
+                        'type': meal,
+                        'id': Decimal(rng.randint(100000, 999999)),
+                        'title': f"Recipe {day}-{meal}",
+                        'readyInMinutes': Decimal(rng.randint(10, 60)),
+                        'image': f"https://img.spoonacular.com/recipes/{rng.randint(1, 10**6)}-312x231.jpg",
+                        'nutrition': {
+                            'nutrients': [
+                                {
+                                    'name': name,
+                                    'amount': Decimal(str(round(rng.uniform(0, 800), 2))),
+                                    'unit': 'g',
+                                    'percentOfDailyNeeds': Decimal(str(round(rng.uniform(0, 100), 2))),
+                                }
+                                for name in nutrients
+                            ],
+                        },
+                        'ingredients': [
+                            {'name': f"ingredient {i}", 'amount': Decimal(str(round(rng.uniform(0, 5), 2))), 'unit': 'cup'}
+                            for i in range(10)
+                        ],
+                    }
+                    for meal in ['breakfast', 'lunch', 'dinner']
+                ],
+            }
+            for day in range(days)
+        ],
+    }
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"  {label:<42} {seconds * 1e3:8.3f} ms")
+    return seconds
+
+
+def main():
+    serializer = TypeSerializer()
+    deserializer = TypeDeserializer()
+    for name, item in [('activity list (300 activities)', activity_list_item()), ('weekly meal plan', meal_plan_item())]:
+        raw = {k: serializer.serialize(v) for k, v in item.items()}
+        size = len(json.dumps(convert_decimals(item)))
+        print(f"{name}: {size / 1024:.1f} KB of JSON")
+        # The default output is unchanged; compact output encodes the same values
+        assert dynamo_json.dumps(item) == json.dumps(convert_decimals(item), indent=2)
+        assert dynamo_json.dumps_raw_item(raw) == json.dumps(convert_decimals(item), indent=2)
+        assert json.loads(dynamo_json.dumps(item, compact=True)) == convert_decimals(item)
+        assert json.loads(dynamo_json.dumps_raw_item(raw, compact=True)) == convert_decimals(item)
+
+        baseline = bench('convert_decimals + json.dumps(indent=2)', lambda: json.dumps(convert_decimals(item), indent=2), 20)
+        single = bench('dynamo_json.dumps', lambda: dynamo_json.dumps(item), 20)
+        compact = bench('dynamo_json.dumps(compact=True)', lambda: dynamo_json.dumps(item, compact=True), 20)
+        raw_baseline = bench(
+            'TypeDeserializer + convert_decimals + dumps',
+            lambda: json.dumps(convert_decimals({k: deserializer.deserialize(v) for k, v in raw.items()}), indent=2),
+            20,
+        )
+        raw_compact = bench('dynamo_json.dumps_raw_item(compact=True)', lambda: dynamo_json.dumps_raw_item(raw, compact=True), 20)
+        print(f"  speedup: {baseline / single:.1f}x single pass, {baseline / compact:.1f}x compact, "
+              f"{raw_baseline / raw_compact:.1f}x raw compact")
+
+
+if __name__ == "__main__":
+    main()
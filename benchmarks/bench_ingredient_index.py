@@ -0,0 +1,121 @@
+"""Latency benchmark for "what can I cook" searches.
+
+Builds an ingredient index over a synthetic corpus of recipes shaped like
+complexSearch results and times pantry-list searches in both ranking modes,
+with and without ignorePantry, against a linear scan over the same
+recipes. With SPOONACULAR_API_KEY set, the same searches are also sent to
+findByIngredients (each call costs quota points) so the local path can be
+compared with the API round trip.
+
+Run from the repository root:
+    python benchmarks/bench_ingredient_index.py [--recipes 5000] [--api-calls 3]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingredient_index import PANTRY_ITEMS, IngredientIndex, ingredient_key
+
+SPOONACULAR_API_BASE = 'https://api.spoonacular.com'
+
+INGREDIENTS = [
+    'chicken breast', 'ground beef', 'salmon', 'egg', 'milk', 'butter', 'cheddar cheese', 'parmesan cheese',
+    'tomato', 'onion', 'garlic', 'carrot', 'potato', 'spinach', 'bell pepper', 'zucchini', 'mushroom',
+    'apple', 'banana', 'lemon', 'rice', 'pasta', 'bread', 'olive oil', 'soy sauce', 'honey', 'yogurt',
+    'cream', 'basil', 'parsley', 'cumin', 'paprika', 'cinnamon', 'oat', 'black bean', 'chickpea',
+    'salt', 'black pepper', 'flour', 'sugar', 'water',
+]
+
+PANTRY_LISTS = [
+    'chicken, rice, onions, garlic',
+    'eggs, milk, flour, sugar, butter',
+    'apples, cinnamon, oats',
+    'tomatoes, pasta, basil, parmesan',
+    'salmon, lemon, spinach',
+]
+
+
+def corpus(count):
+    rng = random.Random(4)
+    recipes = []
+    for i in range(count):
+        names = rng.sample(INGREDIENTS, rng.randint(5, 14))
+        recipes.append({
+            'id': 100000 + i,
+            'title': f"Recipe {i}",
+            'image': f"https://img.spoonacular.com/recipes/{100000 + i}-312x231.jpg",
+            'imageType': 'jpg',
+            'extendedIngredients': [{'id': INGREDIENTS.index(n), 'name': n, 'original': f"1 cup {n}"} for n in names],
+        })
+    return recipes
+
+
+def linear_scan(recipes, params):
+    """The search without an index: normalize and score every recipe's ingredients."""
+    terms = [ingredient_key(t) for t in params['ingredients'].split(',') if ingredient_key(t)]
+    ignore_pantry = params.get('ignorePantry', False)
+    scored = []
+    for row, recipe in enumerate(recipes):
+        keys = [ingredient_key(e['name']) for e in recipe['extendedIngredients']]
+        used = [k for k in keys if any(f" {t} " in f" {k} " for t in terms)]
+        if not used:
+            continue
+        missed = [k for k in keys if k not in used and not (ignore_pantry and k in PANTRY_ITEMS)]
+        key = (-len(used), len(missed), row) if params.get('ranking', 1) == 1 else (len(missed), -len(used), row)
+        scored.append((key, recipe['id']))
+    scored.sort()
+    return [recipe_id for _, recipe_id in scored[:params.get('number', 10)]]
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=5000, help="Number of recipes in the synthetic corpus")
+    parser.add_argument('--api-calls', type=int, default=3, help="findByIngredients calls per search when an API key is set")
+    args = parser.parse_args()
+
+    recipes = corpus(args.recipes)
+    index = IngredientIndex()
+    started = time.perf_counter()
+    index.add_recipes('complexSearch', {'results': recipes})
+    index.search({'ingredients': 'salt'})
+    print(f"Indexed {args.recipes} recipes in {(time.perf_counter() - started) * 1e3:.0f} ms")
+
+    api_key = os.environ.get('SPOONACULAR_API_KEY')
+    client = httpx.Client(base_url=SPOONACULAR_API_BASE, timeout=30.0) if api_key else None
+    for ingredients in PANTRY_LISTS:
+        print(f"{ingredients}:")
+        for ranking, ignore_pantry in [(1, False), (2, False), (1, True)]:
+            params = {'ingredients': ingredients, 'number': 10, 'ranking': ranking, 'ignorePantry': ignore_pantry}
+            assert [r['id'] for r in index.search(params)] == linear_scan(recipes, params)
+            indexed = time_call(lambda: index.search(params), 200)
+            scan = time_call(lambda: linear_scan(recipes, params), 5)
+            label = f"ranking={ranking} ignorePantry={str(ignore_pantry).lower()}"
+            line = f"  {label:<30} index {indexed * 1e6:8.1f} us   linear scan {scan * 1e3:7.2f} ms"
+            if client and ranking == 1 and not ignore_pantry:
+                api = time_call(lambda: client.get('/recipes/findByIngredients', params={**params, 'apiKey': api_key}), args.api_calls)
+                line += f"   API {api * 1e3:7.1f} ms"
+            print(line)
+    if client:
+        client.close()
+    else:
+        print("Set SPOONACULAR_API_KEY to also time the findByIngredients round trip.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Throughput benchmark for S3 uploads against a local S3 stand-in.
+
+Starts moto's S3 server on localhost and compares boto3's default
+upload_file with the resumable multipart path in s3_uploads at a few part
+sizes and concurrency levels. Requires moto[server].
+
+Run from the repository root:
+    python benchmarks/bench_s3_upload.py [--size-mb 256]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moto.server import ThreadedMotoServer
+
+import s3_uploads
+from aws_clients import AwsBootstrap
+
+BUCKET = 'bench-uploads'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=128, help="Size of the test file in MB")
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    server = ThreadedMotoServer(port=args.port, verbose=False)
+    server.start()
+    state_dir = tempfile.mkdtemp()
+    credentials = tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False)
+    credentials.write("[default]\naws_access_key_id = bench\naws_secret_access_key = bench\nregion = us-east-1\n")
+    credentials.close()
+    os.environ['AWS_SHARED_CREDENTIALS_FILE'] = credentials.name
+    os.environ['AWS_CONFIG_FILE'] = credentials.name
+    os.environ['AWS_ENDPOINT_URL'] = f"http://127.0.0.1:{args.port}"
+
+    with tempfile.NamedTemporaryFile(suffix='.bin', delete=False) as f:
+        for _ in range(args.size_mb):
+            f.write(os.urandom(s3_uploads.MB))
+        file_path = f.name
+
+    try:
+        aws = AwsBootstrap()
+        s3 = aws.client('s3')
+        s3.create_bucket(Bucket=BUCKET)
+        print(f"Uploading {args.size_mb} MB to a local S3 stand-in at {os.environ['AWS_ENDPOINT_URL']}")
+
+        started = time.perf_counter()
+        s3.upload_file(file_path, BUCKET, 'default.bin')
+        elapsed = time.perf_counter() - started
+        print(f"  {'upload_file (boto3 defaults)':<36} {args.size_mb / elapsed:8.1f} MB/s")
+
+        async def run_multipart():
+            for part_mb, concurrency in [(8, 1), (8, 4), (8, 8), (16, 8), (64, 8)]:
+                result = await s3_uploads.upload_large_file(
+                    aws, file_path, BUCKET, f"multipart-{part_mb}-{concurrency}.bin",
+                    part_size=part_mb * s3_uploads.MB, concurrency=concurrency, state_dir=state_dir,
+                )
+                label = f"multipart {part_mb} MB parts x {concurrency}"
+                print(f"  {label:<36} {result['throughput_mb_s']:8.1f} MB/s")
+
+        asyncio.run(run_multipart())
+        aws.shutdown()
+    finally:
+        os.remove(file_path)
+        os.remove(credentials.name)
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+"""Throughput and latency benchmark for every MCP tool, against local stand-ins for every upstream.
+
+Starts a fake Spoonacular/Instacart server with configurable latency and
+recipe payload size, and moto's server for DynamoDB, S3 and SNS, points
+the server at them, and calls each tool through an MCP client session at
+several concurrency levels. For every tool and level it reports calls per
+second and p50/p95/p99 latency, and saves the results as JSON. Pass an
+earlier results file with --compare to flag tools whose p95 latency grew,
+or whose throughput fell, by more than --threshold percent. Nothing leaves
+the machine and no keys are needed. Requires moto[server].
+
+Run from the repository root:
+    python benchmarks/bench_tools.py [--concurrency 1,8,32] [--calls 50] [--latency-ms 50]
+        [--payload-kb 1] [--tools search_recipes,get_dynamodb_item] [--compare OLD.json]
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import uvicorn
+from moto.server import ThreadedMotoServer
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from page_server import EmbeddedServer
+
+TABLE = 'bench-identity'
+BUCKET = 'bench-uploads'
+ITEMS = 500
+INGREDIENTS = ['chicken', 'rice', 'onion', 'garlic', 'egg', 'milk', 'flour', 'tomato', 'pasta', 'basil', 'salmon', 'lemon']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def fake_recipe(recipe_id, payload_bytes, nutrition):
+    rng = random.Random(recipe_id)
+    recipe = {
+        'id': recipe_id,
+        'title': f"Recipe {recipe_id}",
+        'image': f"https://img.spoonacular.com/recipes/{recipe_id}-312x231.jpg",
+        'imageType': 'jpg',
+        'readyInMinutes': rng.randint(10, 90),
+        'servings': rng.randint(1, 6),
+        'diets': rng.sample(['vegetarian', 'gluten free', 'dairy free', 'ketogenic'], 2),
+        'extendedIngredients': [{'id': i, 'name': name, 'original': f"1 cup {name}"}
+                                for i, name in enumerate(rng.sample(INGREDIENTS, 5))],
+        'summary': 'x' * payload_bytes,
+    }
+    if nutrition:
+        recipe['nutrition'] = {'nutrients': [
+            {'name': 'Calories', 'amount': rng.randint(200, 900), 'unit': 'kcal'},
+            {'name': 'Protein', 'amount': rng.randint(5, 60), 'unit': 'g'},
+            {'name': 'Fat', 'amount': rng.randint(5, 50), 'unit': 'g'},
+            {'name': 'Carbohydrates', 'amount': rng.randint(10, 120), 'unit': 'g'},
+        ]}
+    return recipe
+
+
+def recipe_ids(params, offset, number):
+    """Stable recipe IDs for a search, so repeated searches and their pages agree."""
+    seed = int(hashlib.sha1(json.dumps(sorted(params.items())).encode()).hexdigest()[:8], 16)
+    return [100000 + (seed + i * 7919) % 900000 for i in range(offset, offset + number)]
+
+
+def upstream_app(latency, jitter, payload_bytes, total_results):
+    """A stand-in for the Spoonacular recipe endpoints and Instacart's recipe page API."""
+
+    async def wait():
+        await asyncio.sleep(max(0.0, random.gauss(latency, jitter)))
+
+    def reply(data, points):
+        return JSONResponse(data, headers={
+            'X-API-Quota-Request': str(points), 'X-API-Quota-Used': '0', 'X-API-Quota-Left': '1000000000',
+        })
+
+    async def complex_search(request: Request):
+        await wait()
+        params = {k: v for k, v in request.query_params.items() if k not in ('apiKey', 'offset', 'number')}
+        offset = int(request.query_params.get('offset', 0))
+        number = max(0, min(int(request.query_params.get('number', 10)), total_results - offset))
+        nutrition = request.query_params.get('addRecipeNutrition', '').lower() == 'true'
+        results = [fake_recipe(i, payload_bytes, nutrition) for i in recipe_ids(params, offset, number)]
+        return reply({'results': results, 'offset': offset, 'number': number, 'totalResults': total_results}, 1 + number / 100)
+
+    async def find_by_nutrients(request: Request):
+        await wait()
+        params = {k: v for k, v in request.query_params.items() if k != 'apiKey'}
+        results = []
+        for recipe_id in recipe_ids(params, 0, int(request.query_params.get('number', 10))):
+            recipe = fake_recipe(recipe_id, payload_bytes, True)
+            amounts = {n['name']: n['amount'] for n in recipe['nutrition']['nutrients']}
+            results.append({
+                'id': recipe_id, 'title': recipe['title'], 'image': recipe['image'], 'imageType': 'jpg',
+                'calories': amounts['Calories'], 'protein': f"{amounts['Protein']}g",
+                'fat': f"{amounts['Fat']}g", 'carbs': f"{amounts['Carbohydrates']}g",
+            })
+        return reply(results, 1)
+
+    async def find_by_ingredients(request: Request):
+        await wait()
+        wanted = {i.strip() for i in request.query_params.get('ingredients', '').split(',')}
+        params = {k: v for k, v in request.query_params.items() if k != 'apiKey'}
+        results = []
+        for recipe_id in recipe_ids(params, 0, int(request.query_params.get('number', 10))):
+            recipe = fake_recipe(recipe_id, payload_bytes, False)
+            used = [e for e in recipe['extendedIngredients'] if e['name'] in wanted]
+            missed = [e for e in recipe['extendedIngredients'] if e['name'] not in wanted]
+            results.append({
+                'id': recipe_id, 'title': recipe['title'], 'image': recipe['image'], 'imageType': 'jpg',
+                'usedIngredientCount': len(used), 'missedIngredientCount': len(missed),
+                'usedIngredients': used, 'missedIngredients': missed, 'unusedIngredients': [], 'likes': 0,
+            })
+        return reply(results, 1)
+
+    async def instacart_recipe(request: Request):
+        await request.body()
+        await wait()
+        return JSONResponse({'products_link_url': f"https://instacart.example/store/recipes/{random.randint(1, 10**9)}"})
+
+    return Starlette(routes=[
+        Route('/recipes/complexSearch', complex_search),
+        Route('/recipes/findByNutrients', find_by_nutrients),
+        Route('/recipes/findByIngredients', find_by_ingredients),
+        Route('/products/recipe', instacart_recipe, methods=['POST']),
+    ])
+
+
+def start_upstream(args):
+    port = free_port()
+    app = upstream_app(args.latency_ms / 1000, args.jitter_ms / 1000, int(args.payload_kb * 1024), args.total_results)
+    server = EmbeddedServer(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', access_log=False))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def configure(args, workdir, upstream_url, aws_url):
+    """Point the server at the stand-ins and keep its caches and state out of the repository.
+
+    Quota and SMS pacing are opened up so they don't become the thing being measured.
+    """
+    credentials = os.path.join(workdir, 'aws.ini')
+    with open(credentials, 'w') as f:
+        f.write("[default]\naws_access_key_id = bench\naws_secret_access_key = bench\nregion = us-east-1\n")
+    os.environ.update({
+        'SPOONACULAR_API_BASE': upstream_url,
+        'INSTACART_API_BASE': upstream_url,
+        'SPOONACULAR_API_KEY': 'bench',
+        'INSTACART_API_CREDENTIALS': 'bench',
+        'SPOONACULAR_CACHE_PATH': os.path.join(workdir, 'spoonacular_cache.sqlite3'),
+        'SPOONACULAR_POINTS_PER_SECOND': '1000000',
+        'SPOONACULAR_POINTS_BURST': '1000000',
+        'SPOONACULAR_DAILY_QUOTA': '1000000000',
+        'SPOONACULAR_MAX_QUEUE': '100000',
+        'SNS_SMS_TPS': '1000000',
+        'TEMPLATE_CACHE_DIR': os.path.join(workdir, 'jinja_cache'),
+        'S3_UPLOAD_STATE_DIR': os.path.join(workdir, 's3_uploads'),
+        'AWS_SHARED_CREDENTIALS_FILE': credentials,
+        'AWS_CONFIG_FILE': credentials,
+        'AWS_ENDPOINT_URL': aws_url,
+        'HTTP2': '0',
+    })
+
+
+def seed_aws(aws, workdir):
+    """Create the table, bucket and files the AWS tools are called with."""
+    dynamodb = aws.client('dynamodb')
+    dynamodb.create_table(
+        TableName=TABLE,
+        KeySchema=[{'AttributeName': 'userId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'userId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    table = aws.dynamodb().Table(TABLE)
+    with table.batch_writer() as batch:
+        for i in range(ITEMS):
+            batch.put_item(Item={
+                'userId': f"user{i}", 'targetCalories': 2000 + i, 'targetProtein': 150,
+                'meals': [{'name': f"Meal {m}", 'calories': 500 + m} for m in range(10)],
+            })
+    aws.client('s3').create_bucket(Bucket=BUCKET)
+
+    # One file per concurrent upload: moto's server can fail concurrent writes to the same key
+    uploads = []
+    for i in range(64):
+        uploads.append(os.path.join(workdir, f"upload{i}.bin"))
+        with open(uploads[-1], 'wb') as f:
+            f.write(os.urandom(256 * 1024))
+    sync_dir = os.path.join(workdir, 'sync')
+    os.makedirs(sync_dir)
+    for i in range(20):
+        with open(os.path.join(sync_dir, f"clip{i}.bin"), 'wb') as f:
+            f.write(os.urandom(16 * 1024))
+    return uploads, sync_dir
+
+
+def meal_plan(options=8):
+    """Weekly meal planner page data, as the planner templates expect it."""
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    rng = random.Random(7)
+    meals = {
+        meal_type: [{
+            'id': f"{meal_type}-{i}", 'name': f"{meal_type.title()} {i}", 'description': f"A {meal_type} option",
+            'image': f"https://img.spoonacular.com/recipes/{i}-312x231.jpg", 'calories': rng.randint(200, 800),
+            'protein': rng.randint(5, 50), 'carbs': rng.randint(10, 90), 'fat': rng.randint(5, 40),
+            'vitaminC': rng.randint(0, 40), 'iron': rng.randint(0, 8), 'calcium': rng.randint(0, 300),
+        } for i in range(options)]
+        for meal_type in ('breakfast', 'lunch', 'dinner', 'snack')
+    }
+    labels = {'protein': 'Protein', 'carbs': 'Carbs', 'fat': 'Fat'}
+    return {
+        'title': 'Bench plan',
+        'days': days,
+        'meals': meals,
+        'selected_meals': {day.lower(): {t: rng.choice(o) for t, o in meals.items()} for day in days},
+        'nutrition_labels': {**labels, 'total_calories': 'Total Calories'},
+        'macro_labels': labels,
+        'micronutrient_labels': {'vitamin_c': 'Vitamin C', 'iron': 'Iron', 'calcium': 'Calcium'},
+        'chart_titles': {'macro_distribution': 'Macros', 'daily_rda': 'Daily values'},
+        'daily_rda': {'vitamin_c': 90, 'iron': 18, 'calcium': 1000},
+    }
+
+
+def scenarios(uploads, sync_dir):
+    """(name, tool, arguments for call i) for every tool; names differ when a tool is run more than one way."""
+    plan = meal_plan()
+    return [
+        ('validate_age', 'validate_age', lambda i: {'age': 20 + i % 60}),
+        ('validate_weight', 'validate_weight', lambda i: {'weight_kg': 50 + i % 80}),
+        ('validate_height_and_calculate_bmi', 'validate_height_and_calculate_bmi',
+         lambda i: {'age': 30, 'weight_kg': 70, 'height_cm': 150 + i % 50}),
+        ('search_recipes', 'search_recipes', lambda i: {'params': {'query': f"bench {i}", 'number': 10}}),
+        ('search_recipes[cached]', 'search_recipes', lambda i: {'params': {'query': 'pasta', 'number': 10}}),
+        ('search_recipes[compact,fields]', 'search_recipes', lambda i: {
+            'params': {'query': f"fields {i}", 'number': 10, 'addRecipeNutrition': True},
+            'fields': ['id', 'title', 'nutrition.nutrients'], 'compact': True}),
+        ('search_recipes[max_results=300]', 'search_recipes', lambda i: {
+            'params': {'query': f"paged {i}"}, 'max_results': 300, 'compact': True}),
+        ('search_recipes_by_nutrients', 'search_recipes_by_nutrients', lambda i: {
+            'params': {'minProtein': 5 + i % 40, 'maxCalories': 900, 'number': 10}}),
+        ('search_recipes_by_ingredients', 'search_recipes_by_ingredients', lambda i: {
+            'params': {'ingredients': ','.join(INGREDIENTS[i % 10:i % 10 + 3]), 'number': 5}}),
+        ('optimize_meal_plan', 'optimize_meal_plan', lambda i: {
+            'targets': {'calories': 2000, 'protein': 150, 'carbs': 200, 'fat': 65},
+            'search': {'query': f"plan {i % 20}", 'number': 40}}),
+        ('serve_html_page', 'serve_html_page', lambda i: {'data': {**plan, 'subtitle': f"Run {i}"}}),
+        ('serve_html_page[lazy]', 'serve_html_page', lambda i: {'data': {**plan, 'subtitle': f"Run {i}"}, 'lazy': True}),
+        ('place_grocery_order', 'place_grocery_order', lambda i: {
+            'items': [{'name': name, 'quantity': 1 + i % 3, 'unit': 'each'} for name in INGREDIENTS[:5]]}),
+        ('get_dynamodb_item', 'get_dynamodb_item', lambda i: {
+            'table_name': TABLE, 'key': {'userId': f"user{i % ITEMS}"}}),
+        ('batch_get_dynamodb_items', 'batch_get_dynamodb_items', lambda i: {
+            'requests': [{'table_name': TABLE, 'key': {'userId': f"user{(i * 50 + k) % ITEMS}"}} for k in range(50)],
+            'compact': True}),
+        ('send_sms_message', 'send_sms_message', lambda i: {
+            'phone_number': f"+1206555{i % 10000:04d}", 'message': f"Bench message {i}"}),
+        ('send_bulk_sms_messages', 'send_bulk_sms_messages', lambda i: {
+            'phone_numbers': [f"+1206556{(i * 20 + k) % 10000:04d}" for k in range(20)], 'message': "Bench"}),
+        ('upload_to_s3', 'upload_to_s3', lambda i: {'file_path': uploads[i % len(uploads)], 'bucket_name': BUCKET}),
+        ('sync_directory_to_s3', 'sync_directory_to_s3', lambda i: {'directory': sync_dir, 'bucket_name': BUCKET}),
+        ('get_recipe_cache_stats', 'get_recipe_cache_stats', lambda i: {}),
+        ('get_request_coalescing_stats', 'get_request_coalescing_stats', lambda i: {}),
+        ('get_spoonacular_quota_status', 'get_spoonacular_quota_status', lambda i: {}),
+        ('get_server_health', 'get_server_health', lambda i: {}),
+    ]
+
+
+def failed(result):
+    if result.isError:
+        return True
+    text = result.content[0].text if result.content and result.content[0].type == 'text' else ''
+    return text.startswith('Error')
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of sorted samples."""
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+async def measure(session, tool, arguments, calls, concurrency, counter):
+    """Make calls tool calls, concurrency at a time; return throughput and latency percentiles."""
+    latencies, errors, first_error = [], 0, None
+    queue = iter(range(calls))
+
+    async def worker():
+        nonlocal errors, first_error
+        for _ in queue:
+            i = next(counter)
+            started = time.perf_counter()
+            result = await session.call_tool(tool, arguments(i))
+            latencies.append(time.perf_counter() - started)
+            if failed(result):
+                errors += 1
+                first_error = first_error or result.content[0].text[:200]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'calls': calls,
+        'errors': errors,
+        'first_error': first_error,
+        'seconds': round(elapsed, 4),
+        'calls_per_second': round(calls / elapsed, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1e3, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1e3, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1e3, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1e3, 3),
+        'max_ms': round(latencies[-1] * 1e3, 3),
+    }
+
+
+async def run_benchmarks(args, selected):
+    import weather
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    # Pages are served on a free port and not opened in a browser
+    weather.page_server.ephemeral = True
+    weather.webbrowser.open = lambda url: False
+
+    results = {}
+    async with create_connected_server_and_client_session(weather.mcp._mcp_server) as session:
+        for name, tool, arguments in selected:
+            counter = itertools.count()
+            for _ in range(args.warmup):
+                await session.call_tool(tool, arguments(next(counter)))
+            results[name] = []
+            for concurrency in args.concurrency:
+                row = await measure(session, tool, arguments, args.calls, concurrency, counter)
+                results[name].append(row)
+                errors = f"  {row['errors']} errors: {row['first_error']}" if row['errors'] else ''
+                print(f"  {name:<34} c={concurrency:<4} {row['calls_per_second']:9.1f}/s   "
+                      f"p50 {row['p50_ms']:8.2f}   p95 {row['p95_ms']:8.2f}   p99 {row['p99_ms']:8.2f} ms{errors}")
+    return results
+
+
+def compare(baseline, results, threshold):
+    """Print how each tool moved against an earlier run; return the number of regressions."""
+    regressions = 0
+    print(f"\nAgainst {baseline['started_at']} ({baseline.get('commit') or 'unknown commit'}):")
+    for name, rows in results.items():
+        before = {row['concurrency']: row for row in baseline['results'].get(name, [])}
+        for row in rows:
+            old = before.get(row['concurrency'])
+            if not old:
+                continue
+            p95 = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0.0
+            rate = (row['calls_per_second'] - old['calls_per_second']) / old['calls_per_second'] * 100
+            flag = p95 > threshold or rate < -threshold
+            regressions += flag
+            print(f"  {name:<34} c={row['concurrency']:<4} p95 {p95:+7.1f}%   throughput {rate:+7.1f}%"
+                  f"{'   REGRESSION' if flag else ''}")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='1,8,32', help="Comma-separated concurrency levels")
+    parser.add_argument('--calls', type=int, default=50, help="Calls per tool at each concurrency level")
+    parser.add_argument('--warmup', type=int, default=2, help="Unmeasured calls per tool before measuring")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="Mean latency of the fake HTTP APIs")
+    parser.add_argument('--jitter-ms', type=float, default=5.0, help="Standard deviation of that latency")
+    parser.add_argument('--payload-kb', type=float, default=1.0, help="Extra bytes per fake recipe, in KB")
+    parser.add_argument('--total-results', type=int, default=1000, help="totalResults of every fake complexSearch")
+    parser.add_argument('--tools', help="Comma-separated tool or scenario names to run (default: all)")
+    parser.add_argument('--output', help="Where to save the JSON results (default: benchmarks/results/)")
+    parser.add_argument('--compare', help="Earlier results file to check for regressions against")
+    parser.add_argument('--threshold', type=float, default=20.0, help="Percent change counted as a regression")
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='bench-tools-')
+    aws_port = free_port()
+    aws_server = ThreadedMotoServer(port=aws_port, verbose=False)
+    aws_server.start()
+    upstream, upstream_url = start_upstream(args)
+    configure(args, workdir, upstream_url, f"http://127.0.0.1:{aws_port}")
+
+    # Imported only now, since it reads the settings above at import time
+    import weather
+    # Keep per-request logging from the server and the stand-ins out of the report
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    uploads, sync_dir = seed_aws(weather.aws, workdir)
+    selected = scenarios(uploads, sync_dir)
+    if args.tools:
+        wanted = set(args.tools.split(','))
+        selected = [s for s in selected if s[0] in wanted or s[1] in wanted]
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    print(f"Fake APIs at {upstream_url} ({args.latency_ms:g} ms, {args.payload_kb:g} KB per recipe), "
+          f"AWS stand-in at {os.environ['AWS_ENDPOINT_URL']}")
+    try:
+        results = asyncio.run(run_benchmarks(args, selected))
+    finally:
+        upstream.should_exit = True
+        aws_server.stop()
+
+    report = {
+        'started_at': started_at,
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"bench_tools-{started_at.replace(':', '').replace('+0000', 'Z')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"{regressions} regressions over {args.threshold:g}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Load generator that replays recorded MCP tool-call sessions against a running server.
+
+Record traces by starting the server with MCP_TRACE_PATH=traces.jsonl and
+using it normally; every tool call is appended with its session, arguments
+and timing. This script then acts as many MCP clients at once: each
+virtual session connects over SSE, initializes, and makes a recorded
+session's calls in order, waiting the recorded think-time (scaled by
+--think-scale) between steps and making calls that originally overlapped
+at the same time. Sessions start at --rate per second, at most
+--concurrency at a time, cycling through the recorded ones until
+--sessions have run.
+
+It reports end-to-end session latency (think-time included), the time
+spent waiting on the server, connection setup, and per-tool latency and
+errors, and can save them as JSON.
+
+benchmarks/traces/meal_planning.jsonl is a hand-written example of the
+flow in prompts.txt: a DynamoDB lookup, several recipe searches, a meal
+plan and a page render, with think-times between them.
+
+Tools with side effects outside the server (SMS, Instacart orders, S3
+uploads) are skipped unless --allow-side-effects is given; point the
+server at local stand-ins (see bench_tools.py) before allowing them.
+
+Run from the repository root, with the server running over SSE:
+    python benchmarks/replay_sessions.py TRACE.jsonl [--url http://localhost:8000/sse]
+        [--sessions 100] [--concurrency 20] [--rate 5] [--think-scale 0.1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_traces import load_sessions, session_steps
+
+# Tools that send messages, place orders or write to S3 when called
+SIDE_EFFECT_TOOLS = {
+    'send_sms_message', 'send_bulk_sms_messages', 'place_grocery_order', 'upload_to_s3', 'sync_directory_to_s3',
+}
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of sorted samples."""
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+def summarize(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1e3, 2),
+        'p50_ms': round(percentile(ordered, 50) * 1e3, 2),
+        'p95_ms': round(percentile(ordered, 95) * 1e3, 2),
+        'p99_ms': round(percentile(ordered, 99) * 1e3, 2),
+        'max_ms': round(ordered[-1] * 1e3, 2),
+    }
+
+
+def failed(result):
+    if result.isError:
+        return True
+    text = result.content[0].text if result.content and result.content[0].type == 'text' else ''
+    return text.startswith('Error')
+
+
+class Replay:
+    """Runs virtual sessions and collects their timings."""
+
+    def __init__(self, url, think_scale, timeout):
+        self.url = url
+        self.think_scale = think_scale
+        self.timeout = timeout
+        self.sessions = []
+        self.connects = []
+        self.waiting = []
+        self.tools = {}
+        self.tool_errors = {}
+        self.session_errors = []
+
+    async def call(self, session, call):
+        started = time.perf_counter()
+        try:
+            result = await session.call_tool(call['tool'], call['arguments'])
+            error = failed(result)
+        except Exception as e:
+            error = True
+            self.session_errors.append(f"{call['tool']}: {str(e)}")
+        elapsed = time.perf_counter() - started
+        self.tools.setdefault(call['tool'], []).append(elapsed)
+        if error:
+            self.tool_errors[call['tool']] = self.tool_errors.get(call['tool'], 0) + 1
+
+    async def run_session(self, steps):
+        started = time.perf_counter()
+        waiting = 0.0
+        try:
+            async with sse_client(self.url, timeout=self.timeout, sse_read_timeout=self.timeout) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    connected = time.perf_counter()
+                    for think, calls in steps:
+                        await asyncio.sleep(think * self.think_scale)
+                        step_started = time.perf_counter()
+                        await asyncio.gather(*(self.call(session, call) for call in calls))
+                        waiting += time.perf_counter() - step_started
+        except Exception as e:
+            self.session_errors.append(f"session: {str(e)}")
+            return
+        self.connects.append(connected - started)
+        self.waiting.append(waiting)
+        self.sessions.append(time.perf_counter() - started)
+
+    def report(self, elapsed, started):
+        return {
+            'sessions_started': started,
+            'sessions_completed': len(self.sessions),
+            'sessions_failed': started - len(self.sessions),
+            'seconds': round(elapsed, 3),
+            'sessions_per_second': round(len(self.sessions) / elapsed, 3) if elapsed else 0.0,
+            'session_latency': summarize(self.sessions),
+            'server_time_per_session': summarize(self.waiting),
+            'connect': summarize(self.connects),
+            'tools': {tool: {**summarize(samples), 'errors': self.tool_errors.get(tool, 0)}
+                      for tool, samples in sorted(self.tools.items())},
+            'first_errors': self.session_errors[:10],
+        }
+
+
+async def replay(args, recorded):
+    runner = Replay(args.url, args.think_scale, args.timeout)
+    slots = asyncio.Semaphore(args.concurrency)
+    tasks = []
+    started = time.perf_counter()
+
+    async def run(steps):
+        try:
+            await runner.run_session(steps)
+        finally:
+            slots.release()
+
+    for i in range(args.sessions):
+        if args.rate:
+            # Arrivals are paced from the start, not from when the previous session got a slot
+            await asyncio.sleep(max(0.0, started + i / args.rate - time.perf_counter()))
+        await slots.acquire()
+        tasks.append(asyncio.create_task(run(recorded[i % len(recorded)])))
+    await asyncio.gather(*tasks)
+    return runner.report(time.perf_counter() - started, len(tasks))
+
+
+def print_report(report):
+    def line(label, stats):
+        if not stats.get('count'):
+            return f"  {label:<32} -"
+        return (f"  {label:<32} n={stats['count']:<6} p50 {stats['p50_ms']:9.1f}   p95 {stats['p95_ms']:9.1f}   "
+                f"p99 {stats['p99_ms']:9.1f} ms")
+
+    print(f"{report['sessions_completed']}/{report['sessions_started']} sessions in {report['seconds']}s "
+          f"({report['sessions_per_second']} sessions/s)")
+    print(line('session (end to end)', report['session_latency']))
+    print(line('session (waiting on server)', report['server_time_per_session']))
+    print(line('connect + initialize', report['connect']))
+    print("Per tool:")
+    for tool, stats in report['tools'].items():
+        errors = f"   {stats['errors']} errors" if stats['errors'] else ''
+        print(line(tool, stats) + errors)
+    for error in report['first_errors']:
+        print(f"  ! {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('traces', nargs='+', help="Trace files recorded with MCP_TRACE_PATH")
+    parser.add_argument('--url', default='http://localhost:8000/sse', help="SSE endpoint of the running server")
+    parser.add_argument('--sessions', type=int, help="Sessions to run (default: each recorded session once)")
+    parser.add_argument('--concurrency', type=int, default=10, help="Most sessions running at once")
+    parser.add_argument('--rate', type=float, help="Sessions started per second (default: as fast as slots free up)")
+    parser.add_argument('--think-scale', type=float, default=1.0,
+                        help="Multiplier for recorded think-times; 0 replays back to back")
+    parser.add_argument('--tools', help="Only replay these comma-separated tools")
+    parser.add_argument('--allow-side-effects', action='store_true',
+                        help="Also replay " + ', '.join(sorted(SIDE_EFFECT_TOOLS)))
+    parser.add_argument('--timeout', type=float, default=300.0, help="Seconds to wait on the server")
+    parser.add_argument('--output', help="Save the report as JSON here")
+    args = parser.parse_args()
+
+    skipped = set() if args.allow_side_effects else SIDE_EFFECT_TOOLS
+    wanted = set(args.tools.split(',')) if args.tools else None
+    recorded = []
+    for calls in load_sessions(args.traces):
+        calls = [c for c in calls if c['tool'] not in skipped and (wanted is None or c['tool'] in wanted)]
+        if calls:
+            recorded.append(session_steps(calls))
+    if not recorded:
+        sys.exit("No tool calls to replay in the given traces")
+    args.sessions = args.sessions or len(recorded)
+    calls = sum(len(step[1]) for steps in recorded for step in steps)
+    print(f"Replaying {args.sessions} sessions from {len(recorded)} recorded ({calls} calls) against {args.url}, "
+          f"concurrency {args.concurrency}, rate {args.rate or 'unpaced'}, think-time x{args.think_scale:g}")
+    if skipped:
+        print(f"Skipping {', '.join(sorted(skipped))}; pass --allow-side-effects to replay them")
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    report = asyncio.run(replay(args, recorded))
+    print_report(report)
+    if args.output:
+        report['started_at'] = started_at
+        report['settings'] = {key: value for key, value in vars(args).items() if key != 'output'}
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -36,12 +36,18 @@ st.markdown("""
 st.title("📊 CSV Editor")
 st.markdown("Upload a CSV file to view and edit its contents.")
 
+def load_dataframe(uploaded_file):
+    """Read an uploaded CSV or Parquet export into a DataFrame."""
+    if uploaded_file.name.endswith(".parquet"):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file)
+
 # File uploader
-uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
+uploaded_file = st.file_uploader("Choose a CSV or Parquet file", type=["csv", "parquet"])
 
 if uploaded_file is not None:
     # Read the CSV file
-    df = pd.read_csv(uploaded_file)
+    df = load_dataframe(uploaded_file)
     
     # Display the dataframe with editing capabilities
     st.subheader("Edit Data")
@@ -1,28 +1,155 @@
+import csv
+import os
+import queue
+import tempfile
+import threading
+
 import boto3
-import pandas as pd
-
-def dynamodb_to_csv(table_name, csv_filename, region_name='us-west-2'):
-    # Initialize DynamoDB resource
-    dynamodb = boto3.resource('dynamodb', region_name=region_name)
-    table = dynamodb.Table(table_name)
-
-    # Scan the table (handles pagination)
-    items = []
-    response = table.scan()
-    items.extend(response.get('Items', []))
-    while 'LastEvaluatedKey' in response:
-        response = table.scan(ExclusiveStartKey=response['LastEvaluatedKey'])
-        items.extend(response.get('Items', []))
-
-    if not items:
-        print("No items found in the table.")
-        return
-
-    # Convert to DataFrame and save as CSV
-    df = pd.DataFrame(items)
-    df.to_csv(csv_filename, index=False)
-    print(f"Exported {len(df)} items to {csv_filename}")
+from boto3.dynamodb.types import TypeDeserializer
+
+# Sentinel a scan worker puts on the queue when its segment is done
+_SEGMENT_DONE = object()
+
+# How often a worker blocked on a full queue checks whether the scan was stopped
+_PUT_TIMEOUT_SECONDS = 0.5
+
+
+def _put(pages, item, stop):
+    """Put item on the queue, giving up if the scan is stopped while waiting for room."""
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=_PUT_TIMEOUT_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _scan_segment(client, table_name, segment, total_segments, pages, scan_kwargs, stop):
+    """Scan one segment of the table and push each page of items onto the queue until done or stopped."""
+    try:
+        kwargs = {**scan_kwargs, 'TableName': table_name, 'Segment': segment, 'TotalSegments': total_segments}
+        while not stop.is_set():
+            response = client.scan(**kwargs)
+            if not _put(pages, response.get('Items', []), stop):
+                return
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        _put(pages, _SEGMENT_DONE, stop)
+    except Exception as e:
+        _put(pages, e, stop)
+
+
+def parallel_scan(client, table_name, segments=8, max_pending_pages=16, **scan_kwargs):
+    """Scan a table with one thread per segment, yielding pages of raw items as they arrive.
+
+    Pages pass through a bounded queue, so a slow consumer holds back the
+    scan instead of letting pages pile up in memory. Extra keyword arguments
+    (e.g. FilterExpression) are passed to every Scan call. If a segment
+    fails or the consumer stops early, the other workers are told to stop
+    and are joined before the generator exits.
+    """
+    pages = queue.Queue(maxsize=max_pending_pages)
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=_scan_segment,
+            args=(client, table_name, segment, segments, pages, scan_kwargs, stop),
+            daemon=True,
+        )
+        for segment in range(segments)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        remaining = segments
+        while remaining:
+            page = pages.get()
+            if page is _SEGMENT_DONE:
+                remaining -= 1
+                continue
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        # Workers blocked on a full queue notice the stop within _PUT_TIMEOUT_SECONDS;
+        # one inside a Scan call finishes that request first
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+def _format_value(value):
+    """Format a value the way pandas' to_csv would."""
+    if value is None:
+        return ''
+    return str(value)
+
+
+def dynamodb_to_csv(table_name, csv_filename, region_name='us-west-2', segments=8, max_pending_pages=16):
+    """Export a DynamoDB table to CSV with a parallel scan, streaming pages to disk.
+
+    Segments are scanned concurrently and pages flow through a bounded queue
+    to a single writer, so memory use stays flat however big the table is.
+    Columns are discovered as items arrive: rows are first written to a
+    temporary file in column-discovery order, then copied under the final
+    header with missing trailing columns filled in.
+    """
+    # Low-level clients are thread-safe, unlike resources
+    client = boto3.client('dynamodb', region_name=region_name)
+    deserializer = TypeDeserializer()
+
+    output_dir = os.path.dirname(os.path.abspath(csv_filename))
+    columns = {}
+    count = 0
+    with tempfile.NamedTemporaryFile('w', newline='', dir=output_dir, suffix='.rows', delete=False) as body:
+        try:
+            writer = csv.writer(body)
+            for page in parallel_scan(client, table_name, segments, max_pending_pages):
+                for raw_item in page:
+                    item = {k: deserializer.deserialize(v) for k, v in raw_item.items()}
+                    for name in item:
+                        if name not in columns:
+                            columns[name] = len(columns)
+                    row = [''] * len(columns)
+                    for name, value in item.items():
+                        row[columns[name]] = _format_value(value)
+                    writer.writerow(row)
+                    count += 1
+        except BaseException:
+            body.close()
+            os.remove(body.name)
+            raise
+
+    try:
+        if not count:
+            print("No items found in the table.")
+            return
+
+        # Write the header, then copy the rows, padding those written before later columns appeared
+        header = list(columns)
+        with open(body.name, newline='') as rows, \
+                tempfile.NamedTemporaryFile('w', newline='', dir=output_dir, suffix='.csv', delete=False) as out:
+            try:
+                writer = csv.writer(out)
+                writer.writerow(header)
+                for row in csv.reader(rows):
+                    if len(row) < len(header):
+                        row.extend([''] * (len(header) - len(row)))
+                    writer.writerow(row)
+                out.close()
+                os.replace(out.name, csv_filename)
+            except BaseException:
+                out.close()
+                os.remove(out.name)
+                raise
+        print(f"Exported {count} items to {csv_filename}")
+    finally:
+        os.remove(body.name)
+
 
 if __name__ == "__main__":
     # Replace with your table name and desired output file
-    dynamodb_to_csv('strava-activities', 'strava-activities.csv', region_name='us-west-2')
\ No newline at end of file
+    dynamodb_to_csv('strava-activities', 'strava-activities.csv', region_name='us-west-2')
@@ -0,0 +1,267 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+
+from ddb_to_csv import parallel_scan
+
+logger = logging.getLogger(__name__)
+
+# Attribute used to find items changed since the last export
+CHECKPOINT_ATTRIBUTE = 'updatedAt'
+
+# How far before a scan's start the next run looks back, to cover clock skew between
+# writers and this machine and scans that don't yet see the newest writes
+CHECKPOINT_OVERLAP_SECONDS = 300
+
+# Columns stored as UTC timestamps instead of ISO strings
+TIMESTAMP_COLUMNS = ('startDate', 'updatedAt')
+
+# Numeric columns stored as integers; every other number is stored as a float
+INTEGER_COLUMNS = ('activityId', 'elapsedTime', 'movingTime')
+
+STATE_FILE = '_export_state.json'
+
+
+def _require_pyarrow():
+    """Import pyarrow, which is only needed for columnar exports."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow. Install it with: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def _column_type(name, value):
+    """Pick the Arrow type name for a column from its first non-null value."""
+    if name in TIMESTAMP_COLUMNS:
+        return 'timestamp'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, Decimal):
+        return 'int64' if name in INTEGER_COLUMNS else 'float64'
+    if isinstance(value, str):
+        return 'string'
+    return 'json'
+
+
+def _arrow_type(pa, type_name):
+    return {
+        'timestamp': pa.timestamp('us', tz='UTC'),
+        'bool': pa.bool_(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'string': pa.string(),
+        'json': pa.string(),
+    }[type_name]
+
+
+def _parse_timestamp(value):
+    """Parse an ISO-8601 string, treating values without an offset as UTC."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _convert(value, type_name, column=''):
+    """Convert a deserialized DynamoDB value to the column's Python type.
+
+    A value that doesn't fit a numeric column, e.g. a string in a column
+    first seen as a number, is logged and written as null rather than
+    failing the export.
+    """
+    if value is None:
+        return None
+    if type_name == 'timestamp':
+        try:
+            return _parse_timestamp(value) if isinstance(value, str) else None
+        except ValueError:
+            return None
+    if type_name in ('int64', 'float64'):
+        try:
+            return int(value) if type_name == 'int64' else float(value)
+        except (TypeError, ValueError, ArithmeticError):
+            logger.warning(f"Writing null for {column}={value!r}: not a {type_name} value")
+            return None
+    if type_name == 'bool':
+        return bool(value)
+    if type_name == 'string':
+        return value if isinstance(value, str) else str(value)
+    return json.dumps(value, default=str)
+
+
+def _run_id():
+    """Name a run's part files: time-ordered like before, but unique across runs in the same second."""
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:12]}"
+
+
+def _load_state(output_dir):
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {'checkpoint': None, 'columns': {}, 'key_columns': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(output_dir, state):
+    """Write the state file atomically so a crash never leaves a half-written checkpoint."""
+    path = os.path.join(output_dir, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def dynamodb_to_parquet(table_name, output_dir, region_name='us-west-2', segments=8, row_group_size=10000):
+    """Export new and changed items of a DynamoDB table as Parquet part files.
+
+    The first run exports the whole table. Later runs only fetch items whose
+    updatedAt is newer than the checkpoint saved by the previous run and
+    append them as new parts. The checkpoint is the time the scan started,
+    less CHECKPOINT_OVERLAP_SECONDS, not the newest updatedAt seen: an item
+    updated while the scan was running can carry an older updatedAt than
+    items read later, and would otherwise never be exported. Items in the
+    overlap are exported again; compact_parquet keeps the newest version of
+    each key. Numbers are stored as int64/float64 columns,
+    startDate and updatedAt as UTC timestamps. Column types are remembered
+    in the state file so every part shares one schema.
+
+    DynamoDB applies the updatedAt filter after reading, so incremental runs
+    still read the table but only transfer and write the changed items.
+    """
+    pa, pq = _require_pyarrow()
+    os.makedirs(output_dir, exist_ok=True)
+    state = _load_state(output_dir)
+    checkpoint = state['checkpoint']
+    columns = state['columns']
+
+    client = boto3.client('dynamodb', region_name=region_name)
+    if not state['key_columns']:
+        key_schema = client.describe_table(TableName=table_name)['Table']['KeySchema']
+        state['key_columns'] = [k['AttributeName'] for k in key_schema]
+
+    scan_kwargs = {}
+    if checkpoint:
+        scan_kwargs = {
+            'FilterExpression': '#checkpoint > :checkpoint',
+            'ExpressionAttributeNames': {'#checkpoint': CHECKPOINT_ATTRIBUTE},
+            'ExpressionAttributeValues': {':checkpoint': {'S': checkpoint}},
+        }
+
+    deserializer = TypeDeserializer()
+    run_id = _run_id()
+    parts = []
+    writer = None
+    schema = None
+    buffered = []
+    count = 0
+    scan_started = datetime.now(timezone.utc)
+
+    def flush():
+        nonlocal writer, schema
+        if not buffered:
+            return
+        if writer is None:
+            schema = pa.schema([(name, _arrow_type(pa, type_name)) for name, type_name in columns.items()])
+            parts.append(os.path.join(output_dir, f"part-{run_id}-{len(parts):03d}.parquet"))
+            writer = pq.ParquetWriter(parts[-1] + '.tmp', schema)
+        arrays = {
+            name: [_convert(item.get(name), type_name, name) for item in buffered]
+            for name, type_name in columns.items()
+        }
+        writer.write_table(pa.table(arrays, schema=schema), row_group_size=row_group_size)
+        buffered.clear()
+
+    def close_part():
+        nonlocal writer
+        flush()
+        if writer is not None:
+            writer.close()
+            writer = None
+
+    try:
+        for page in parallel_scan(client, table_name, segments, **scan_kwargs):
+            for raw_item in page:
+                item = {k: deserializer.deserialize(v) for k, v in raw_item.items()}
+                new_columns = {
+                    name: _column_type(name, value)
+                    for name, value in item.items()
+                    if name not in columns and value is not None
+                }
+                if new_columns:
+                    # A part's schema is fixed once written, so new columns start a new part
+                    close_part()
+                    columns.update(new_columns)
+                buffered.append(item)
+                count += 1
+                if len(buffered) >= row_group_size:
+                    flush()
+        close_part()
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        for part in parts:
+            if os.path.exists(part + '.tmp'):
+                os.remove(part + '.tmp')
+        raise
+
+    if not parts:
+        print("No new or changed items since the last export.")
+        return []
+    for part in parts:
+        os.replace(part + '.tmp', part)
+
+    # Only move the checkpoint once the parts are safely on disk
+    since = scan_started - timedelta(seconds=CHECKPOINT_OVERLAP_SECONDS)
+    state['checkpoint'] = since.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    state['columns'] = columns
+    _save_state(output_dir, state)
+    print(f"Exported {count} items to {', '.join(parts)}")
+    return parts
+
+
+def compact_parquet(output_dir):
+    """Merge all part files into one, keeping only the newest version of each item."""
+    pa, pq = _require_pyarrow()
+    state = _load_state(output_dir)
+    parts = sorted(glob.glob(os.path.join(output_dir, 'part-*.parquet')))
+    if len(parts) < 2:
+        print("Nothing to compact.")
+        return parts[0] if parts else None
+
+    table = pa.concat_tables([pq.read_table(part) for part in parts], promote_options='default')
+    df = table.to_pandas()
+    if CHECKPOINT_ATTRIBUTE in df.columns:
+        df = df.sort_values(CHECKPOINT_ATTRIBUTE, kind='stable')
+    df = df.drop_duplicates(subset=state['key_columns'], keep='last')
+
+    compacted = os.path.join(output_dir, f"part-{_run_id()}-compacted.parquet")
+    pq.write_table(pa.Table.from_pandas(df, schema=table.schema, preserve_index=False), compacted + '.tmp')
+    os.replace(compacted + '.tmp', compacted)
+    for part in parts:
+        if part != compacted:
+            os.remove(part)
+    print(f"Compacted {len(parts)} parts into {compacted} ({len(df)} items)")
+    return compacted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally export a DynamoDB table to Parquet.")
+    parser.add_argument('--table', default='strava-activities')
+    parser.add_argument('--output-dir', default='strava-activities.parquet')
+    parser.add_argument('--region', default='us-west-2')
+    parser.add_argument('--compact', action='store_true', help="Merge existing parts instead of exporting")
+    args = parser.parse_args()
+
+    if args.compact:
+        compact_parquet(args.output_dir)
+    else:
+        dynamodb_to_parquet(args.table, args.output_dir, region_name=args.region)
@@ -0,0 +1,234 @@
+import base64
+import json
+import math
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii
+from typing import Any
+
+from boto3.dynamodb.types import Binary
+
+_float_repr = float.__repr__
+
+
+class RawItem:
+    """An item from the low-level DynamoDB client, to be written by dumps() wherever it appears.
+
+    Wrapping raw items lets a response built around them, such as a batch
+    result keyed by table, be encoded in one pass without deserializing
+    each item into Decimals first.
+    """
+
+    __slots__ = ('attributes',)
+
+    def __init__(self, attributes: dict):
+        self.attributes = attributes
+
+
+def _default(obj: Any) -> Any:
+    """Encode the types boto3 hands back that json can't encode on its own."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    if isinstance(obj, Binary):
+        obj = obj.value
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode('ascii')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _decimal_as_float(value: Decimal) -> str:
+    """Return repr(float(value)) without the float round trip when the text is already the same.
+
+    A decimal string with at most 15 significant digits is exactly what
+    float's repr produces for it, as long as repr wouldn't switch to
+    exponent notation, so most stored numbers can be copied as they are.
+    """
+    text = str(value)
+    if 'E' not in text:
+        if '.' in text:
+            if text[-1] != '0' and len(text) <= 16 and not text.lstrip('-').startswith('0.0000'):
+                return text
+        elif len(text) <= 15:
+            return text + '.0'
+    return _float_repr(float(value))
+
+
+def _write_scalar(obj: Any, out: list) -> None:
+    """Append the JSON for a value that is not a str, Decimal, dict or list."""
+    if obj is None:
+        out.append('null')
+    elif obj is True:
+        out.append('true')
+    elif obj is False:
+        out.append('false')
+    elif type(obj) is int:
+        out.append(int.__repr__(obj))
+    elif type(obj) is float:
+        out.append(_float_repr(obj) if math.isfinite(obj) else json.dumps(obj))
+    else:
+        out.append(json.dumps(obj, default=_default))
+
+
+def _write_compact(obj: Any, out: list) -> None:
+    """Append compact JSON for obj, writing Decimals exactly as DynamoDB stored them."""
+    kind = type(obj)
+    if kind is str:
+        out.append(encode_basestring_ascii(obj))
+    elif kind is Decimal:
+        out.append(str(obj))
+    elif kind is dict:
+        if not obj:
+            out.append('{}')
+            return
+        out.append('{')
+        for key, value in obj.items():
+            out.append(encode_basestring_ascii(str(key)))
+            out.append(':')
+            # Scalars are written inline; only containers recurse
+            value_kind = type(value)
+            if value_kind is Decimal:
+                out.append(str(value))
+            elif value_kind is str:
+                out.append(encode_basestring_ascii(value))
+            else:
+                _write_compact(value, out)
+            out.append(',')
+        out[-1] = '}'
+    elif kind is list or kind is set:
+        if not obj:
+            out.append('[]')
+            return
+        out.append('[')
+        for value in (obj if kind is list else sorted(obj, key=str)):
+            _write_compact(value, out)
+            out.append(',')
+        out[-1] = ']'
+    elif kind is RawItem:
+        _write_raw_compact({'M': obj.attributes}, out)
+    else:
+        _write_scalar(obj, out)
+
+
+def _write_indented(obj: Any, out: list, indent: str) -> None:
+    """Append JSON for obj with two-space indentation, matching json.dumps(indent=2)."""
+    kind = type(obj)
+    if kind is str:
+        out.append(encode_basestring_ascii(obj))
+    elif kind is Decimal:
+        out.append(_decimal_as_float(obj))
+    elif kind is dict:
+        if not obj:
+            out.append('{}')
+            return
+        inner = indent + '  '
+        separator = ',\n' + inner
+        out.append('{\n' + inner)
+        for key, value in obj.items():
+            out.append(encode_basestring_ascii(str(key)))
+            out.append(': ')
+            # Scalars are written inline; only containers recurse
+            value_kind = type(value)
+            if value_kind is Decimal:
+                out.append(_decimal_as_float(value))
+            elif value_kind is str:
+                out.append(encode_basestring_ascii(value))
+            else:
+                _write_indented(value, out, inner)
+            out.append(separator)
+        out[-1] = '\n' + indent + '}'
+    elif kind is list or kind is set:
+        if not obj:
+            out.append('[]')
+            return
+        inner = indent + '  '
+        separator = ',\n' + inner
+        out.append('[\n' + inner)
+        for value in (obj if kind is list else sorted(obj, key=str)):
+            _write_indented(value, out, inner)
+            out.append(separator)
+        out[-1] = '\n' + indent + ']'
+    elif kind is RawItem:
+        _write_indented({k: from_attribute_value(v) for k, v in obj.attributes.items()}, out, indent)
+    else:
+        _write_scalar(obj, out)
+
+
+def dumps(obj: Any, compact: bool = False) -> str:
+    """Serialize a DynamoDB item (or any structure of items) to JSON in a single pass.
+
+    Decimals are converted while encoding instead of copying the whole
+    structure first. By default the output is identical to
+    json.dumps(convert_decimals(obj), indent=2). With compact=True there is
+    no whitespace and numbers are written exactly as DynamoDB stores them
+    (5 rather than 5.0), which skips the float conversion entirely.
+    """
+    out: list = []
+    if compact:
+        _write_compact(obj, out)
+    else:
+        _write_indented(obj, out, '')
+    return ''.join(out)
+
+
+def from_attribute_value(value: dict) -> Any:
+    """Convert a raw DynamoDB attribute value (e.g. {"N": "1.5"}) to a JSON-ready Python value."""
+    (tag, inner), = value.items()
+    if tag == 'S':
+        return inner
+    if tag == 'N':
+        return float(inner)
+    if tag == 'M':
+        return {k: from_attribute_value(v) for k, v in inner.items()}
+    if tag == 'L':
+        return [from_attribute_value(v) for v in inner]
+    if tag == 'BOOL':
+        return inner
+    if tag == 'NULL':
+        return None
+    if tag == 'SS':
+        return sorted(inner)
+    if tag == 'NS':
+        return sorted(float(v) for v in inner)
+    if tag == 'B':
+        return base64.b64encode(inner).decode('ascii')
+    if tag == 'BS':
+        return [base64.b64encode(v).decode('ascii') for v in inner]
+    raise TypeError(f"Unknown DynamoDB attribute type: {tag}")
+
+
+def _write_raw_compact(value: dict, out: list) -> None:
+    """Append compact JSON for a raw attribute value, copying number strings straight through."""
+    if 'S' in value:
+        out.append(encode_basestring_ascii(value['S']))
+    elif 'N' in value:
+        out.append(value['N'])
+    elif 'M' in value:
+        inner = value['M']
+        if not inner:
+            out.append('{}')
+            return
+        out.append('{')
+        for key, item in inner.items():
+            out.append(encode_basestring_ascii(key))
+            out.append(':')
+            _write_raw_compact(item, out)
+            out.append(',')
+        out[-1] = '}'
+    elif 'L' in value:
+        inner = value['L']
+        if not inner:
+            out.append('[]')
+            return
+        out.append('[')
+        for item in inner:
+            _write_raw_compact(item, out)
+            out.append(',')
+        out[-1] = ']'
+    else:
+        _write_compact(from_attribute_value(value), out)
+
+
+def dumps_raw_item(item: dict, compact: bool = False) -> str:
+    """Serialize an item from the low-level DynamoDB client without building Decimals."""
+    return dumps(RawItem(item), compact=compact)
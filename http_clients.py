@@ -0,0 +1,170 @@
+import importlib.util
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back to a default."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logger.error(f"Invalid value for {name}, using {default}")
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment, falling back to a default."""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        logger.error(f"Invalid value for {name}, using {default}")
+        return default
+
+
+# httpcore trace steps timed for each request, by the phase name they are reported as
+TRACED_PHASES = {
+    'connection.connect_tcp': 'connect',
+    'connection.start_tls': 'tls',
+    'http11.receive_response_headers': 'first_byte',
+    'http2.receive_response_headers': 'first_byte',
+}
+
+
+class TimedTransport(httpx.AsyncHTTPTransport):
+    """An httpx transport that records how long each phase of a request took.
+
+    httpcore reports the steps of a request through its trace extension.
+    Connecting (name resolution included) and the TLS handshake are only
+    timed when a new connection is opened; first_byte is the wait between
+    sending the request and receiving the response headers.
+    """
+
+    def __init__(self, metrics: Any, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        started: dict[str, float] = {}
+        outer = request.extensions.get('trace')
+
+        async def trace(event: str, info: dict) -> None:
+            step, _, stage = event.rpartition('.')
+            phase = TRACED_PHASES.get(step)
+            if phase is not None:
+                if stage == 'started':
+                    started[step] = time.perf_counter()
+                elif stage in ('complete', 'failed') and step in started:
+                    self.metrics.observe(
+                        'http_client_phase_seconds', time.perf_counter() - started.pop(step), host=host, phase=phase
+                    )
+            if outer is not None:
+                await outer(event, info)
+
+        request.extensions = {**request.extensions, 'trace': trace}
+        request_started = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception as e:
+            self.metrics.inc('http_client_requests_total', host=host, status=type(e).__name__)
+            raise
+        self.metrics.observe('http_client_request_seconds', time.perf_counter() - request_started, host=host)
+        self.metrics.inc('http_client_requests_total', host=host, status=response.status_code)
+        return response
+
+
+class HttpClientRegistry:
+    """Keep one pooled httpx.AsyncClient per upstream base URL.
+
+    Clients are created on first use and live until the registry is closed,
+    so repeated tool calls reuse open connections instead of paying DNS, TCP
+    and TLS setup every time. Pool sizes can be tuned with the
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS and
+    HTTP_KEEPALIVE_EXPIRY environment variables, and HTTP/2 can be turned off
+    with HTTP2=0.
+
+    With a metrics registry, requests are sent through a TimedTransport
+    that records connect, TLS and first-byte timings per upstream host.
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None,
+        timeout: float = 30.0,
+        metrics: Any = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections or _env_int('HTTP_MAX_CONNECTIONS', 100),
+            max_keepalive_connections=max_keepalive_connections or _env_int('HTTP_MAX_KEEPALIVE_CONNECTIONS', 20),
+            keepalive_expiry=keepalive_expiry or _env_float('HTTP_KEEPALIVE_EXPIRY', 60.0),
+        )
+        if http2 is None:
+            http2 = os.environ.get('HTTP2', '1') != '0'
+        if http2 and importlib.util.find_spec('h2') is None:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self.timeout = timeout
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.describe('http_client_requests_total', 'counter', "Upstream HTTP requests by host and status.")
+            metrics.describe(
+                'http_client_request_seconds', 'histogram', "Time from sending an upstream request to its response headers."
+            )
+            metrics.describe(
+                'http_client_phase_seconds', 'histogram', "Upstream request phases: connect (with DNS), tls and first_byte."
+            )
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._users = 0
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        """Return the shared client for base_url, creating it if needed."""
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            transport = None
+            if self.metrics is not None:
+                transport = TimedTransport(self.metrics, http2=self.http2, limits=self.limits)
+            client = httpx.AsyncClient(
+                base_url=base_url,
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=transport,
+            )
+            self._clients[base_url] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close every client and drop its pooled connections."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing HTTP client: {str(e)}")
+
+    @asynccontextmanager
+    async def lifespan(self) -> AsyncIterator["HttpClientRegistry"]:
+        """Hold the registry open for the duration of the block.
+
+        Nested or concurrent users share the same clients; they are only
+        closed when the last user leaves.
+        """
+        self._users += 1
+        try:
+            yield self
+        finally:
+            self._users -= 1
+            if self._users == 0:
+                await self.aclose()
@@ -0,0 +1,281 @@
+import asyncio
+import glob
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Optional
+from uuid import UUID
+
+import anyio
+import httpx
+import uvicorn
+from mcp import types
+from mcp.server.fastmcp import FastMCP
+from mcp.server.sse import SseServerTransport
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Mount, Route
+from starlette.types import Receive, Scope, Send
+
+from metrics import Metrics, render as render_metrics
+from page_server import EmbeddedServer
+
+logger = logging.getLogger(__name__)
+
+# Worker processes serving the HTTP transport behind one port
+WORKERS = int(os.environ.get('MCP_HTTP_WORKERS', 1))
+
+# Most open connections per worker, SSE streams included; more get a 503
+MAX_CONNECTIONS = int(os.environ.get('MCP_HTTP_MAX_CONNECTIONS', 200))
+
+# Most tool calls running at once per worker; more wait for a slot
+MAX_CONCURRENT_TOOLS = int(os.environ.get('MCP_MAX_CONCURRENT_TOOLS', 32))
+
+# Seconds open connections get to finish on shutdown before they are closed
+SHUTDOWN_TIMEOUT = int(os.environ.get('MCP_HTTP_SHUTDOWN_TIMEOUT', 10))
+
+# Sessions whose owning worker is remembered for forwarding
+MAX_KNOWN_OWNERS = 10_000
+
+
+def _run_dir(port: int) -> str:
+    return os.environ.get('MCP_HTTP_RUN_DIR') or os.path.join(tempfile.gettempdir(), f"weather-mcp-{port}")
+
+
+class SseWorkerApp:
+    """One worker process's SSE transport for a FastMCP server.
+
+    Workers share a listening socket, so a client's message POST can land
+    on a different worker than the one holding its SSE stream. Each worker
+    therefore also listens on a Unix socket in run_dir. A POST for a session
+    this worker doesn't hold is passed to the other workers' sockets until
+    its owner accepts it, and the owner is remembered for the session's
+    next messages.
+
+    resources is entered once for the life of the worker, so process-wide
+    clients and caches outlive the per-session server lifespan. Tool calls
+    are limited to max_concurrent_tools at a time.
+
+    With a metrics registry, GET /metrics serves the metrics of every
+    worker in the Prometheus text format, each sample labelled with its
+    worker's pid, whichever worker the scrape lands on.
+    """
+
+    def __init__(
+        self,
+        mcp: FastMCP,
+        resources: Callable[[], AsyncContextManager[Any]],
+        run_dir: str,
+        max_concurrent_tools: int = MAX_CONCURRENT_TOOLS,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.mcp = mcp
+        self.metrics = metrics
+        self.resources = resources
+        self.run_dir = run_dir
+        self.socket_path = os.path.join(run_dir, f"worker-{os.getpid()}.sock")
+        self.sse = SseServerTransport(mcp.settings.message_path)
+        self.owners: dict[str, str] = {}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._internal: Optional[EmbeddedServer] = None
+        self._internal_task: Optional[asyncio.Task] = None
+        self.sessions = 0
+        self.forwarded = 0
+        self.max_concurrent_tools = max_concurrent_tools
+        self.tools_waiting = 0
+        self._limit_tool_calls()
+
+    def _limit_tool_calls(self) -> None:
+        server = self.mcp._mcp_server
+        call_tool = server.request_handlers[types.CallToolRequest]
+        semaphore = asyncio.Semaphore(self.max_concurrent_tools)
+
+        async def limited(request: types.CallToolRequest) -> Any:
+            self.tools_waiting += 1
+            try:
+                await semaphore.acquire()
+            finally:
+                self.tools_waiting -= 1
+            try:
+                return await call_tool(request)
+            finally:
+                semaphore.release()
+
+        server.request_handlers[types.CallToolRequest] = limited
+
+    async def handle_sse(self, request: Request) -> Response:
+        server = self.mcp._mcp_server
+        self.sessions += 1
+        try:
+            async with self.sse.connect_sse(request.scope, request.receive, request._send) as (read, write):
+                # server.run doesn't notice the client going away, so end the session on http.disconnect
+                async with anyio.create_task_group() as tg:
+                    async def run_session() -> None:
+                        await server.run(read, write, server.create_initialization_options())
+                        tg.cancel_scope.cancel()
+
+                    tg.start_soon(run_session)
+                    while (await request.receive())['type'] != 'http.disconnect':
+                        pass
+                    tg.cancel_scope.cancel()
+        finally:
+            self.sessions -= 1
+        return Response()
+
+    async def handle_message(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive)
+        session_id = request.query_params.get('session_id', '')
+        try:
+            held = UUID(hex=session_id) in self.sse._read_stream_writers
+        except ValueError:
+            # Let the transport reject malformed IDs
+            held = True
+        if held:
+            await self.sse.handle_post_message(scope, receive, send)
+            return
+        response = await self._forward(session_id, await request.body(), request.headers.get('content-type'))
+        await response(scope, receive, send)
+
+    async def handle_metrics(self, request: Request) -> Response:
+        snapshots = [({'worker': str(os.getpid())}, self.metrics.snapshot())]
+        others = sorted(glob.glob(os.path.join(self.run_dir, 'worker-*.sock')))
+        for path in others:
+            if path == self.socket_path:
+                continue
+            try:
+                reply = await self._client(path).get('/metrics.json')
+                reply.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.error(f"Error collecting metrics from {path}: {str(e)}")
+                continue
+            body = reply.json()
+            snapshots.append(({'worker': str(body['pid'])}, body['metrics']))
+        return PlainTextResponse(render_metrics(snapshots), media_type='text/plain; version=0.0.4')
+
+    async def handle_metrics_json(self, request: Request) -> Response:
+        return JSONResponse({'pid': os.getpid(), 'metrics': self.metrics.snapshot()})
+
+    def _client(self, path: str) -> httpx.AsyncClient:
+        client = self._clients.get(path)
+        if client is None:
+            client = self._clients[path] = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=path), base_url='http://worker', timeout=10.0
+            )
+        return client
+
+    async def _forward(self, session_id: str, body: bytes, content_type: Optional[str]) -> Response:
+        """Pass a message to the worker that holds its session, trying the last known owner first."""
+        owner = self.owners.get(session_id)
+        others = sorted(glob.glob(os.path.join(self.run_dir, 'worker-*.sock')))
+        paths = ([owner] if owner else []) + [p for p in others if p not in (self.socket_path, owner)]
+        for path in paths:
+            try:
+                reply = await self._client(path).post(
+                    self.mcp.settings.message_path,
+                    params={'session_id': session_id},
+                    content=body,
+                    headers={'content-type': content_type or 'application/json'},
+                )
+            except httpx.TransportError:
+                # A worker that exited can leave its socket behind
+                continue
+            if reply.status_code == 404:
+                continue
+            self.owners[session_id] = path
+            if len(self.owners) > MAX_KNOWN_OWNERS:
+                self.owners.pop(next(iter(self.owners)))
+            self.forwarded += 1
+            return Response(reply.content, status_code=reply.status_code, media_type=reply.headers.get('content-type'))
+        self.owners.pop(session_id, None)
+        return Response("Could not find session", status_code=404)
+
+    @asynccontextmanager
+    async def lifespan(self, app: Starlette) -> AsyncIterator[None]:
+        os.makedirs(self.run_dir, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        # Other workers forward messages for our sessions here, and collect our metrics
+        routes = [Mount(self.mcp.settings.message_path, app=self.sse.handle_post_message)]
+        if self.metrics is not None:
+            routes.insert(0, Route('/metrics.json', endpoint=self.handle_metrics_json, methods=['GET']))
+        internal = Starlette(routes=routes)
+        self._internal = EmbeddedServer(
+            uvicorn.Config(internal, uds=self.socket_path, log_level='warning', lifespan='off')
+        )
+        self._internal_task = asyncio.create_task(self._internal.serve())
+        try:
+            async with self.resources():
+                yield
+        finally:
+            self._internal.should_exit = True
+            await self._internal_task
+            for client in self._clients.values():
+                await client.aclose()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def app(self) -> Starlette:
+        routes = [
+            Route(self.mcp.settings.sse_path, endpoint=self.handle_sse, methods=['GET']),
+            Mount(self.mcp.settings.message_path, app=self.handle_message),
+        ]
+        if self.metrics is not None:
+            routes.append(Route('/metrics', endpoint=self.handle_metrics, methods=['GET']))
+        return Starlette(routes=routes, lifespan=self.lifespan)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'pid': os.getpid(),
+            'workers': WORKERS,
+            'sessions': self.sessions,
+            'forwarded_messages': self.forwarded,
+            'max_concurrent_tools': self.max_concurrent_tools,
+            'tool_calls_waiting': self.tools_waiting,
+        }
+
+
+def create_app(
+    mcp: FastMCP,
+    resources: Callable[[], AsyncContextManager[Any]],
+    metrics: Optional[Metrics] = None,
+) -> tuple[Starlette, SseWorkerApp]:
+    """Build the ASGI app for one worker; called in every worker process."""
+    worker = SseWorkerApp(mcp, resources, _run_dir(mcp.settings.port), metrics=metrics)
+    return worker.app(), worker
+
+
+def run(
+    app_factory: str,
+    host: str,
+    port: int,
+    workers: int = WORKERS,
+    max_connections: int = MAX_CONNECTIONS,
+    shutdown_timeout: int = SHUTDOWN_TIMEOUT,
+) -> None:
+    """Serve the app built by app_factory ("module:function") from several worker processes on one port.
+
+    uvicorn binds the port once and hands the socket to each worker. On
+    SIGINT or SIGTERM workers stop accepting connections, give open ones up
+    to shutdown_timeout seconds to finish and then close their resources.
+    """
+    run_dir = _run_dir(port)
+    os.makedirs(run_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(run_dir, 'worker-*.sock')):
+        os.unlink(stale)
+    # Workers read these to find each other and to take their share of rate limits
+    os.environ['MCP_HTTP_RUN_DIR'] = run_dir
+    os.environ['MCP_HTTP_WORKERS'] = str(workers)
+    uvicorn.run(
+        app_factory,
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        limit_concurrency=max_connections,
+        timeout_graceful_shutdown=shutdown_timeout,
+        log_level='info',
+    )
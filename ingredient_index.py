@@ -0,0 +1,370 @@
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Endpoints whose responses list each recipe's ingredients
+INGREDIENT_ENDPOINTS = ('complexSearch', 'findByIngredients')
+
+# findByIngredients parameters the index can evaluate
+SUPPORTED_PARAMS = {'ingredients', 'number', 'ranking', 'ignorePantry'}
+
+# Typical pantry items that ignorePantry leaves out of the missing ingredients (normalized names)
+PANTRY_ITEMS = frozenset({
+    'water', 'ice', 'salt', 'table salt', 'kosher salt', 'sea salt', 'pepper', 'black pepper',
+    'salt and pepper', 'flour', 'all purpose flour', 'sugar', 'granulated sugar',
+})
+
+# Recipe fields kept so local results look like findByIngredients results
+SUMMARY_FIELDS = ('id', 'title', 'image', 'imageType', 'likes')
+
+# Ingredient fields copied into usedIngredients and missedIngredients
+INGREDIENT_FIELDS = (
+    'id', 'amount', 'unit', 'unitLong', 'unitShort', 'aisle', 'name', 'original', 'originalName', 'meta', 'image',
+)
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _singular(word: str) -> str:
+    """Strip a plain English plural ending ("tomatoes", "berries", "eggs")."""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith(('oes', 'ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def ingredient_key(name: str) -> str:
+    """Normalize an ingredient name so "Cherry Tomatoes", "cherry tomato" and "cherry-tomatoes" agree."""
+    return ' '.join(_singular(word) for word in _WORD.findall(name.lower()))
+
+
+def _flag(value: Any) -> bool:
+    return value is True or str(value).lower() in ('true', '1')
+
+
+def _add_to_counter(slices: list[int], bits: int) -> None:
+    """Add one to the per-row counts of a bit-sliced counter for every row set in bits.
+
+    slices[i] holds bit i of every row's count, so one ripple-carry pass
+    updates all rows at once.
+    """
+    carry = bits
+    for i, current in enumerate(slices):
+        if not carry:
+            return
+        slices[i], carry = current ^ carry, current & carry
+    if carry:
+        slices.append(carry)
+
+
+def _count_equals(slices: list[int], count: int, universe: int) -> int:
+    """Return the rows of universe whose count in a bit-sliced counter equals count."""
+    if count >> len(slices):
+        return 0
+    bits = universe
+    for i, current in enumerate(slices):
+        bits &= current if count >> i & 1 else universe & ~current
+        if not bits:
+            break
+    return bits
+
+
+def _bitset(rows: Iterable[int]) -> int:
+    """Build a bitset with the given rows set in one pass."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    buffer = bytearray((max(rows) >> 3) + 1)
+    for row in rows:
+        buffer[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def _bit_rows(bits: int) -> list[int]:
+    """Return the positions of the set bits in a bitset, lowest first."""
+    text = bin(bits)[:1:-1]
+    rows = []
+    position = text.find('1')
+    while position != -1:
+        rows.append(position)
+        position = text.find('1', position + 1)
+    return rows
+
+
+class IngredientIndex:
+    """Inverted index from normalized ingredient names to the recipes that use them.
+
+    Recipes are collected from findByIngredients responses (used plus
+    missed ingredients) and complexSearch responses that carry ingredient
+    lists. Each ingredient name has a posting list kept as a bitset (a
+    Python int with bit N set for recipe row N), so the recipes using any
+    ingredient of a pantry list are one OR over a few postings. A query
+    ingredient matches every indexed name that contains its words in order,
+    so "chicken" finds "chicken breast" and "apples" finds "green apple".
+
+    findByIngredients drops pantry items from its lists when called with
+    ignorePantry, so recipes only seen that way are left out of searches
+    that count pantry items as missing.
+
+    Adding recipes only appends to row lists; the bitsets that changed are
+    rebuilt in one pass before the next search, so indexing stays linear.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held for the whole of load(), so concurrent callers wait for the first one to finish
+        self._load_lock = threading.Lock()
+        self._rows: list[dict] = []
+        self._row_by_id: dict[Any, int] = {}
+        self._ingredients: list[dict[str, dict]] = []
+        self._pantry_counts: list[int] = []
+        self._posting_rows: dict[str, list[int]] = {}
+        self._words: dict[str, set[str]] = {}
+        self._complete_rows: set[int] = set()
+        # Bitsets built from the lists above, refreshed lazily
+        self._postings: dict[str, int] = {}
+        self._sizes: dict[int, int] = {}
+        self._sizes_without_pantry: dict[int, int] = {}
+        self._complete = 0
+        self._terms: dict[str, tuple[int, frozenset]] = {}
+        self._dirty: set[str] = set()
+        self._stale = False
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.unsupported = 0
+        self.query_seconds = 0.0
+
+    def _row(self, recipe: dict) -> Optional[int]:
+        recipe_id = recipe.get('id')
+        if recipe_id is None:
+            return None
+        row = self._row_by_id.get(recipe_id)
+        if row is None:
+            row = len(self._rows)
+            self._row_by_id[recipe_id] = row
+            self._rows.append({})
+            self._ingredients.append({})
+            self._pantry_counts.append(0)
+        summary = self._rows[row]
+        for field in SUMMARY_FIELDS:
+            if recipe.get(field) is not None:
+                summary[field] = recipe[field]
+        return row
+
+    def _add_ingredient(self, row: int, entry: dict) -> Optional[str]:
+        name = entry.get('nameClean') or entry.get('name')
+        key = ingredient_key(name) if isinstance(name, str) else ''
+        ingredients = self._ingredients[row]
+        if not key or key in ingredients:
+            return key or None
+        ingredients[key] = {field: entry[field] for field in INGREDIENT_FIELDS if field in entry}
+        if key in PANTRY_ITEMS:
+            self._pantry_counts[row] += 1
+        rows = self._posting_rows.get(key)
+        if rows is None:
+            rows = self._posting_rows[key] = []
+            for word in key.split():
+                self._words.setdefault(word, set()).add(key)
+        rows.append(row)
+        self._dirty.add(key)
+        return key
+
+    def add_recipes(self, endpoint: str, data: Any, params: Optional[dict] = None) -> int:
+        """Index the ingredient lists in a findByIngredients or complexSearch response; return how many had one.
+
+        params are the search params of the response, when known; they tell
+        whether pantry items were left out of the lists.
+        """
+        if endpoint not in INGREDIENT_ENDPOINTS:
+            return 0
+        recipes = data.get('results', []) if isinstance(data, dict) else data
+        pantry_listed = params is not None and not _flag(params.get('ignorePantry'))
+        added = 0
+        with self._lock:
+            for recipe in recipes or []:
+                if not isinstance(recipe, dict):
+                    continue
+                full = recipe.get('extendedIngredients') or (recipe.get('nutrition') or {}).get('ingredients')
+                entries = full or (recipe.get('usedIngredients') or []) + (recipe.get('missedIngredients') or [])
+                if not entries:
+                    continue
+                row = self._row(recipe)
+                if row is None:
+                    continue
+                keys = {self._add_ingredient(row, entry) for entry in entries if isinstance(entry, dict)}
+                if full or pantry_listed or not keys.isdisjoint(PANTRY_ITEMS):
+                    self._complete_rows.add(row)
+                added += 1
+            if added:
+                self._stale = True
+        return added
+
+    def load(self, responses: Iterable[tuple[str, str]]) -> None:
+        """Index cached response bodies once, e.g. from ResponseCache.iter_bodies().
+
+        Callers that arrive while another thread is loading block until it
+        has finished; loaded is only set once every body is indexed.
+        """
+        with self._load_lock:
+            if self.loaded:
+                return
+            started = time.perf_counter()
+            count = 0
+            for endpoint, body in responses:
+                try:
+                    count += self.add_recipes(endpoint, json.loads(body))
+                except ValueError as e:
+                    logger.error(f"Skipping unreadable cached response: {str(e)}")
+            self.loaded = True
+        logger.info(f"Indexed ingredients of {count} cached recipes in {time.perf_counter() - started:.3f}s")
+
+    def _refresh(self) -> None:
+        """Rebuild the bitsets that changed since the last search."""
+        if not self._stale:
+            return
+        for key in self._dirty:
+            self._postings[key] = _bitset(self._posting_rows[key])
+        self._dirty.clear()
+        sizes: dict[int, list[int]] = {}
+        sizes_without_pantry: dict[int, list[int]] = {}
+        for row, ingredients in enumerate(self._ingredients):
+            sizes.setdefault(len(ingredients), []).append(row)
+            sizes_without_pantry.setdefault(len(ingredients) - self._pantry_counts[row], []).append(row)
+        self._sizes = {size: _bitset(rows) for size, rows in sizes.items()}
+        self._sizes_without_pantry = {size: _bitset(rows) for size, rows in sizes_without_pantry.items()}
+        self._complete = _bitset(self._complete_rows)
+        self._terms.clear()
+        self._stale = False
+
+    def _match(self, key: str) -> tuple[int, frozenset]:
+        """Return the bitset of recipes using an ingredient and the indexed names it matched."""
+        match = self._terms.get(key)
+        if match is None:
+            words = key.split()
+            names = set.intersection(*(self._words.get(word, set()) for word in words))
+            if len(words) > 1:
+                names = {name for name in names if f" {key} " in f" {name} "}
+            bits = 0
+            for name in names:
+                bits |= self._postings[name]
+            match = self._terms[key] = (bits, frozenset(names))
+        return match
+
+    def search(self, params: dict, allow_partial: bool = False) -> Optional[list[dict]]:
+        """Answer a findByIngredients search locally.
+
+        Ranks recipes the way the API does: ranking 1 puts the most used
+        ingredients first, ranking 2 the fewest missing ones. Returns None
+        when the search has to go to the API: a parameter the index can't
+        evaluate, or fewer local recipes using any of the ingredients than
+        requested (unless allow_partial is set, e.g. in offline mode).
+        """
+        if any(name not in SUPPORTED_PARAMS for name, value in params.items() if value is not None):
+            self.unsupported += 1
+            return None
+        terms = {}
+        for text in str(params.get('ingredients') or '').split(','):
+            key = ingredient_key(text)
+            if key:
+                terms.setdefault(key, text.strip())
+        ranking = int(params.get('ranking') or 1)
+        if not terms or ranking not in (1, 2):
+            self.unsupported += 1
+            return None
+        number = int(params.get('number') or 10)
+        ignore_pantry = _flag(params.get('ignorePantry'))
+
+        started = time.perf_counter()
+        with self._lock:
+            self._refresh()
+            matches = {key: self._match(key) for key in terms}
+            candidates = 0
+            matched: set[str] = set()
+            for bits, names in matches.values():
+                candidates |= bits
+                matched |= names
+            if not ignore_pantry:
+                candidates &= self._complete
+            if candidates.bit_count() < number and not allow_partial:
+                self.misses += 1
+                self.query_seconds += time.perf_counter() - started
+                return None
+
+            # Count used ingredients for every recipe at once; missing ones are
+            # a recipe's size minus its used ingredients (pantry items aside)
+            used: list[int] = []
+            for name in matched:
+                _add_to_counter(used, self._postings[name])
+            if ignore_pantry:
+                used_counted: list[int] = []
+                for name in matched - PANTRY_ITEMS:
+                    _add_to_counter(used_counted, self._postings[name])
+                sizes = self._sizes_without_pantry
+            else:
+                used_counted = used
+                sizes = self._sizes
+
+            groups: dict[tuple[int, int], int] = {}
+            for used_count in range(1, 1 << len(used)):
+                rows = _count_equals(used, used_count, candidates)
+                for counted in (range(used_count + 1) if ignore_pantry else (used_count,)):
+                    counted_rows = _count_equals(used_counted, counted, rows)
+                    if not counted_rows:
+                        continue
+                    for size, size_rows in sizes.items():
+                        bits = counted_rows & size_rows
+                        if bits:
+                            key = (-used_count, size - counted) if ranking == 1 else (size - counted, -used_count)
+                            groups[key] = groups.get(key, 0) | bits
+
+            best: list[int] = []
+            for key in sorted(groups):
+                best.extend(_bit_rows(groups[key])[:number - len(best)])
+                if len(best) >= number:
+                    break
+            results = [self._result(row, matched, matches, terms, ignore_pantry) for row in best]
+        self.hits += 1
+        self.query_seconds += time.perf_counter() - started
+        return results
+
+    def _result(self, row: int, matched: set, matches: dict, terms: dict, ignore_pantry: bool) -> dict:
+        """Build a result shaped like findByIngredients' for one recipe."""
+        used, missed = [], []
+        for key, ingredient in self._ingredients[row].items():
+            if key in matched:
+                used.append(dict(ingredient))
+            elif not (ignore_pantry and key in PANTRY_ITEMS):
+                missed.append(dict(ingredient))
+        bit = 1 << row
+        return {
+            **self._rows[row],
+            'usedIngredientCount': len(used),
+            'missedIngredientCount': len(missed),
+            'missedIngredients': missed,
+            'usedIngredients': used,
+            'unusedIngredients': [
+                {'name': key, 'original': terms[key]} for key, (bits, _) in matches.items() if not bits & bit
+            ],
+        }
+
+    def stats(self) -> dict[str, Any]:
+        """Report how many recipes and ingredients are indexed and how often searches were answered locally."""
+        queries = self.hits + self.misses
+        return {
+            'recipes': len(self._rows),
+            'ingredients': len(self._posting_rows),
+            'recipes_with_pantry_items': len(self._complete_rows),
+            'hits': self.hits,
+            'misses': self.misses,
+            'unsupported': self.unsupported,
+            'average_query_microseconds': round(self.query_seconds / queries * 1e6, 1) if queries else 0.0,
+        }
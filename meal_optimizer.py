@@ -0,0 +1,226 @@
+import math
+import re
+import time
+from typing import Any, Iterable, Optional
+
+# Macros the optimizer balances, as keys of the targets
+MACROS = ('calories', 'protein', 'carbs', 'fat')
+
+# Most meal combinations scored at once; larger pools are trimmed to the best candidates first
+MAX_COMBINATIONS = 2_000_000
+
+# Spoonacular's boolean recipe flags for diets that don't always appear in "diets"
+DIET_FLAGS = {
+    'vegetarian': 'vegetarian',
+    'vegan': 'vegan',
+    'gluten free': 'glutenFree',
+    'dairy free': 'dairyFree',
+}
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def _require_numpy():
+    """Import numpy, which is only needed by the optimizer."""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The meal plan optimizer requires numpy. Install it with: pip install numpy")
+    return numpy
+
+
+def _amount(value: Any) -> Optional[float]:
+    """Read a nutrient amount given as a number or a string like "25g"."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value))
+    return float(match.group()) if match else None
+
+
+def recipe_macros(recipe: dict) -> Optional[dict[str, float]]:
+    """Return a recipe's calories, protein, carbs and fat per serving, or None if any is missing.
+
+    Understands complexSearch results with addRecipeNutrition (a nutrients
+    list), findByNutrients results ("25g" strings) and the flat numbers used
+    by the meal planner page.
+    """
+    macros = {}
+    nutrients = (recipe.get('nutrition') or {}).get('nutrients')
+    if nutrients:
+        by_name = {n.get('name', '').lower(): n.get('amount') for n in nutrients}
+        names = {'calories': 'calories', 'protein': 'protein', 'carbs': 'carbohydrates', 'fat': 'fat'}
+        for macro, name in names.items():
+            macros[macro] = _amount(by_name.get(name))
+    else:
+        for macro in MACROS:
+            macros[macro] = _amount(recipe.get(macro))
+    if any(value is None for value in macros.values()):
+        return None
+    return macros
+
+
+def _ingredient_count(recipe: dict) -> Optional[int]:
+    """Count a recipe's ingredients from whichever ingredient list the endpoint returned."""
+    if isinstance(recipe.get('extendedIngredients'), list):
+        return len(recipe['extendedIngredients'])
+    if isinstance(recipe.get('missedIngredients'), list):
+        return len(recipe['missedIngredients']) + len(recipe.get('usedIngredients') or [])
+    ingredients = (recipe.get('nutrition') or {}).get('ingredients')
+    return len(ingredients) if isinstance(ingredients, list) else None
+
+
+def _matches_diet(recipe: dict, diet: str) -> bool:
+    """Check a recipe against a comma-separated list of diets that must all apply."""
+    diets = {d.lower() for d in recipe.get('diets') or []}
+    if 'lacto ovo vegetarian' in diets:
+        diets.add('vegetarian')
+    for required in (d.strip().lower() for d in diet.split(',') if d.strip()):
+        flag = DIET_FLAGS.get(required)
+        if required not in diets and not (flag and recipe.get(flag)):
+            return False
+    return True
+
+
+def filter_candidates(
+    recipes: Iterable[dict],
+    diet: Optional[str] = None,
+    max_ready_time: Optional[int] = None,
+    max_ingredients: Optional[int] = None,
+) -> tuple[list[dict], list[dict[str, float]], dict[str, int]]:
+    """Keep the recipes that have macros and meet the constraints, dropping duplicates by ID.
+
+    Returns the recipes, their macros and how many were rejected for each reason.
+    """
+    kept, macros = [], []
+    rejected = {'no_nutrition': 0, 'diet': 0, 'ready_time': 0, 'ingredients': 0, 'duplicate': 0}
+    seen = set()
+    for recipe in recipes:
+        recipe_id = recipe.get('id', recipe.get('title'))
+        if recipe_id is not None and recipe_id in seen:
+            rejected['duplicate'] += 1
+            continue
+        values = recipe_macros(recipe)
+        if values is None:
+            rejected['no_nutrition'] += 1
+            continue
+        if diet and not _matches_diet(recipe, diet):
+            rejected['diet'] += 1
+            continue
+        ready = recipe.get('readyInMinutes')
+        if max_ready_time is not None and ready is not None and ready > max_ready_time:
+            rejected['ready_time'] += 1
+            continue
+        count = _ingredient_count(recipe)
+        if max_ingredients is not None and count is not None and count > max_ingredients:
+            rejected['ingredients'] += 1
+            continue
+        seen.add(recipe_id)
+        kept.append(recipe)
+        macros.append(values)
+    return kept, macros, rejected
+
+
+def _pool_size(available: int, meals_per_day: int) -> int:
+    """Largest pool whose meal combinations fit within MAX_COMBINATIONS."""
+    size = available
+    while size > meals_per_day and math.comb(size, meals_per_day) > MAX_COMBINATIONS:
+        size -= 1
+    return size
+
+
+def _combinations(np, n: int, r: int):
+    """Return every r-combination of range(n) as rows of increasing indices, built without a Python loop per row."""
+    combos = np.arange(n, dtype=np.int32).reshape(-1, 1)
+    for _ in range(r - 1):
+        last = combos[:, -1]
+        # Each row is extended once by every index after its last one
+        counts = n - 1 - last
+        offsets = np.repeat(np.cumsum(counts) - counts, counts)
+        following = np.arange(int(counts.sum()), dtype=np.int32) - offsets + np.repeat(last + 1, counts)
+        combos = np.column_stack([np.repeat(combos, counts, axis=0), following])
+    return combos
+
+
+def optimize_meals(
+    recipes: Iterable[dict],
+    targets: dict[str, float],
+    meals_per_day: int = 3,
+    top_k: int = 3,
+    diet: Optional[str] = None,
+    max_ready_time: Optional[int] = None,
+    max_ingredients: Optional[int] = None,
+    weights: Optional[dict[str, float]] = None,
+) -> dict[str, Any]:
+    """Find the combinations of distinct recipes whose daily totals come closest to the targets.
+
+    Every combination of meals_per_day recipes from the filtered pool is
+    scored at once with NumPy: the score is the weighted sum of squared
+    relative errors against each macro target given (calories, protein,
+    carbs, fat), so 10% over on protein costs the same as 10% under. When
+    the pool would give more than MAX_COMBINATIONS combinations, it is first
+    trimmed to the recipes closest to a single meal's share of the targets.
+    """
+    np = _require_numpy()
+    started = time.perf_counter()
+    macros_used = [macro for macro in MACROS if targets.get(macro)]
+    if not macros_used:
+        raise ValueError(f"Give at least one positive daily target out of: {', '.join(MACROS)}")
+    if meals_per_day < 1:
+        raise ValueError("meals_per_day must be at least 1")
+
+    candidates, macros, rejected = filter_candidates(recipes, diet, max_ready_time, max_ingredients)
+    result: dict[str, Any] = {
+        'targets': {macro: float(targets[macro]) for macro in macros_used},
+        'candidates': len(candidates),
+        'rejected': rejected,
+        'plans': [],
+    }
+    if len(candidates) < meals_per_day:
+        result['seconds'] = round(time.perf_counter() - started, 4)
+        return result
+
+    target = np.array([float(targets[macro]) for macro in macros_used])
+    weight = np.array([float((weights or {}).get(macro, 1.0)) for macro in macros_used])
+    values = np.array([[m[macro] for macro in macros_used] for m in macros])
+
+    pool_size = _pool_size(len(candidates), meals_per_day)
+    pool = np.arange(len(candidates))
+    if pool_size < len(candidates):
+        # Keep the recipes closest to an even share of the day on their own
+        single = (((values - target / meals_per_day) / target) ** 2) @ weight
+        pool = np.sort(np.argpartition(single, pool_size - 1)[:pool_size])
+
+    combos = pool[_combinations(np, len(pool), meals_per_day)]
+    # Adding one meal column at a time avoids materializing a combinations x meals x macros array
+    totals = values[combos[:, 0]]
+    for column in range(1, meals_per_day):
+        totals = totals + values[combos[:, column]]
+    scores = (((totals - target) / target) ** 2) @ weight
+
+    k = min(top_k, len(scores))
+    best = np.argpartition(scores, k - 1)[:k]
+    best = best[np.argsort(scores[best], kind='stable')]
+    for index in best:
+        plan_totals = totals[index]
+        result['plans'].append({
+            'score': round(float(scores[index]), 6),
+            'totals': {macro: round(float(v), 1) for macro, v in zip(macros_used, plan_totals)},
+            'off_target_percent': {
+                macro: round(float((v - t) / t * 100), 1) for macro, v, t in zip(macros_used, plan_totals, target)
+            },
+            'recipes': [
+                {
+                    'id': candidates[i].get('id'),
+                    'title': candidates[i].get('title', candidates[i].get('name')),
+                    'readyInMinutes': candidates[i].get('readyInMinutes'),
+                    **{macro: macros[i][macro] for macro in MACROS},
+                }
+                for i in combos[index].tolist()
+            ],
+        })
+    result['pool_size'] = int(len(pool))
+    result['combinations_scored'] = int(len(scores))
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    return result
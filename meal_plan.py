@@ -0,0 +1,81 @@
+import math
+from typing import Any, Iterable
+
+# Nutrients summed per day, as named in the meal objects
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fat', 'vitaminC', 'iron', 'calcium')
+
+# Daily recommended values used when the page data doesn't give its own (mg per day)
+DEFAULT_RDA = {'vitaminC': 70, 'iron': 18, 'calcium': 1000}
+
+# Page data keys that are replaced by lazily loaded resources
+LAZY_KEYS = ('meals', 'selected_meals')
+
+
+def _round(value: float) -> int:
+    """Round half up, like JavaScript's Math.round."""
+    return math.floor(value + 0.5)
+
+
+def daily_rda(data: dict) -> dict[str, float]:
+    """Read the page's daily recommended values, falling back to DEFAULT_RDA."""
+    given = data.get('daily_rda') or {}
+    return {
+        'vitaminC': given.get('vitamin_c', DEFAULT_RDA['vitaminC']),
+        'iron': given.get('iron', DEFAULT_RDA['iron']),
+        'calcium': given.get('calcium', DEFAULT_RDA['calcium']),
+    }
+
+
+def summarize_day(meals: Iterable[dict], rda: dict[str, float]) -> dict[str, Any]:
+    """Total a day's nutrients and work out the macro split and share of each RDA.
+
+    Matches the calculation the meal planner page used to do in the browser.
+    """
+    totals = {nutrient: 0 for nutrient in NUTRIENTS}
+    for meal in meals:
+        for nutrient in NUTRIENTS:
+            totals[nutrient] += meal.get(nutrient) or 0
+    grams = totals['protein'] + totals['carbs'] + totals['fat']
+    return {
+        'totals': totals,
+        'macro_percent': {
+            macro: _round(totals[macro] / grams * 100) if grams else 0
+            for macro in ('protein', 'carbs', 'fat')
+        },
+        'rda_percent': {
+            nutrient: min(100, _round(totals[nutrient] / rda[nutrient] * 100)) if rda[nutrient] else 0
+            for nutrient in rda
+        },
+    }
+
+
+def build_lazy_meal_plan(data: dict) -> tuple[dict, dict[str, Any]]:
+    """Split weekly meal planner data into a small page shell and per-day resources.
+
+    Returns the template data for the shell and the resources to publish
+    next to it: days/<day>.json with that day's selected meals and
+    precomputed nutrition summary, and meals/<type>.json with the
+    alternatives offered when a meal is swapped. The first day's resource
+    is also inlined into the shell so the first paint needs no extra
+    request.
+    """
+    rda = daily_rda(data)
+    days = list(data.get('days') or [])
+    selected = data.get('selected_meals') or {}
+
+    resources: dict[str, Any] = {}
+    for day in days:
+        day_meals = selected.get(day.lower(), {})
+        resources[f"days/{day.lower()}.json"] = {
+            'day': day,
+            'meals': day_meals,
+            'summary': summarize_day(day_meals.values(), rda),
+        }
+    for meal_type, options in (data.get('meals') or {}).items():
+        resources[f"meals/{meal_type}.json"] = options
+
+    shell = {key: value for key, value in data.items() if key not in LAZY_KEYS}
+    shell['days'] = days
+    shell['rda'] = rda
+    shell['initial_day'] = resources[f"days/{days[0].lower()}.json"] if days else None
+    return shell, resources
@@ -0,0 +1,194 @@
+import math
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from mcp import types
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# A collector returns samples as (name, type, help, labels, value)
+Sample = tuple[str, str, str, dict, float]
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metrics:
+    """Counters, gauges and latency histograms, rendered in the Prometheus text format.
+
+    Values are kept per metric name and label set. boto3 reports its calls
+    from the AWS thread pool, so updates take a lock. Collectors added with
+    add_collector are called on every snapshot to report values that other
+    objects already count, such as cache hits.
+    """
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._families: dict[str, dict[str, Any]] = {}
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+
+    def describe(self, name: str, kind: str, help: str) -> None:
+        """Declare a metric's type ('counter', 'gauge' or 'histogram') and help text."""
+        with self._lock:
+            family = self._families.setdefault(name, {'type': kind, 'help': help, 'samples': {}})
+            family['type'], family['help'] = kind, help
+
+    def _samples(self, name: str, kind: str) -> dict:
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = {'type': kind, 'help': '', 'samples': {}}
+        return family['samples']
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """Add to a counter."""
+        key = _label_key(labels)
+        with self._lock:
+            samples = self._samples(name, 'counter')
+            samples[key] = samples.get(key, 0) + value
+
+    def add(self, name: str, value: float, **labels: Any) -> None:
+        """Move a gauge up or down."""
+        key = _label_key(labels)
+        with self._lock:
+            samples = self._samples(name, 'gauge')
+            samples[key] = samples.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """Record a duration in a histogram."""
+        key = _label_key(labels)
+        with self._lock:
+            samples = self._samples(name, 'histogram')
+            histogram = samples.get(key)
+            if histogram is None:
+                histogram = samples[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram['counts'][i] += 1
+                    break
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append(collector)
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        """Return every metric as JSON-safe families of samples, collectors included."""
+        families: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            for name, family in self._families.items():
+                samples = []
+                for key, value in family['samples'].items():
+                    if family['type'] == 'histogram':
+                        cumulative, buckets = 0, []
+                        for bound, count in zip(self.buckets, value['counts']):
+                            cumulative += count
+                            buckets.append([bound, cumulative])
+                        value = {'buckets': buckets, 'sum': value['sum'], 'count': value['count']}
+                    samples.append({'labels': dict(key), 'value': value})
+                families[name] = {'name': name, 'type': family['type'], 'help': family['help'], 'samples': samples}
+        for collector in self._collectors:
+            for name, kind, help, labels, value in collector():
+                family = families.setdefault(name, {'name': name, 'type': kind, 'help': help, 'samples': []})
+                family['samples'].append({'labels': {key: str(v) for key, v in labels.items()}, 'value': value})
+        return list(families.values())
+
+    def render(self) -> str:
+        return render([({}, self.snapshot())])
+
+
+def render(snapshots: Iterable[tuple[dict, list[dict[str, Any]]]]) -> str:
+    """Render snapshots in the Prometheus text format, adding each one's extra labels to its samples.
+
+    Several snapshots, e.g. one per worker process, share each metric's
+    HELP and TYPE lines.
+    """
+    families: dict[str, dict[str, Any]] = {}
+    for extra, snapshot in snapshots:
+        for family in snapshot:
+            merged = families.setdefault(family['name'], {**family, 'samples': []})
+            merged['samples'].extend(({**extra, **sample['labels']}, sample['value']) for sample in family['samples'])
+
+    lines = []
+    for name, family in families.items():
+        if not family['samples']:
+            continue
+        if family['help']:
+            lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for labels, value in family['samples']:
+            if family['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            for bound, count in value['buckets']:
+                lines.append(f"{name}_bucket{_format_labels({**labels, 'le': _format_value(float(bound))})} {count}")
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def _failed(result: Any) -> bool:
+    """Whether a tool call failed: FastMCP flagged an exception, or the tool returned an "Error ..." message."""
+    result = getattr(result, 'root', result)
+    if getattr(result, 'isError', False):
+        return True
+    content = getattr(result, 'content', None) or []
+    return bool(content) and isinstance(content[0], types.TextContent) and content[0].text.startswith('Error')
+
+
+def instrument_tool_calls(server: Any, metrics: Metrics) -> None:
+    """Time every tool call of a low-level MCP server and count calls, errors and calls in flight."""
+    metrics.describe('mcp_tool_calls_total', 'counter', "Tool calls by tool and status (ok or error).")
+    metrics.describe('mcp_tool_duration_seconds', 'histogram', "Time spent running each tool.")
+    metrics.describe('mcp_tool_in_flight', 'gauge', "Tool calls currently running.")
+    call_tool = server.request_handlers[types.CallToolRequest]
+
+    async def timed(request: types.CallToolRequest) -> Any:
+        tool = request.params.name
+        metrics.add('mcp_tool_in_flight', 1, tool=tool)
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            result = await call_tool(request)
+            if not _failed(result):
+                status = 'ok'
+            return result
+        finally:
+            metrics.observe('mcp_tool_duration_seconds', time.perf_counter() - started, tool=tool)
+            metrics.inc('mcp_tool_calls_total', tool=tool, status=status)
+            metrics.add('mcp_tool_in_flight', -1, tool=tool)
+
+    server.request_handlers[types.CallToolRequest] = timed
+
+
+def cache_samples(name: str, hits: int, misses: int) -> list[Sample]:
+    """Hit and miss counters and the hit rate of one cache, as collector samples."""
+    lookups = hits + misses
+    return [
+        ('cache_hits_total', 'counter', "Cache and local index lookups answered locally.", {'cache': name}, hits),
+        ('cache_misses_total', 'counter', "Cache and local index lookups that went upstream.", {'cache': name}, misses),
+        ('cache_hit_ratio', 'gauge', "Share of lookups answered locally.", {'cache': name},
+         round(hits / lookups, 4) if lookups else 0.0),
+    ]
@@ -6,8 +6,14 @@ st.set_page_config(page_title="CSV Editor", layout="wide")
 
 st.title("CSV Editor")
 
+def load_dataframe(uploaded_file):
+    """Read an uploaded CSV or Parquet export into a DataFrame."""
+    if uploaded_file.name.endswith(".parquet"):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file)
+
 # File uploader
-uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
+uploaded_file = st.file_uploader("Choose a CSV or Parquet file", type=["csv", "parquet"])
 
 # Initialize session state to store the dataframe and filename
 if "dataframe" not in st.session_state:
@@ -17,7 +23,7 @@ if "filename" not in st.session_state:
 
 if uploaded_file is not None:
     # Read the file and store in session state
-    st.session_state.dataframe = pd.read_csv(uploaded_file)
+    st.session_state.dataframe = load_dataframe(uploaded_file)
     st.session_state.filename = uploaded_file.name
     
     # Display file information
@@ -0,0 +1,244 @@
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+import os
+import secrets
+import socket
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+try:
+    import brotli
+except ImportError:
+    # Brotli is optional; without it pages are offered gzipped only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# How long a rendered page stays available
+PAGE_TTL_SECONDS = int(os.environ.get('PAGE_TTL_SECONDS', 3600))
+
+# Most pages kept in memory; the oldest are evicted first
+MAX_PAGES = int(os.environ.get('PAGE_SERVER_MAX_PAGES', 200))
+
+# Compression levels for published pages; brotli's default (11) takes ~100ms per page for a few percent smaller output
+GZIP_LEVEL = int(os.environ.get('PAGE_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('PAGE_BROTLI_QUALITY', 5))
+
+# Suffixes that give each encoding of a page its own ETag
+_ETAG_SUFFIXES = {'identity': '', 'gzip': '-gz', 'br': '-br'}
+
+
+@dataclass
+class Asset:
+    """A response body with its compressed variants, built once when published."""
+    body: bytes
+    content_type: str
+    digest: str
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest}{_ETAG_SUFFIXES[encoding]}"'
+
+
+@dataclass
+class Page:
+    """A rendered page and the JSON resources it loads, keyed by name ('' is the page itself)."""
+    assets: dict[str, Asset]
+    expires_at: float
+
+
+def _make_asset(body: bytes, content_type: str) -> Asset:
+    asset = Asset(body=body, content_type=content_type, digest=hashlib.sha256(body).hexdigest()[:32])
+    asset.encoded['gzip'] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if brotli is not None:
+        asset.encoded['br'] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    return asset
+
+
+def _make_assets(html: str, resources: dict[str, Any]) -> dict[str, Asset]:
+    """Encode and compress a page and its resources (CPU-bound; run off the event loop)."""
+    assets = {'': _make_asset(html.encode('utf-8'), 'text/html; charset=utf-8')}
+    for name, value in resources.items():
+        body = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        assets[name] = _make_asset(body, 'application/json')
+    return assets
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    """Return the encodings an Accept-Encoding header allows (ignoring ones with q=0)."""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class EmbeddedServer(uvicorn.Server):
+    """A uvicorn server run as a task on an event loop that belongs to something else.
+
+    Signals are left to the process's own server: uvicorn would otherwise
+    install its handlers for as long as this one runs and take SIGTERM away
+    from the server that should shut down gracefully.
+    """
+
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+
+
+class PageServer:
+    """One long-lived HTTP server that serves rendered pages from memory.
+
+    Pages are published under random IDs and served at /pages/<id>, along
+    with any JSON resources they load, until they expire. Each body is
+    compressed with gzip (and brotli, when the brotli package is installed)
+    when it is published, so requests only pick the best variant the client
+    accepts. Responses carry an ETag and conditional requests get a 304.
+    The server runs on the MCP server's event loop and is started by the
+    first publish. With ephemeral set (one page server per worker process)
+    it binds any free port instead of the configured one.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8001,
+                 ttl: int = PAGE_TTL_SECONDS, max_pages: int = MAX_PAGES):
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self.ephemeral = False
+        self.pages: OrderedDict[str, Page] = OrderedDict()
+        self._server: Optional[uvicorn.Server] = None
+        self._task: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self.requests = 0
+        self.not_modified = 0
+        self.evicted = 0
+        self.app = Starlette(routes=[
+            Route('/pages/{page_id}', self._serve_page, methods=['GET', 'HEAD']),
+            Route('/pages/{page_id}/{name:path}', self._serve_page, methods=['GET', 'HEAD']),
+        ])
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, port: Optional[int] = None) -> None:
+        """Start the server if it isn't running yet; the port is only used by the first start."""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.running:
+                return
+            if port is not None:
+                self.port = port
+            # Bind here so a busy port raises OSError; uvicorn would call sys.exit instead
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind((self.host, 0 if self.ephemeral else self.port))
+            except OSError:
+                sock.close()
+                raise
+            self.port = sock.getsockname()[1]
+            config = uvicorn.Config(self.app, log_level='warning', lifespan='off')
+            self._server = EmbeddedServer(config)
+            self._task = asyncio.create_task(self._server.serve(sockets=[sock]))
+            while not self._server.started:
+                if self._task.done():
+                    self._task.result()
+                    raise OSError(f"Page server could not start on {self.host}:{self.port}")
+                await asyncio.sleep(0.01)
+            logger.info(f"Page server listening on http://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        """Shut the server down, letting in-flight requests finish."""
+        if self.running:
+            self._server.should_exit = True
+            await self._task
+        self._task = None
+        self._server = None
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for page_id in [page_id for page_id, page in self.pages.items() if page.expires_at <= now]:
+            del self.pages[page_id]
+            self.evicted += 1
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+            self.evicted += 1
+
+    async def publish(self, html: str, resources: Optional[dict[str, Any]] = None) -> str:
+        """Store a rendered page and its resources, compress them, and return the page ID.
+
+        Each resource is serialized to compact JSON and served at
+        /pages/<id>/<name>, next to the page, for as long as the page lives.
+        Encoding and compression run in a worker thread, so concurrent
+        publishes don't hold up the event loop.
+        """
+        assets = await asyncio.to_thread(_make_assets, html, resources or {})
+        page_id = secrets.token_urlsafe(12)
+        self.pages[page_id] = Page(assets=assets, expires_at=time.monotonic() + self.ttl)
+        self._evict()
+        return page_id
+
+    def url(self, page_id: str) -> str:
+        return f"http://localhost:{self.port}/pages/{page_id}"
+
+    async def _serve_page(self, request: Request) -> Response:
+        self.requests += 1
+        self._evict()
+        page = self.pages.get(request.path_params['page_id'])
+        asset = page.assets.get(request.path_params.get('name', '')) if page else None
+        if asset is None:
+            return PlainTextResponse("Page not found or expired", status_code=404)
+
+        accepted = _accepted_encodings(request.headers.get('accept-encoding', ''))
+        encoding = next((name for name in ('br', 'gzip') if name in accepted and name in asset.encoded), 'identity')
+        headers = {
+            'ETag': asset.etag(encoding),
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': f"private, max-age={max(0, int(page.expires_at - time.monotonic()))}",
+        }
+
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            if '*' in tags or asset.etag(encoding) in tags:
+                self.not_modified += 1
+                return Response(status_code=304, headers=headers)
+
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        body = asset.encoded.get(encoding, asset.body)
+        if request.method == 'HEAD':
+            headers['Content-Length'] = str(len(body))
+            body = b''
+        return Response(body, media_type=asset.content_type, headers=headers)
+
+    def stats(self) -> dict[str, Any]:
+        self._evict()
+        return {
+            'running': self.running,
+            'url': f"http://localhost:{self.port}" if self.running else None,
+            'pages': len(self.pages),
+            'bytes': sum(len(asset.body) for page in self.pages.values() for asset in page.assets.values()),
+            'requests': self.requests,
+            'not_modified': self.not_modified,
+            'evicted': self.evicted,
+            'brotli': brotli is not None,
+        }
@@ -0,0 +1,114 @@
+import logging
+import os
+import time
+from typing import Any, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+logger = logging.getLogger(__name__)
+
+# Compiled templates are kept here so they survive restarts
+DEFAULT_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', '.jinja_cache')
+
+# In dev mode templates are re-read when their file changes on disk
+DEV_MODE = os.environ.get('TEMPLATE_AUTO_RELOAD', '').lower() in ('1', 'true', 'yes')
+
+
+class _CountingBytecodeCache(FileSystemBytecodeCache):
+    """Bytecode cache that counts whether compiled code was found on disk."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory)
+        self.hits = 0
+        self.misses = 0
+
+    def load_bytecode(self, bucket) -> None:
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+
+class TemplateRenderer:
+    """Shared Jinja2 environments that compile each template once.
+
+    There is one Environment with a FileSystemLoader per template directory,
+    so templates can include or extend their neighbours. Compiled templates
+    stay in memory and are written to a bytecode cache on disk, so a restart
+    skips the parse and compile. With auto_reload (TEMPLATE_AUTO_RELOAD=1) a
+    template is recompiled when its file's mtime changes; otherwise it is
+    loaded once per process.
+
+    render() times loading (which includes compiling on a miss) and
+    rendering separately; stats() reports both per template.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, auto_reload: bool = DEV_MODE):
+        self.cache_dir = cache_dir
+        self.auto_reload = auto_reload
+        self._bytecode_cache: Optional[_CountingBytecodeCache] = None
+        self._environments: dict[str, Environment] = {}
+        self._loaded: dict[str, Template] = {}
+        self.timings: dict[str, dict[str, float]] = {}
+
+    def _environment(self, directory: str) -> Environment:
+        env = self._environments.get(directory)
+        if env is None:
+            if self._bytecode_cache is None:
+                try:
+                    self._bytecode_cache = _CountingBytecodeCache(self.cache_dir)
+                except OSError as e:
+                    logger.error(f"Template bytecode cache disabled: {str(e)}")
+            env = Environment(
+                loader=FileSystemLoader(directory),
+                bytecode_cache=self._bytecode_cache,
+                auto_reload=self.auto_reload,
+            )
+            self._environments[directory] = env
+        return env
+
+    def render(self, template_path: str, data: dict) -> str:
+        """Render the template at template_path with data, compiling it only when needed."""
+        path = os.path.abspath(template_path)
+        directory, name = os.path.split(path)
+        env = self._environment(directory)
+
+        started = time.perf_counter()
+        template = env.get_template(name)
+        loaded = time.perf_counter()
+        html = template.render(**data)
+        rendered = time.perf_counter()
+
+        timing = self.timings.setdefault(path, {
+            'renders': 0, 'compiles': 0, 'compile_seconds': 0.0, 'render_seconds': 0.0,
+        })
+        timing['renders'] += 1
+        # A new Template object means it was just loaded from disk or bytecode and compiled
+        if self._loaded.get(path) is not template:
+            self._loaded[path] = template
+            timing['compiles'] += 1
+            timing['compile_seconds'] += loaded - started
+            timing['last_compile_seconds'] = round(loaded - started, 6)
+        timing['render_seconds'] += rendered - loaded
+        timing['last_render_seconds'] = round(rendered - loaded, 6)
+        return html
+
+    def stats(self) -> dict[str, Any]:
+        """Report compile and render time per template and bytecode cache hits."""
+        templates = {}
+        for path, timing in self.timings.items():
+            templates[os.path.relpath(path)] = {
+                **timing,
+                'compile_seconds': round(timing['compile_seconds'], 6),
+                'render_seconds': round(timing['render_seconds'], 6),
+                'average_render_seconds': round(timing['render_seconds'] / timing['renders'], 6),
+            }
+        return {
+            'auto_reload': self.auto_reload,
+            'cache_dir': self.cache_dir,
+            'bytecode_cache_hits': self._bytecode_cache.hits if self._bytecode_cache else 0,
+            'bytecode_cache_misses': self._bytecode_cache.misses if self._bytecode_cache else 0,
+            'templates': templates,
+        }
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# How long responses stay fresh, in seconds, per Spoonacular endpoint
+DEFAULT_TTLS = {
+    'complexSearch': 24 * 60 * 60,
+    'findByNutrients': 24 * 60 * 60,
+    'findByIngredients': 12 * 60 * 60,
+}
+
+# Parameters that hold comma-separated lists where order and case don't matter
+LIST_PARAMS = {
+    'cuisine',
+    'excludeCuisine',
+    'diet',
+    'intolerances',
+    'equipment',
+    'includeIngredients',
+    'excludeIngredients',
+    'ingredients',
+    'tags',
+}
+
+# Parameters that never take part in the cache key
+IGNORED_PARAMS = {'apiKey'}
+
+
+def _normalize_list(value: str) -> str:
+    """Normalize a comma-separated list (with optional | alternatives) into a stable form."""
+    parts = []
+    for part in value.split(','):
+        options = sorted({o.strip().lower() for o in part.split('|') if o.strip()})
+        if options:
+            parts.append('|'.join(options))
+    return ','.join(sorted(set(parts)))
+
+
+def _normalize_value(name: str, value: Any) -> Any:
+    """Normalize a single parameter value so equivalent requests share a key."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        if name in LIST_PARAMS:
+            return _normalize_list(value)
+        return value.strip()
+    return value
+
+
+def canonicalize_params(params: dict) -> dict:
+    """Return a canonical copy of search params: sorted keys, normalized lists, no apiKey."""
+    canonical = {}
+    for name in sorted(params):
+        if name in IGNORED_PARAMS or params[name] is None:
+            continue
+        value = _normalize_value(name, params[name])
+        if value == '':
+            continue
+        canonical[name] = value
+    return canonical
+
+
+def make_cache_key(endpoint: str, params: dict) -> str:
+    """Build the cache key for an endpoint and its search params."""
+    canonical = json.dumps(canonicalize_params(params), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{endpoint}?{canonical}".encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Disk-backed cache of Spoonacular responses with per-endpoint TTLs and LRU eviction.
+
+    Entries live in a SQLite file (SPOONACULAR_CACHE_PATH, default
+    .spoonacular_cache.sqlite3) and the least recently used ones are evicted
+    once more than SPOONACULAR_CACHE_MAX_ENTRIES are stored. With
+    SPOONACULAR_OFFLINE=1 callers should answer from stored entries only,
+    including expired ones, and never touch the network.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        ttls: Optional[dict] = None,
+        offline: Optional[bool] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.path = path or os.environ.get('SPOONACULAR_CACHE_PATH', '.spoonacular_cache.sqlite3')
+        self.max_entries = max_entries or int(os.environ.get('SPOONACULAR_CACHE_MAX_ENTRIES', 5000))
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        if offline is None:
+            offline = os.environ.get('SPOONACULAR_OFFLINE', '0') == '1'
+        if enabled is None:
+            enabled = os.environ.get('SPOONACULAR_CACHE', '1') != '0'
+        self.offline = offline
+        self.enabled = enabled or offline
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite database on first use."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, body TEXT NOT NULL, '
+                'created_at REAL NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def is_cacheable(self, endpoint: str, params: dict) -> bool:
+        """Random result sets are never cached."""
+        return self.enabled and endpoint in self.ttls and not params.get('random')
+
+    def get(self, endpoint: str, params: dict) -> Optional[str]:
+        """Return the cached response body, or None on a miss.
+
+        Expired entries count as misses unless the cache is in offline mode.
+        """
+        if not self.is_cacheable(endpoint, params):
+            return None
+        key = make_cache_key(endpoint, params)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute('SELECT body, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+                if row is None or (row[1] < now and not self.offline):
+                    self.misses += 1
+                    return None
+                conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+                conn.commit()
+                self.hits += 1
+                if row[1] < now:
+                    self.stale_hits += 1
+                return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error reading response cache: {str(e)}")
+            return None
+
+    def set(self, endpoint: str, params: dict, body: str) -> None:
+        """Store a response body and evict the least recently used entries over the cap."""
+        if not self.is_cacheable(endpoint, params):
+            return
+        key = make_cache_key(endpoint, params)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, endpoint, body, created_at, expires_at, last_access) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, endpoint, body, now, now + self.ttls[endpoint], now),
+                )
+                (count,) = conn.execute('SELECT COUNT(*) FROM responses').fetchone()
+                if count > self.max_entries:
+                    overflow = count - self.max_entries
+                    conn.execute(
+                        'DELETE FROM responses WHERE key IN '
+                        '(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)',
+                        (overflow,),
+                    )
+                    self.evictions += overflow
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing response cache: {str(e)}")
+
+    def iter_bodies(self, endpoints: tuple[str, ...]) -> list[tuple[str, str]]:
+        """Return (endpoint, body) for every stored response of the given endpoints, expired ones included."""
+        placeholders = ','.join('?' * len(endpoints))
+        try:
+            with self._lock:
+                return self._connect().execute(
+                    f'SELECT endpoint, body FROM responses WHERE endpoint IN ({placeholders})', endpoints
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading response cache: {str(e)}")
+            return []
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM responses')
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the number of stored entries."""
+        with self._lock:
+            try:
+                (entries,) = self._connect().execute('SELECT COUNT(*) FROM responses').fetchone()
+            except sqlite3.Error:
+                entries = None
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'offline': self.offline,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,289 @@
+import json
+import logging
+import math
+import random
+import threading
+import time
+from array import array
+from typing import Any, Iterable, Optional
+
+try:
+    import numpy
+except ImportError:
+    # Without numpy the index stays empty and every search goes to the API
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# Endpoints whose responses carry per-recipe nutrient amounts
+INDEXED_ENDPOINTS = ('complexSearch', 'findByNutrients')
+
+# findByNutrients parameters the index understands besides min*/max* bounds
+PAGING_PARAMS = {'number', 'offset', 'random'}
+
+# Recipe fields kept so local results look like findByNutrients results
+SUMMARY_FIELDS = ('id', 'title', 'image', 'imageType')
+
+# The macros findByNutrients always returns, with their units
+MACRO_UNITS = {'calories': '', 'protein': 'g', 'fat': 'g', 'carbs': 'g'}
+
+
+def nutrient_key(name: str) -> str:
+    """Normalize a nutrient name so "Saturated Fat", "saturatedFat" and "minSaturatedFat" agree."""
+    key = name.replace(' ', '').lower()
+    return 'carbs' if key == 'carbohydrates' else key
+
+
+def display_name(name: str) -> str:
+    """Turn a complexSearch nutrient name like "Saturated Fat" into findByNutrients' saturatedFat."""
+    if nutrient_key(name) == 'carbs':
+        return 'carbs'
+    words = name.split()
+    if len(words) == 1:
+        return name[:1].lower() + name[1:]
+    return words[0].lower() + ''.join(word[:1].upper() + word[1:] for word in words[1:])
+
+
+def _parse_amount(value: Any) -> tuple[Optional[float], str]:
+    """Split findByNutrients values like "25g" or 210 into an amount and a unit."""
+    if isinstance(value, bool) or value is None:
+        return None, ''
+    if isinstance(value, (int, float)):
+        return float(value), ''
+    text = str(value).strip()
+    end = len(text)
+    while end and not (text[end - 1].isdigit() or text[end - 1] == '.'):
+        end -= 1
+    try:
+        return float(text[:end]), text[end:]
+    except ValueError:
+        return None, ''
+
+
+def _format_amount(amount: float, unit: str) -> Any:
+    if not unit:
+        return int(amount) if amount.is_integer() else amount
+    return f"{amount:g}{unit}"
+
+
+class RecipeIndex:
+    """In-memory store of recipe nutrients with range queries over any set of nutrients.
+
+    Recipes are collected from complexSearch (with nutrition) and
+    findByNutrients responses. Each nutrient is one array('d') column with
+    NaN where a recipe's amount is unknown, so thousands of recipes take a
+    few hundred kilobytes. Queries use a sorted copy of each column: every
+    bound is turned into a slice with a binary search, the narrowest slice
+    is taken as the candidate set, and the other bounds are checked against
+    just those rows. Sorted columns are rebuilt lazily after new recipes
+    arrive.
+    """
+
+    def __init__(self):
+        self.enabled = numpy is not None
+        self._lock = threading.Lock()
+        # Held for the whole of load(), so concurrent callers wait for the first one to finish
+        self._load_lock = threading.Lock()
+        self._rows: list[dict] = []
+        self._row_by_id: dict[Any, int] = {}
+        self._columns: dict[str, array] = {}
+        self._units: dict[str, str] = dict(MACRO_UNITS)
+        self._names: dict[str, str] = {}
+        self._sorted: dict[str, tuple[Any, Any]] = {}
+        self._values: dict[str, Any] = {}
+        self._formatted_rows: dict[int, dict] = {}
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.unsupported = 0
+        self.query_seconds = 0.0
+
+    def _row(self, recipe: dict) -> Optional[int]:
+        recipe_id = recipe.get('id')
+        if recipe_id is None:
+            return None
+        row = self._row_by_id.get(recipe_id)
+        if row is None:
+            row = len(self._rows)
+            self._row_by_id[recipe_id] = row
+            self._rows.append({field: recipe.get(field) for field in SUMMARY_FIELDS})
+            for column in self._columns.values():
+                column.append(math.nan)
+        return row
+
+    def _set(self, row: int, label: str, amount: float, unit: str) -> None:
+        name = nutrient_key(label)
+        self._names.setdefault(name, display_name(label))
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = array('d', [math.nan]) * len(self._rows)
+        column[row] = amount
+        if unit:
+            self._units.setdefault(name, unit)
+        self._sorted.pop(name, None)
+        self._values.pop(name, None)
+        self._formatted_rows.pop(row, None)
+
+    def add_recipes(self, endpoint: str, data: Any) -> int:
+        """Index the recipes in a complexSearch or findByNutrients response; return how many had nutrients."""
+        if not self.enabled or endpoint not in INDEXED_ENDPOINTS:
+            return 0
+        recipes = data.get('results', []) if isinstance(data, dict) else data
+        added = 0
+        with self._lock:
+            for recipe in recipes or []:
+                if not isinstance(recipe, dict):
+                    continue
+                nutrients = (recipe.get('nutrition') or {}).get('nutrients')
+                if endpoint == 'complexSearch' and not nutrients:
+                    continue
+                row = self._row(recipe)
+                if row is None:
+                    continue
+                if nutrients:
+                    for nutrient in nutrients:
+                        amount = nutrient.get('amount')
+                        if isinstance(amount, (int, float)) and nutrient.get('name'):
+                            self._set(row, nutrient['name'], float(amount), nutrient.get('unit', ''))
+                else:
+                    for name, value in recipe.items():
+                        if name in SUMMARY_FIELDS:
+                            continue
+                        amount, unit = _parse_amount(value)
+                        if amount is not None:
+                            self._set(row, name, amount, unit)
+                added += 1
+        return added
+
+    def load(self, responses: Iterable[tuple[str, str]]) -> None:
+        """Index cached response bodies once, e.g. from ResponseCache.iter_bodies().
+
+        Callers that arrive while another thread is loading block until it
+        has finished; loaded is only set once every body is indexed.
+        """
+        with self._load_lock:
+            if self.loaded or not self.enabled:
+                return
+            started = time.perf_counter()
+            count = 0
+            for endpoint, body in responses:
+                try:
+                    count += self.add_recipes(endpoint, json.loads(body))
+                except ValueError as e:
+                    logger.error(f"Skipping unreadable cached response: {str(e)}")
+            self.loaded = True
+        logger.info(f"Indexed {count} cached recipes in {time.perf_counter() - started:.3f}s")
+
+    def _sorted_column(self, name: str):
+        """Return (row order, sorted values) for a column, leaving out unknown amounts."""
+        entry = self._sorted.get(name)
+        if entry is None:
+            values = self._values[name] = numpy.frombuffer(self._columns[name], dtype=numpy.float64).copy()
+            known = numpy.flatnonzero(~numpy.isnan(values))
+            order = known[numpy.argsort(values[known], kind='stable')]
+            entry = self._sorted[name] = (order, values[order])
+        return entry
+
+    @staticmethod
+    def parse_bounds(params: dict) -> Optional[dict[str, tuple[float, float]]]:
+        """Turn min*/max* search params into {nutrient: (low, high)}, or None if a param isn't understood."""
+        bounds: dict[str, list[float]] = {}
+        for name, value in params.items():
+            if name in PAGING_PARAMS or value is None:
+                continue
+            if name[:3] not in ('min', 'max') or len(name) <= 3 or isinstance(value, bool):
+                return None
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return None
+            low_high = bounds.setdefault(nutrient_key(name[3:]), [-math.inf, math.inf])
+            low_high[0 if name.startswith('min') else 1] = value
+        return {name: (low, high) for name, (low, high) in bounds.items()}
+
+    def search(self, params: dict, allow_partial: bool = False) -> Optional[list[dict]]:
+        """Answer a findByNutrients search locally.
+
+        Returns results shaped like findByNutrients', or None when the search
+        has to go to the API: a parameter the index can't evaluate, or fewer
+        local matches than requested (unless allow_partial is set, e.g. in
+        offline mode).
+        """
+        if not self.enabled:
+            return None
+        bounds = self.parse_bounds(params)
+        if bounds is None:
+            self.unsupported += 1
+            return None
+        number = int(params.get('number') or 10)
+        offset = int(params.get('offset') or 0)
+
+        started = time.perf_counter()
+        with self._lock:
+            if not self._rows or any(name not in self._columns for name in bounds):
+                matches = numpy.empty(0, dtype=numpy.intp)
+            elif not bounds:
+                matches = numpy.arange(len(self._rows))
+            else:
+                # Binary-search every bound, then start from the narrowest one
+                ranges = []
+                for name, (low, high) in bounds.items():
+                    order, values = self._sorted_column(name)
+                    start = values.searchsorted(low, side='left')
+                    stop = values.searchsorted(high, side='right')
+                    ranges.append((stop - start, name, order[start:stop]))
+                ranges.sort(key=lambda r: r[0])
+                matches = ranges[0][2]
+                for _, name, _ in ranges[1:]:
+                    if not len(matches):
+                        break
+                    low, high = bounds[name]
+                    values = self._values[name][matches]
+                    matches = matches[(values >= low) & (values <= high)]
+                matches = numpy.sort(matches)
+
+            if params.get('random'):
+                matches = numpy.array(random.sample(matches.tolist(), len(matches)), dtype=numpy.intp)
+            if len(matches) < offset + number and not allow_partial:
+                self.misses += 1
+                self.query_seconds += time.perf_counter() - started
+                return None
+            results = [self._result(row, bounds) for row in matches[offset:offset + number].tolist()]
+        self.hits += 1
+        self.query_seconds += time.perf_counter() - started
+        return results
+
+    def _formatted(self, row: int) -> dict[str, Any]:
+        """Return a row's summary fields and every known nutrient, formatted like findByNutrients does."""
+        formatted = self._formatted_rows.get(row)
+        if formatted is None:
+            formatted = {key: value for key, value in self._rows[row].items() if value is not None}
+            for name, column in self._columns.items():
+                if not math.isnan(column[row]):
+                    formatted[name] = (self._names.get(name, name), _format_amount(column[row], self._units.get(name, '')))
+            self._formatted_rows[row] = formatted
+        return formatted
+
+    def _result(self, row: int, bounds: dict) -> dict:
+        """Build a result with the summary, the macros and the nutrients the search constrained."""
+        formatted = self._formatted(row)
+        result = {field: formatted[field] for field in SUMMARY_FIELDS if field in formatted}
+        for name in (*MACRO_UNITS, *bounds):
+            if name in formatted:
+                label, value = formatted[name]
+                result[label] = value
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        """Report how many recipes and nutrients are indexed and how often searches were answered locally."""
+        queries = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'recipes': len(self._rows),
+            'nutrients': len(self._columns),
+            'bytes': sum(column.itemsize * len(column) for column in self._columns.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'unsupported': self.unsupported,
+            'average_query_microseconds': round(self.query_seconds / queries * 1e6, 1) if queries else 0.0,
+        }
@@ -0,0 +1,103 @@
+import json
+from typing import Any, Optional, Union
+
+from mcp.types import TextContent
+
+try:
+    import orjson
+except ImportError:
+    # Without orjson compact responses are encoded with the json module
+    orjson = None
+
+# Keys of a complexSearch envelope that are kept as they are when projecting
+ENVELOPE_KEYS = ('offset', 'number', 'totalResults', 'pages', 'failed_offsets')
+
+
+def _field_tree(fields: list[str]) -> dict:
+    """Turn dotted field paths into a tree; None marks a field that is kept whole."""
+    tree: dict = {}
+    for field in fields:
+        node = tree
+        parts = [part.strip() for part in field.split('.') if part.strip()]
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:
+                break
+            node = node.setdefault(part, child)
+        else:
+            if parts:
+                node[parts[-1]] = None
+    return tree
+
+
+def _project(value: Any, tree: Optional[dict]) -> Any:
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def project(data: Any, fields: list[str]) -> Any:
+    """Keep only the given fields of every recipe in a search response.
+
+    Fields are recipe keys, with dots reaching into nested objects and
+    lists, e.g. "title", "nutrition.nutrients" or "extendedIngredients.name".
+    A complexSearch envelope keeps its paging keys and projects its results.
+    """
+    tree = _field_tree(fields)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        projected = {key: data[key] for key in ENVELOPE_KEYS if key in data}
+        projected['results'] = _project(data['results'], tree)
+        return projected
+    return _project(data, tree)
+
+
+def dumps_compact(data: Any) -> str:
+    """Encode JSON without whitespace, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def recipe_response(
+    data: Any = None,
+    body: Optional[str] = None,
+    fields: Optional[list[str]] = None,
+    compact: bool = False,
+) -> Union[str, list[TextContent]]:
+    """Encode a recipe tool's result, given as parsed data or as the upstream body.
+
+    Without fields or compact this is the indented JSON the tools have
+    always returned. Otherwise the projected (and, with compact, unindented)
+    JSON is returned as a ready TextContent so FastMCP passes it on as is,
+    followed by a second one reporting its size against the full compact
+    result. A compact response without fields is the upstream body itself,
+    with no parsing or encoding at all.
+    """
+    if body is not None and (fields or not compact):
+        data = json.loads(body)
+    if not fields and not compact:
+        return json.dumps(data, indent=2)
+
+    if fields:
+        projected = project(data, fields)
+        text = dumps_compact(projected) if compact else json.dumps(projected, indent=2)
+    else:
+        text = body if body is not None else dumps_compact(data)
+    full = body if body is not None else dumps_compact(data) if fields else text
+
+    size = len(text.encode('utf-8'))
+    full_size = len(full.encode('utf-8'))
+    report = {
+        'bytes': size,
+        'full_bytes': full_size,
+        'saved_bytes': full_size - size,
+        'saved_percent': round((full_size - size) / full_size * 100, 1) if full_size else 0.0,
+    }
+    return [
+        TextContent(type='text', text=text),
+        TextContent(type='text', text=json.dumps({'response_size': report})),
+    ]
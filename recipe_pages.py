@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import math
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# complexSearch returns at most this many results per call
+PAGE_SIZE = 100
+
+# complexSearch rejects offsets past this, so at most MAX_OFFSET + PAGE_SIZE results are reachable
+MAX_OFFSET = 900
+
+# Pages requested at the same time when auto-paginating
+PAGE_CONCURRENCY = int(os.environ.get('SPOONACULAR_PAGE_CONCURRENCY', 5))
+
+
+async def fetch_pages(
+    fetch: Callable[[dict], Awaitable[Any]],
+    params: dict,
+    max_results: int,
+    concurrency: int = PAGE_CONCURRENCY,
+    on_batch: Optional[Callable[[int, int, list[dict]], Awaitable[None]]] = None,
+) -> dict[str, Any]:
+    """Fetch up to max_results complexSearch results, requesting the pages concurrently.
+
+    Pages start at params' offset and are fetched with fetch(page_params),
+    at most concurrency at a time. Once a page comes back short, or
+    totalResults says so, pages past the end are skipped instead of
+    requested. Results are merged in offset order with duplicate recipe
+    IDs dropped. on_batch(received, expected, results) is awaited as each
+    page arrives, with the number of distinct recipes received so far.
+
+    A page that fails is logged and reported in failed_offsets; the other
+    pages are still returned. If every page fails, the first error is raised.
+    """
+    start = int(params.get('offset') or 0)
+    stop = min(start + max_results, MAX_OFFSET + PAGE_SIZE)
+    offsets = list(range(start, stop, PAGE_SIZE))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    pages: dict[int, list[dict]] = {}
+    errors: dict[int, Exception] = {}
+    end = math.inf
+    total = None
+    expected = stop - start
+    received: set = set()
+
+    async def load(offset: int) -> None:
+        nonlocal end, total, expected
+        async with semaphore:
+            if offset >= end:
+                return
+            number = min(PAGE_SIZE, stop - offset)
+            try:
+                data = await fetch({**params, 'offset': offset, 'number': number})
+            except Exception as e:
+                logger.error(f"Error fetching recipes at offset {offset}: {str(e)}")
+                errors[offset] = e
+                return
+            results = data.get('results') or []
+            pages[offset] = results
+            if isinstance(data.get('totalResults'), int):
+                total = data['totalResults']
+                end = min(end, total)
+            if len(results) < number:
+                end = min(end, offset + len(results))
+            expected = max(0, min(stop, end) - start)
+            received.update(recipe.get('id') for recipe in results)
+            if on_batch is not None:
+                await on_batch(len(received), max(expected, len(received)), results)
+
+    await asyncio.gather(*(load(offset) for offset in offsets))
+    if errors and not pages:
+        raise errors[min(errors)]
+
+    merged, seen = [], set()
+    for offset in sorted(pages):
+        for recipe in pages[offset]:
+            recipe_id = recipe.get('id')
+            if recipe_id is not None and recipe_id in seen:
+                continue
+            seen.add(recipe_id)
+            merged.append(recipe)
+    result = {
+        'results': merged[:max_results],
+        'offset': start,
+        'number': min(len(merged), max_results),
+        'totalResults': total,
+        'pages': len(pages),
+    }
+    if errors:
+        result['failed_offsets'] = sorted(errors)
+    return result
@@ -0,0 +1,404 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# S3 limits: parts must be at least 5 MB (except the last) and there can be at most 10,000
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+
+DEFAULT_PART_SIZE = 64 * MB
+DEFAULT_CONCURRENCY = 8
+
+# Files larger than this use the resumable multipart path by default
+LARGE_FILE_THRESHOLD = 100 * MB
+
+DEFAULT_STATE_DIR = os.environ.get('S3_UPLOAD_STATE_DIR', '.s3_uploads')
+
+
+class ChecksumMismatch(Exception):
+    """Raised when S3 reports a different checksum than the one computed for a part."""
+
+
+def choose_part_size(file_size: int, part_size: int = DEFAULT_PART_SIZE) -> int:
+    """Clamp the part size to S3's limits for a file of the given size."""
+    part_size = max(part_size, MIN_PART_SIZE)
+    while file_size > part_size * MAX_PARTS:
+        part_size *= 2
+    return part_size
+
+
+def _state_path(state_dir: str, file_path: str, bucket: str, key: str) -> str:
+    digest = hashlib.sha256(f"{os.path.abspath(file_path)}|{bucket}|{key}".encode('utf-8')).hexdigest()[:32]
+    return os.path.join(state_dir, f"{digest}.json")
+
+
+def _load_state(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(f"Ignoring unreadable upload state {path}: {str(e)}")
+        return None
+
+
+def _save_state(path: str, state: dict) -> None:
+    """Write the upload state atomically so a crash never leaves it half-written."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+def _list_uploaded_parts(client, bucket: str, key: str, upload_id: str) -> dict[int, dict]:
+    """Return the parts S3 already holds for an upload, keyed by part number (blocking)."""
+    parts = {}
+    kwargs = {'Bucket': bucket, 'Key': key, 'UploadId': upload_id}
+    while True:
+        response = client.list_parts(**kwargs)
+        for part in response.get('Parts', []):
+            parts[part['PartNumber']] = part
+        if not response.get('IsTruncated'):
+            return parts
+        kwargs['PartNumberMarker'] = response['NextPartNumberMarker']
+
+
+def _upload_part(client, file_path, bucket, key, upload_id, part_number, offset, size) -> dict:
+    """Read one part from disk, upload it with a SHA-256 checksum and verify S3's answer (blocking)."""
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(size)
+    checksum = base64.b64encode(hashlib.sha256(data).digest()).decode('ascii')
+    response = client.upload_part(
+        Bucket=bucket,
+        Key=key,
+        UploadId=upload_id,
+        PartNumber=part_number,
+        Body=data,
+        ChecksumAlgorithm='SHA256',
+        ChecksumSHA256=checksum,
+    )
+    returned = response.get('ChecksumSHA256')
+    if returned and returned != checksum:
+        raise ChecksumMismatch(f"Part {part_number} checksum mismatch: sent {checksum}, S3 stored {returned}")
+    return {'PartNumber': part_number, 'ETag': response['ETag'], 'ChecksumSHA256': checksum, 'Size': size}
+
+
+async def upload_large_file(
+    aws,
+    file_path: str,
+    bucket: str,
+    key: str,
+    part_size: int = DEFAULT_PART_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    state_dir: str = DEFAULT_STATE_DIR,
+) -> dict[str, Any]:
+    """Upload a file to S3 as a parallel, resumable multipart upload.
+
+    Parts are uploaded concurrently through aws.run, each with a SHA-256
+    checksum that S3 verifies on receipt. After every part the upload ID and
+    completed parts are saved under state_dir, so if the upload is
+    interrupted the next call for the same file, bucket and key picks up
+    from the last completed part instead of starting over. The state is
+    discarded if the file changed size or modification time.
+
+    Up to concurrency * part_size bytes are held in memory at once.
+
+    Args:
+        aws: AwsBootstrap providing client() and run()
+        file_path: Local path to the file to upload
+        bucket: Name of the S3 bucket
+        key: Object key to upload to
+        part_size: Size of each part in bytes (raised if needed to stay within S3's limits)
+        concurrency: Number of parts to upload at the same time
+        on_progress: Optional coroutine called with (bytes_uploaded, total_bytes) after each part
+        state_dir: Directory where resumable upload state is kept
+    """
+    stat = os.stat(file_path)
+    file_size = stat.st_size
+    state_path = _state_path(state_dir, file_path, bucket, key)
+    state = _load_state(state_path)
+    if state and (state['file_size'] != file_size or state['file_mtime'] != stat.st_mtime):
+        logger.info(f"{file_path} changed since the interrupted upload, starting over")
+        state = None
+
+    completed: dict[int, dict] = {}
+    if state:
+        # Trust S3 over the local state for which parts actually arrived
+        try:
+            uploaded = await aws.run('s3', lambda: _list_uploaded_parts(aws.client('s3'), bucket, key, state['upload_id']))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchUpload':
+                raise
+            logger.info(f"Upload {state['upload_id']} no longer exists, starting over")
+            state = None
+        else:
+            for number, part in state['parts'].items():
+                remote = uploaded.get(int(number))
+                if remote and remote['ETag'] == part['ETag'] and remote['Size'] == part['Size']:
+                    completed[int(number)] = part
+
+    if not state:
+        part_size = choose_part_size(file_size, part_size)
+        response = await aws.run(
+            's3', lambda: aws.client('s3').create_multipart_upload(Bucket=bucket, Key=key, ChecksumAlgorithm='SHA256')
+        )
+        state = {
+            'upload_id': response['UploadId'],
+            'bucket': bucket,
+            'key': key,
+            'file_size': file_size,
+            'file_mtime': stat.st_mtime,
+            'part_size': part_size,
+            'parts': {},
+        }
+        _save_state(state_path, state)
+    part_size = state['part_size']
+    upload_id = state['upload_id']
+
+    part_count = max(1, -(-file_size // part_size))
+    resumed_bytes = sum(part['Size'] for part in completed.values())
+    uploaded_bytes = resumed_bytes
+    if on_progress:
+        await on_progress(uploaded_bytes, file_size)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    started = time.perf_counter()
+
+    async def upload(part_number: int) -> None:
+        nonlocal uploaded_bytes
+        offset = (part_number - 1) * part_size
+        size = min(part_size, file_size - offset)
+        async with semaphore:
+            part = await aws.run(
+                's3',
+                lambda: _upload_part(aws.client('s3'), file_path, bucket, key, upload_id, part_number, offset, size),
+            )
+        completed[part_number] = part
+        state['parts'][str(part_number)] = part
+        _save_state(state_path, state)
+        uploaded_bytes += size
+        if on_progress:
+            await on_progress(uploaded_bytes, file_size)
+
+    # A failed part cancels the rest; the parts already saved are resumed next time
+    pending = [n for n in range(1, part_count + 1) if n not in completed]
+    try:
+        async with asyncio.TaskGroup() as group:
+            for part_number in pending:
+                group.create_task(upload(part_number))
+    except* Exception as errors:
+        raise errors.exceptions[0]
+
+    parts = [
+        {'PartNumber': n, 'ETag': completed[n]['ETag'], 'ChecksumSHA256': completed[n]['ChecksumSHA256']}
+        for n in sorted(completed)
+    ]
+    response = await aws.run(
+        's3',
+        lambda: aws.client('s3').complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+        ),
+    )
+    os.remove(state_path)
+
+    elapsed = time.perf_counter() - started
+    sent = file_size - resumed_bytes
+    return {
+        'bucket': bucket,
+        'key': key,
+        'etag': response.get('ETag'),
+        'size': file_size,
+        'parts': part_count,
+        'part_size': part_size,
+        'resumed_parts': part_count - len(pending),
+        'seconds': round(elapsed, 3),
+        'throughput_mb_s': round(sent / MB / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+def _hash_file(path: str, part_size: Optional[int] = None) -> tuple[str, Optional[str]]:
+    """Return the file's MD5 and, if part_size is given, the ETag S3 gives a multipart upload of it (blocking)."""
+    whole = hashlib.md5()
+    part_digests = []
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(part_size or 8 * MB)
+            if not chunk:
+                break
+            whole.update(chunk)
+            if part_size:
+                part_digests.append(hashlib.md5(chunk).digest())
+    multipart_etag = None
+    if part_size:
+        multipart_etag = f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+    return whole.hexdigest(), multipart_etag
+
+
+def _list_remote(client, bucket: str, prefix: str) -> dict[str, dict]:
+    """Return the ETag and size of every object under a prefix, keyed by object key (blocking)."""
+    objects = {}
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            objects[obj['Key']] = {'etag': obj['ETag'].strip('"'), 'size': obj['Size']}
+    return objects
+
+
+def _walk(directory: str) -> list[tuple[str, str, os.stat_result]]:
+    """List (relative path, full path, stat) for every regular file under a directory, skipping hidden files."""
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(names):
+            if name.startswith('.'):
+                continue
+            full_path = os.path.join(root, name)
+            stat = os.stat(full_path)
+            relative = os.path.relpath(full_path, directory).replace(os.sep, '/')
+            files.append((relative, full_path, stat))
+    return files
+
+
+async def sync_directory(
+    aws,
+    directory: str,
+    bucket: str,
+    prefix: str = '',
+    concurrency: int = 4,
+    refresh: bool = False,
+    dry_run: bool = False,
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    state_dir: str = DEFAULT_STATE_DIR,
+) -> dict[str, Any]:
+    """Upload the new and changed files in a directory to S3 under a prefix.
+
+    A manifest of what was uploaded (size, modification time, MD5 and the
+    ETag S3 returned) is cached under state_dir for each bucket and prefix.
+    Files whose size and modification time match the manifest are skipped
+    without being read; files that were only touched are hashed and skipped
+    if their content is the same. The remote listing is only fetched when
+    there is no manifest yet or refresh is set, and entries whose remote
+    ETag no longer matches are dropped so those files upload again.
+
+    Files are uploaded concurrently; those over LARGE_FILE_THRESHOLD use
+    upload_large_file. Remote objects with no local file are left alone.
+    A failed file is reported without stopping the rest.
+    """
+    prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+    manifest_path = os.path.join(
+        state_dir, 'manifests', hashlib.sha256(f"{bucket}|{prefix}".encode('utf-8')).hexdigest()[:32] + '.json'
+    )
+    manifest = _load_state(manifest_path)
+    entries: dict[str, dict] = manifest['files'] if manifest else {}
+
+    remote: Optional[dict[str, dict]] = None
+    if manifest is None or refresh:
+        remote = await aws.run('s3', lambda: _list_remote(aws.client('s3'), bucket, prefix))
+        entries = {
+            relative: entry for relative, entry in entries.items()
+            if remote.get(prefix + relative, {}).get('etag') == entry['etag']
+        }
+    manifest = {'bucket': bucket, 'prefix': prefix, 'files': entries}
+
+    local_files = await asyncio.to_thread(_walk, directory)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    uploaded: list[str] = []
+    failed: dict[str, str] = {}
+    unchanged = 0
+    uploaded_bytes = 0
+    done = 0
+    started = time.perf_counter()
+
+    async def sync_file(relative: str, file_path: str, stat: os.stat_result) -> None:
+        nonlocal unchanged, uploaded_bytes, done
+        key = prefix + relative
+        entry = entries.get(relative)
+        try:
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                unchanged += 1
+                return
+            async with semaphore:
+                remote_object = remote.get(key) if remote and not entry else None
+                part_size = None
+                if remote_object and remote_object['size'] == stat.st_size and '-' in remote_object['etag']:
+                    # The first part's length tells us how the remote multipart ETag was computed
+                    head = await aws.run(
+                        's3', lambda: aws.client('s3').head_object(Bucket=bucket, Key=key, PartNumber=1)
+                    )
+                    part_size = head['ContentLength']
+                md5, multipart_etag = await asyncio.to_thread(_hash_file, file_path, part_size)
+
+                remote_etag = None
+                if entry and entry['size'] == stat.st_size and entry['md5'] == md5:
+                    remote_etag = entry['etag']
+                elif remote_object and remote_object['size'] == stat.st_size \
+                        and remote_object['etag'] in (md5, multipart_etag):
+                    remote_etag = remote_object['etag']
+                if remote_etag is not None:
+                    unchanged += 1
+                elif dry_run:
+                    uploaded.append(key)
+                    return
+                elif stat.st_size > LARGE_FILE_THRESHOLD:
+                    result = await upload_large_file(aws, file_path, bucket, key, state_dir=state_dir)
+                    remote_etag = result['etag'].strip('"')
+                    uploaded.append(key)
+                    uploaded_bytes += stat.st_size
+                else:
+                    def put():
+                        with open(file_path, 'rb') as f:
+                            return aws.client('s3').put_object(
+                                Bucket=bucket,
+                                Key=key,
+                                Body=f,
+                                ContentMD5=base64.b64encode(bytes.fromhex(md5)).decode('ascii'),
+                            )
+                    response = await aws.run('s3', put)
+                    remote_etag = response['ETag'].strip('"')
+                    uploaded.append(key)
+                    uploaded_bytes += stat.st_size
+
+            if not dry_run:
+                entries[relative] = {
+                    'size': stat.st_size, 'mtime': stat.st_mtime, 'md5': md5, 'etag': remote_etag,
+                }
+                _save_state(manifest_path, manifest)
+        except Exception as e:
+            logger.error(f"Failed to sync {file_path} to s3://{bucket}/{key}: {str(e)}")
+            failed[key] = str(e)
+        finally:
+            done += 1
+            if on_progress:
+                await on_progress(done, len(local_files))
+
+    async with asyncio.TaskGroup() as group:
+        for relative, file_path, stat in local_files:
+            group.create_task(sync_file(relative, file_path, stat))
+
+    if not dry_run:
+        _save_state(manifest_path, manifest)
+    elapsed = time.perf_counter() - started
+    return {
+        'bucket': bucket,
+        'prefix': prefix,
+        'files': len(local_files),
+        'uploaded': sorted(uploaded),
+        'unchanged': unchanged,
+        'failed': failed,
+        'uploaded_bytes': uploaded_bytes,
+        'seconds': round(elapsed, 3),
+        'dry_run': dry_run,
+    }
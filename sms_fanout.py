@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from typing import Any, Optional
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# E.164: a plus sign, then up to 15 digits with no leading zero
+E164_PATTERN = re.compile(r'^\+[1-9]\d{1,14}$')
+
+# Characters people put in phone numbers that E.164 leaves out
+_SEPARATORS = re.compile(r'[\s().-]')
+
+# Error codes SNS returns when the account's SMS rate is exceeded
+THROTTLE_CODES = {'Throttling', 'ThrottlingException', 'ThrottledException', 'TooManyRequestsException'}
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 0.5
+
+SMS_ATTRIBUTES = {
+    'AWS.SNS.SMS.SenderID': {
+        'DataType': 'String',
+        'StringValue': 'WeatherApp'
+    },
+    'AWS.SNS.SMS.SMSType': {
+        'DataType': 'String',
+        'StringValue': 'Transactional'
+    }
+}
+
+
+def normalize_phone_number(phone_number: str) -> Optional[str]:
+    """Strip spaces, dashes, dots and parentheses; return the number if it is valid E.164, else None."""
+    cleaned = _SEPARATORS.sub('', phone_number or '')
+    return cleaned if E164_PATTERN.match(cleaned) else None
+
+
+class SmsRateLimiter:
+    """Token bucket that keeps SMS publishes under the account's SNS SMS TPS limit.
+
+    Sends refill at SNS_SMS_TPS per second (the SNS default quota is 20) with
+    a burst of the same size. Waiters are served in arrival order. When SNS
+    throttles anyway, throttled() drains the bucket so every sender backs off
+    together instead of each one retrying into the limit.
+    """
+
+    def __init__(self, tps: Optional[float] = None):
+        self.tps = tps or float(os.environ.get('SNS_SMS_TPS', 20.0))
+        self.burst = self.tps
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self.sent = 0
+        self.throttled_count = 0
+        self.total_wait = 0.0
+
+    def split(self, parts: int) -> None:
+        """Keep 1/parts of the send rate, for one of several processes sharing the account."""
+        self.tps /= parts
+        # A send needs a whole token, so the bucket must still hold one
+        self.burst = max(1.0, self.burst / parts)
+        self.tokens = min(self.tokens, self.burst)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.tps)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until one more SMS can be sent."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.tps)
+        self.total_wait += time.monotonic() - started
+        self.sent += 1
+
+    def throttled(self, delay: float) -> None:
+        """Hold back every sender for delay seconds after SNS throttled a send."""
+        self.throttled_count += 1
+        self._refill()
+        self.tokens = min(self.tokens, -delay * self.tps)
+
+    def stats(self) -> dict[str, Any]:
+        self._refill()
+        return {
+            'tps': self.tps,
+            'tokens': round(self.tokens, 3),
+            'sent': self.sent,
+            'throttled': self.throttled_count,
+            'average_wait_seconds': round(self.total_wait / self.sent, 4) if self.sent else 0.0,
+        }
+
+
+async def publish_sms(aws, limiter: SmsRateLimiter, phone_number: str, message: str) -> dict[str, Any]:
+    """Send one SMS within the rate limit, retrying throttled sends with exponential backoff."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.acquire()
+        try:
+            response = await aws.run(
+                'sns',
+                lambda: aws.client('sns').publish(
+                    PhoneNumber=phone_number,
+                    Message=message,
+                    MessageAttributes=SMS_ATTRIBUTES,
+                ),
+            )
+            return {'phone_number': phone_number, 'status': 'sent', 'message_id': response['MessageId'],
+                    'attempts': attempt}
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code not in THROTTLE_CODES or attempt == MAX_ATTEMPTS:
+                return {'phone_number': phone_number, 'status': 'failed',
+                        'error': e.response['Error']['Message'], 'attempts': attempt}
+            delay = BACKOFF_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            logger.info(f"SNS throttled SMS to {phone_number}, retrying in {delay:.2f}s")
+            limiter.throttled(delay)
+        except Exception as e:
+            logger.error(f"Unexpected error sending SMS to {phone_number}: {str(e)}")
+            return {'phone_number': phone_number, 'status': 'failed', 'error': str(e), 'attempts': attempt}
+
+
+async def send_bulk_sms(aws, limiter: SmsRateLimiter, messages: dict[str, str]) -> dict[str, Any]:
+    """Validate every recipient, then send concurrently within the rate limit.
+
+    messages maps each phone number to its text. Invalid numbers and empty
+    messages are rejected before anything is sent. Returns counts and a
+    status for every recipient, in the order given.
+    """
+    results: dict[str, dict] = {}
+    valid: dict[str, str] = {}
+    for phone_number, message in messages.items():
+        normalized = normalize_phone_number(phone_number)
+        if normalized is None:
+            results[phone_number] = {'phone_number': phone_number, 'status': 'invalid',
+                                     'error': "Not an E.164 phone number (e.g. +12065550100)"}
+        elif not message or not message.strip():
+            results[phone_number] = {'phone_number': phone_number, 'status': 'invalid', 'error': "Empty message"}
+        elif normalized in valid:
+            results[phone_number] = {'phone_number': phone_number, 'status': 'duplicate'}
+        else:
+            valid[normalized] = message
+            results[phone_number] = None
+
+    started = time.perf_counter()
+    sent = await asyncio.gather(*(publish_sms(aws, limiter, number, text) for number, text in valid.items()))
+    by_number = {result['phone_number']: result for result in sent}
+    for phone_number, result in results.items():
+        if result is None:
+            results[phone_number] = by_number[normalize_phone_number(phone_number)]
+
+    summary = {status: 0 for status in ('sent', 'failed', 'invalid', 'duplicate')}
+    for result in results.values():
+        summary[result['status']] += 1
+    return {
+        **summary,
+        'seconds': round(time.perf_counter() - started, 3),
+        'results': list(results.values()),
+    }
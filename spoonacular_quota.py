@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower values are served first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {PRIORITY_HIGH: 'high', PRIORITY_NORMAL: 'normal', PRIORITY_LOW: 'low'}
+
+# Priority class of each tool that spends Spoonacular points
+TOOL_PRIORITIES = {
+    'search_recipes': PRIORITY_NORMAL,
+    'search_recipes_by_ingredients': PRIORITY_NORMAL,
+    'search_recipes_by_nutrients': PRIORITY_LOW,
+    'optimize_meal_plan': PRIORITY_NORMAL,
+}
+
+# Share of the daily quota kept back from each priority class. Low priority
+# calls are shed once less than 25% of the quota is left, normal ones below 5%.
+QUOTA_RESERVE = {
+    PRIORITY_HIGH: 0.0,
+    PRIORITY_NORMAL: 0.05,
+    PRIORITY_LOW: 0.25,
+}
+
+# Points per endpoint: a base cost plus a cost per returned result
+ENDPOINT_POINTS = {
+    'complexSearch': (1.0, 0.01),
+    'findByNutrients': (1.0, 0.01),
+    'findByIngredients': (1.0, 0.01),
+}
+
+# Extra points per returned result for flags that pull in more data
+FLAG_POINTS = {
+    'addRecipeInformation': 0.025,
+    'addRecipeInstructions': 0.025,
+    'addRecipeNutrition': 0.025,
+    'fillIngredients': 0.025,
+}
+
+
+class QuotaExceeded(Exception):
+    """Raised when a call is shed to protect the Spoonacular quota."""
+
+
+def estimate_points(endpoint: str, params: Mapping[str, Any]) -> float:
+    """Estimate how many Spoonacular points a request will cost."""
+    base, per_result = ENDPOINT_POINTS.get(endpoint, (1.0, 0.0))
+    number = params.get('number') or 10
+    per_result += sum(cost for flag, cost in FLAG_POINTS.items() if params.get(flag))
+    return base + per_result * number
+
+
+def _next_utc_midnight() -> float:
+    """Spoonacular quotas reset at midnight UTC."""
+    now = datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return tomorrow.timestamp()
+
+
+class QuotaScheduler:
+    """Token bucket over Spoonacular points with priority queueing and load shedding.
+
+    Points refill at SPOONACULAR_POINTS_PER_SECOND up to
+    SPOONACULAR_POINTS_BURST. Callers wait in priority order for enough
+    points; low priority calls are shed when their queue is full or when the
+    quota left (as reported by the X-API-Quota-Left header) falls into the
+    reserve kept for higher priorities.
+    """
+
+    def __init__(
+        self,
+        points_per_second: Optional[float] = None,
+        burst: Optional[float] = None,
+        daily_quota: Optional[float] = None,
+        max_queue: Optional[int] = None,
+    ):
+        self.points_per_second = points_per_second or float(os.environ.get('SPOONACULAR_POINTS_PER_SECOND', 1.0))
+        self.burst = burst or float(os.environ.get('SPOONACULAR_POINTS_BURST', 10.0))
+        self.daily_quota = daily_quota or float(os.environ.get('SPOONACULAR_DAILY_QUOTA', 150.0))
+        self.max_queue = max_queue or int(os.environ.get('SPOONACULAR_MAX_QUEUE', 50))
+        self.tokens = self.burst
+        self.quota_left: Optional[float] = None
+        self.quota_used: Optional[float] = None
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+        self.admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.shed = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.points_estimated = 0.0
+        self.points_charged = 0.0
+
+    def split(self, parts: int) -> None:
+        """Keep 1/parts of the refill rate and burst, for one of several processes sharing the account."""
+        self.points_per_second /= parts
+        self.burst /= parts
+        self.tokens = min(self.tokens, self.burst)
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.points_per_second)
+        self._updated = now
+
+    def _queue_depth(self, priority: int) -> int:
+        return sum(1 for entry in self._waiters if entry[0] == priority)
+
+    def _check_quota(self, points: float, priority: int) -> None:
+        """Shed the call if it would eat into the quota reserved for higher priorities."""
+        if time.time() < self.paused_until:
+            raise QuotaExceeded("Spoonacular quota exhausted, try again later")
+        if self.quota_left is None:
+            return
+        reserve = self.daily_quota * QUOTA_RESERVE[priority]
+        if self.quota_left - points < reserve:
+            raise QuotaExceeded(
+                f"Spoonacular quota too low for {PRIORITY_NAMES[priority]} priority calls "
+                f"({self.quota_left:.2f} points left)"
+            )
+
+    async def acquire(self, points: float, priority: int = PRIORITY_NORMAL) -> None:
+        """Wait until points can be spent, or raise QuotaExceeded if the call is shed."""
+        name = PRIORITY_NAMES[priority]
+        try:
+            self._check_quota(points, priority)
+            if priority != PRIORITY_HIGH and self._queue_depth(priority) >= self.max_queue:
+                raise QuotaExceeded(f"Too many queued {name} priority Spoonacular calls")
+        except QuotaExceeded:
+            self.shed[name] += 1
+            raise
+
+        # A single call can never need more than a full bucket
+        cost = min(points, self.burst)
+        cond = self._condition()
+        entry = (priority, next(self._seq), cost)
+        started = time.monotonic()
+        async with cond:
+            heapq.heappush(self._waiters, entry)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] is entry and self.tokens >= cost:
+                        heapq.heappop(self._waiters)
+                        self.tokens -= cost
+                        break
+                    wait = max((cost - self.tokens) / self.points_per_second, 0.01)
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+            finally:
+                cond.notify_all()
+        self.total_wait += time.monotonic() - started
+        self.admitted[name] += 1
+        self.points_estimated += points
+        if self.quota_left is not None:
+            # Spend the estimate now; the next response's headers correct it
+            self.quota_left -= points
+
+    def record_response(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """Update the quota picture from the headers of a Spoonacular response."""
+        try:
+            if 'X-API-Quota-Request' in headers:
+                self.points_charged += float(headers['X-API-Quota-Request'])
+            if 'X-API-Quota-Used' in headers:
+                self.quota_used = float(headers['X-API-Quota-Used'])
+            if 'X-API-Quota-Left' in headers:
+                self.quota_left = float(headers['X-API-Quota-Left'])
+        except ValueError as e:
+            logger.error(f"Invalid Spoonacular quota header: {str(e)}")
+
+        if status_code == 402:
+            # Daily points are used up until the quota resets
+            self.quota_left = 0.0
+            self.paused_until = _next_utc_midnight()
+        elif status_code == 429:
+            # Rate limited: drain the bucket so queued calls back off for Retry-After seconds
+            try:
+                retry_after = float(headers.get('Retry-After', 5))
+            except ValueError:
+                retry_after = 5.0
+            self._refill()
+            self.tokens = -retry_after * self.points_per_second
+
+    def stats(self) -> dict[str, Any]:
+        """Return queue depths, admitted/shed counts and the last known quota."""
+        self._refill()
+        admitted = sum(self.admitted.values())
+        return {
+            'tokens': round(self.tokens, 3),
+            'points_per_second': self.points_per_second,
+            'burst': self.burst,
+            'daily_quota': self.daily_quota,
+            'quota_left': round(self.quota_left, 3) if self.quota_left is not None else None,
+            'quota_used': self.quota_used,
+            'queue_depth': {name: self._queue_depth(p) for p, name in PRIORITY_NAMES.items()},
+            'max_queue_depth': self.max_queue_depth,
+            'admitted': dict(self.admitted),
+            'shed': dict(self.shed),
+            'average_wait_seconds': round(self.total_wait / admitted, 4) if admitted else 0.0,
+            'points_estimated': round(self.points_estimated, 3),
+            'points_charged': round(self.points_charged, 3),
+        }
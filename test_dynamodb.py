@@ -5,7 +5,7 @@ import asyncio
 from typing import Dict, Any
 import os
 import logging
-from decimal import Decimal
+import dynamo_json
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -37,16 +37,6 @@ except Exception as e:
     logger.error(f"Failed to connect to AWS: {str(e)}")
     dynamodb = None
 
-def convert_decimals(obj):
-    """Convert Decimal objects to float for JSON serialization."""
-    if isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: convert_decimals(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_decimals(i) for i in obj]
-    return obj
-
 async def get_dynamodb_item(table_name: str, key: Dict[str, Any]) -> str:
     """Retrieve an item from DynamoDB.
     
@@ -69,9 +59,8 @@ async def get_dynamodb_item(table_name: str, key: Dict[str, Any]) -> str:
         if 'Item' not in response:
             return f"No item found with key: {key}"
             
-        # Convert Decimal values to float and return the item as a formatted string
-        item = convert_decimals(response['Item'])
-        return json.dumps(item, indent=2)
+        # Convert Decimal values to float while encoding and return the item as a formatted string
+        return dynamo_json.dumps(response['Item'])
         
     except ClientError as e:
         error_message = e.response['Error']['Message']
@@ -107,9 +96,8 @@ def test_get_item():
             return
             
         # Convert Decimal values to float and print the item
-        item = convert_decimals(response['Item'])
         print("\nRetrieved item:")
-        print(json.dumps(item, indent=2))
+        print(dynamo_json.dumps(response['Item']))
         
     except ClientError as e:
         print(f"Error: {e.response['Error']['Message']}")
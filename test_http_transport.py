@@ -0,0 +1,73 @@
+import asyncio
+import socket
+import tempfile
+from contextlib import asynccontextmanager
+
+import uvicorn
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.server.fastmcp import FastMCP
+
+from http_transport import SseWorkerApp
+from page_server import EmbeddedServer
+
+# Connection limit of the test server; more sequential sessions than this are opened
+MAX_CONNECTIONS = 3
+
+
+@asynccontextmanager
+async def no_resources():
+    yield
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def sequential_sessions(count: int) -> None:
+    mcp = FastMCP("transport-test")
+
+    @mcp.tool()
+    async def echo(text: str) -> str:
+        return text
+
+    port = free_port()
+    with tempfile.TemporaryDirectory() as run_dir:
+        worker = SseWorkerApp(mcp, no_resources, run_dir)
+        server = EmbeddedServer(uvicorn.Config(
+            worker.app(), host='127.0.0.1', port=port, limit_concurrency=MAX_CONNECTIONS, log_level='warning',
+        ))
+        serving = asyncio.create_task(server.serve())
+        try:
+            assert await wait_for(lambda: server.started)
+            for i in range(count):
+                async with sse_client(f"http://127.0.0.1:{port}/sse", timeout=5) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        result = await session.call_tool('echo', {'text': str(i)})
+                        assert result.content[0].text == str(i)
+                # The session must end, and free its connection slot, once the client goes away
+                assert await wait_for(lambda: worker.sessions == 0), f"session {i} still open"
+        finally:
+            server.should_exit = True
+            await asyncio.wait_for(serving, timeout=5)
+
+
+def test_sessions_end_when_clients_disconnect():
+    asyncio.run(sequential_sessions(MAX_CONNECTIONS * 2 + 1))
+
+
+if __name__ == "__main__":
+    test_sessions_end_when_clients_disconnect()
+    print("ok")
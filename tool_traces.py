@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import time
+import uuid
+import weakref
+from typing import Any, Iterable, Optional
+
+from mcp import types
+
+logger = logging.getLogger(__name__)
+
+# JSON Lines file every tool call is appended to, for replaying sessions later; unset to record nothing
+TRACE_PATH = os.environ.get('MCP_TRACE_PATH')
+
+
+class ToolCallRecorder:
+    """Append every tool call of a low-level MCP server to a JSON Lines trace.
+
+    Each line holds the client session it came from, the tool, its
+    arguments as sent, when it started (epoch seconds), how long it took
+    and whether it failed. Arguments are recorded verbatim, phone numbers
+    and messages included, so treat trace files like logs of the sessions
+    themselves. Lines are written with a single append each, so worker
+    processes can share one file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.calls = 0
+        self.write_errors = 0
+        self._sessions: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._fd: Optional[int] = None
+
+    def _session_id(self, session: Any) -> str:
+        session_id = self._sessions.get(session)
+        if session_id is None:
+            session_id = self._sessions[session] = uuid.uuid4().hex
+        return session_id
+
+    def _write(self, record: dict) -> None:
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            os.write(self._fd, (json.dumps(record, default=str) + '\n').encode('utf-8'))
+            self.calls += 1
+        except OSError as e:
+            self.write_errors += 1
+            logger.error(f"Error writing tool call trace: {str(e)}")
+
+    def install(self, server: Any) -> None:
+        """Wrap the server's tool call handler so every call is recorded."""
+        call_tool = server.request_handlers[types.CallToolRequest]
+
+        async def recorded(request: types.CallToolRequest) -> Any:
+            session = self._session_id(server.request_context.session)
+            started_at = time.time()
+            started = time.perf_counter()
+            error = True
+            try:
+                result = await call_tool(request)
+                root = getattr(result, 'root', result)
+                content = getattr(root, 'content', None) or []
+                error = bool(getattr(root, 'isError', False)) or bool(
+                    content and isinstance(content[0], types.TextContent) and content[0].text.startswith('Error')
+                )
+                return result
+            finally:
+                self._write({
+                    'session': session,
+                    'tool': request.params.name,
+                    'arguments': request.params.arguments or {},
+                    'started_at': round(started_at, 6),
+                    'seconds': round(time.perf_counter() - started, 6),
+                    'error': error,
+                })
+
+        server.request_handlers[types.CallToolRequest] = recorded
+
+    def stats(self) -> dict[str, Any]:
+        return {'path': self.path, 'calls': self.calls, 'write_errors': self.write_errors}
+
+
+def load_sessions(paths: Iterable[str]) -> list[list[dict]]:
+    """Read traces and return each session's calls in the order they started, sessions by their first call."""
+    sessions: dict[str, list[dict]] = {}
+    for path in paths:
+        with open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    sessions.setdefault(record['session'], []).append(record)
+                except (ValueError, KeyError) as e:
+                    logger.error(f"Skipping line {line_number} of {path}: {str(e)}")
+    calls = [sorted(session, key=lambda call: call['started_at']) for session in sessions.values()]
+    return sorted(calls, key=lambda session: session[0]['started_at'])
+
+
+def session_steps(calls: list[dict]) -> list[tuple[float, list[dict]]]:
+    """Split a session's calls into steps of (think time, calls started together).
+
+    A call that started before the previous step had finished ran alongside
+    it and joins that step. Otherwise it starts a new step, and the gap
+    since the previous step finished is the time the client spent
+    thinking (an LLM generating its next turn, or a user reading).
+    """
+    steps: list[tuple[float, list[dict]]] = []
+    finished = None
+    for call in calls:
+        ended = call['started_at'] + call.get('seconds', 0.0)
+        if steps and call['started_at'] < finished:
+            steps[-1][1].append(call)
+            finished = max(finished, ended)
+            continue
+        think = max(0.0, call['started_at'] - finished) if finished is not None else 0.0
+        steps.append((think, [call]))
+        finished = ended
+    return steps
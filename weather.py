@@ -1,95 +1,151 @@
 from typing import Any, Optional, List, Union
-import httpx
+import argparse
+import asyncio
 import json
 import os
+import random
 import uuid
-import boto3
+from boto3.dynamodb.types import TypeSerializer
 from botocore.exceptions import ClientError
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from mcp.server.fastmcp.prompts import base
+from mcp.types import ProgressNotification, ProgressNotificationParams, ServerNotification, TextContent
 import logging
 from decimal import Decimal
 from typing import TypedDict, NotRequired
-import http.server
-import socketserver
-import threading
 import webbrowser
-from jinja2 import Template
+from jinja2 import TemplateNotFound
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from http_clients import HttpClientRegistry
+from metrics import Metrics, cache_samples, instrument_tool_calls
+import tool_traces
+from aws_clients import AwsBootstrap
+from recipe_cache import ResponseCache, make_cache_key
+from recipe_index import INDEXED_ENDPOINTS, RecipeIndex
+from ingredient_index import INGREDIENT_ENDPOINTS, IngredientIndex
+from recipe_output import recipe_response
+import recipe_pages
+from singleflight import SingleFlight
+import dynamo_json
+import s3_uploads
+from spoonacular_quota import QuotaScheduler, QuotaExceeded, TOOL_PRIORITIES, estimate_points
+from meal_optimizer import optimize_meals
+from meal_plan import build_lazy_meal_plan
+from page_server import PageServer
+import http_transport
+from page_templates import TemplateRenderer
+from sms_fanout import SmsRateLimiter, normalize_phone_number, publish_sms, send_bulk_sms
+
+# Tool, upstream and cache metrics, served at /metrics over HTTP and as the metrics://server resource
+metrics = Metrics()
+
+# Shared HTTP clients, one connection pool per upstream API
+http_clients = HttpClientRegistry(metrics=metrics)
+
+# AWS session and clients, created lazily or warmed up after the server starts
+aws = AwsBootstrap(profile_name='default', metrics=metrics)
+
+# Persistent cache of Spoonacular responses
+recipe_cache = ResponseCache()
+
+# Nutrient amounts of every recipe fetched so far, for answering nutrient searches locally
+recipe_index = RecipeIndex()
+
+# Ingredient lists of every recipe fetched so far, for answering ingredient searches locally
+ingredient_index = IngredientIndex()
+
+# Coalesces identical upstream requests that are in flight at the same time
+inflight_requests = SingleFlight()
+
+# Paces Spoonacular calls against the account's points quota
+spoonacular_quota = QuotaScheduler()
+
+# Keeps SMS sends under the account's SNS SMS TPS limit
+sms_limiter = SmsRateLimiter()
+
+# Serves pages rendered by serve_html_page from memory, started on first use
+page_server = PageServer()
+
+# Compiled Jinja2 templates, cached in memory and on disk
+template_renderer = TemplateRenderer()
+
+# The HTTP worker app, when serving over HTTP; it then owns the shared resources
+http_worker = None
+
+@asynccontextmanager
+async def shared_resources() -> AsyncIterator[None]:
+    """Open the process-wide clients and servers, and close them on shutdown."""
+    async with http_clients.lifespan():
+        aws.start_warmup()
+        try:
+            yield
+        finally:
+            await page_server.stop()
+            recipe_cache.close()
+            aws.shutdown()
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[dict]:
+    """Open shared resources when the server starts and close them on shutdown.
+    
+    Over HTTP this runs for every client session, so the worker app opens the
+    resources once for the whole process instead.
+    """
+    if http_worker is not None:
+        yield {}
+        return
+    async with shared_resources():
+        yield {}
 
 # Initialize FastMCP server
 PORT = 8000
-mcp = FastMCP("weather", port=PORT)
+mcp = FastMCP("weather", port=PORT, lifespan=server_lifespan)
+instrument_tool_calls(mcp._mcp_server, metrics)
+
+# Records every tool call for replay by benchmarks/replay_sessions.py when MCP_TRACE_PATH is set
+trace_recorder = tool_traces.ToolCallRecorder(tool_traces.TRACE_PATH) if tool_traces.TRACE_PATH else None
+if trace_recorder is not None:
+    trace_recorder.install(mcp._mcp_server)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Constants
-INSTACART_API_BASE = "https://connect.dev.instacart.tools/idp/v1"
-
-def convert_decimals(obj):
-    """Convert Decimal objects to float for JSON serialization."""
-    if isinstance(obj, Decimal):
-        return float(obj)
-    elif isinstance(obj, dict):
-        return {k: convert_decimals(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_decimals(i) for i in obj]
-    return obj
-
-# Initialize DynamoDB client using credentials from ~/.aws/credentials
-def get_dynamodb_client():
-    """Initialize and return a DynamoDB client using credentials from ~/.aws/credentials."""
-    try:
-        # Create a session using the default profile from ~/.aws/credentials
-        session = boto3.Session(profile_name='default')
-        
-        # Get the region from ~/.aws/config
-        region = session.region_name or 'us-east-1'
-        
-        # Create the DynamoDB resource using the session
-        return session.resource('dynamodb', region_name=region)
-        
-    except Exception as e:
-        logger.error(f"Failed to initialize DynamoDB client: {str(e)}")
-        raise
-
-# Initialize DynamoDB client
-try:
-    dynamodb = get_dynamodb_client()
-    # Verify connection by getting caller identity
-    boto3.client('sts').get_caller_identity()
-    logger.info("Successfully connected to AWS using credentials from ~/.aws/credentials")
-except Exception as e:
-    logger.error(f"Failed to connect to AWS: {str(e)}")
-    dynamodb = None
+# Constants; the API base URLs can be pointed at local stand-ins (see benchmarks/bench_tools.py)
+INSTACART_API_BASE = os.environ.get('INSTACART_API_BASE', "https://connect.dev.instacart.tools/idp/v1")
+SPOONACULAR_API_BASE = os.environ.get('SPOONACULAR_API_BASE', "https://api.spoonacular.com")
 
 @mcp.tool()
-async def get_dynamodb_item(table_name: str, key: dict) -> str:
+async def get_dynamodb_item(table_name: str, key: dict, compact: bool = False) -> str:
     """Retrieve an item from DynamoDB.
     
     Args:
         table_name: Name of the DynamoDB table
         key: Dictionary containing the primary key attributes
             Example: {"id": "123"} or {"partition_key": "pk", "sort_key": "sk"}
+        compact: Return compact JSON without indentation (faster for large items)
     """
-    if not dynamodb:
+    if not await aws.get_dynamodb():
         return "Error: DynamoDB client not initialized. Please check AWS credentials in ~/.aws/credentials"
         
     try:
-        # Get the table
-        table = dynamodb.Table(table_name)
-        
-        # Get the item
-        response = table.get_item(Key=key)
+        # Get the item in the AWS thread pool, sharing the read with identical lookups already in flight
+        flight_key = f"dynamodb:{table_name}:{json.dumps(key, sort_keys=True, default=str)}"
+        response = await inflight_requests.do(
+            flight_key,
+            lambda: aws.run(
+                'dynamodb',
+                lambda: aws.dynamodb_client().get_item(TableName=table_name, Key=to_dynamodb_key(key)),
+            ),
+        )
         
         # Check if item exists
         if 'Item' not in response:
             return f"No item found with key: {key}"
             
-        # Convert Decimal values to float and return the item as a formatted string
-        item = convert_decimals(response['Item'])
-        return json.dumps(item, indent=2)
+        # Return the item as JSON, encoding the raw attribute values without building Decimals
+        return dynamo_json.dumps_raw_item(response['Item'], compact=compact)
         
     except ClientError as e:
         error_message = e.response['Error']['Message']
@@ -99,6 +155,144 @@ async def get_dynamodb_item(table_name: str, key: dict) -> str:
         logger.error(f"Unexpected error: {str(e)}")
         return f"Error retrieving item: {str(e)}"
 
+# Serializes keys for the low-level DynamoDB client
+key_serializer = TypeSerializer()
+
+# DynamoDB accepts at most 100 keys per BatchGetItem request
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_ATTEMPTS = 8
+
+def normalize_key_value(value):
+    """Normalize a key value so keys from the caller and from DynamoDB compare equal."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        number = Decimal(str(value))
+        return int(number) if number == number.to_integral_value() else float(number)
+    return value
+
+def key_signature(key: dict) -> str:
+    """Build a stable string for a primary key, used to match results back to input keys."""
+    return json.dumps({k: normalize_key_value(v) for k, v in key.items()}, sort_keys=True)
+
+def to_dynamodb_key(key: dict) -> dict:
+    """Convert a key to low-level attribute values, passing floats through Decimal as boto3 requires."""
+    return {
+        k: key_serializer.serialize(Decimal(str(v)) if isinstance(v, float) else v)
+        for k, v in key.items()
+    }
+
+def from_dynamodb_key(key: dict) -> dict:
+    """Convert a key of low-level attribute values back to plain values."""
+    return {k: normalize_key_value(dynamo_json.from_attribute_value(v)) for k, v in key.items()}
+
+async def batch_get_chunk(request_items: dict) -> tuple[dict, dict]:
+    """Run one BatchGetItem request, retrying UnprocessedKeys with exponential backoff.
+    
+    Returns the items found per table and any keys still unprocessed after the last attempt.
+    """
+    found: dict[str, list] = {}
+    for attempt in range(BATCH_GET_MAX_ATTEMPTS):
+        response = await aws.run('dynamodb', lambda: aws.dynamodb_client().batch_get_item(RequestItems=request_items))
+        for table_name, items in response.get('Responses', {}).items():
+            found.setdefault(table_name, []).extend(items)
+        request_items = response.get('UnprocessedKeys') or {}
+        if not request_items:
+            break
+        # Back off with jitter before asking again for the throttled keys
+        await asyncio.sleep(min(0.05 * (2 ** attempt), 2.0) * (0.5 + random.random()))
+    return found, request_items
+
+@mcp.tool()
+async def batch_get_dynamodb_items(
+    requests: list[dict],
+    projections: Optional[dict[str, str]] = None,
+    compact: bool = False,
+) -> str:
+    """Retrieve many items from one or more DynamoDB tables in as few round trips as possible.
+    
+    Args:
+        requests: List of lookups, where each lookup is a dict with:
+            - table_name: Name of the DynamoDB table
+            - key: Dictionary containing the primary key attributes
+            Example: [{"table_name": "identity", "key": {"userId": "user123"}}]
+        projections: Optional mapping of table name to a comma-separated list of attributes to return
+            Example: {"identity": "userId, targetCalories, targetProtein"}
+        compact: Return compact JSON without indentation (faster for many items)
+    
+    Returns a JSON object whose "items" maps each table name to an object keyed by the
+    input key (as a JSON string), with null for keys that were not found. Keys still
+    throttled after all retries are listed under "unprocessed".
+    """
+    if not await aws.get_dynamodb():
+        return "Error: DynamoDB client not initialized. Please check AWS credentials in ~/.aws/credentials"
+    
+    try:
+        # Collect unique keys per table, remembering the key attribute names
+        keys_by_table: dict[str, dict[str, dict]] = {}
+        for entry in requests:
+            if 'table_name' not in entry or 'key' not in entry:
+                return "Error: each request needs a 'table_name' and a 'key'"
+            keys_by_table.setdefault(entry['table_name'], {})[key_signature(entry['key'])] = entry['key']
+        
+        # Build the per-table options, making sure projections include the key attributes
+        table_options: dict[str, dict] = {}
+        for table_name, keys in keys_by_table.items():
+            projection = (projections or {}).get(table_name)
+            if not projection:
+                continue
+            attributes = [a.strip() for a in projection.split(',') if a.strip()]
+            for key in keys.values():
+                attributes.extend(k for k in key if k not in attributes)
+            names = {f"#p{i}": attribute for i, attribute in enumerate(attributes)}
+            table_options[table_name] = {
+                'ProjectionExpression': ', '.join(names),
+                'ExpressionAttributeNames': names,
+            }
+        
+        # Split the keys into BatchGetItem requests of at most 100 keys
+        pairs = [(table_name, key) for table_name, keys in keys_by_table.items() for key in keys.values()]
+        chunks = []
+        for start in range(0, len(pairs), BATCH_GET_MAX_KEYS):
+            request_items: dict[str, dict] = {}
+            for table_name, key in pairs[start:start + BATCH_GET_MAX_KEYS]:
+                table_request = request_items.setdefault(table_name, {'Keys': [], **table_options.get(table_name, {})})
+                table_request['Keys'].append(to_dynamodb_key(key))
+            chunks.append(request_items)
+        
+        # Run the chunks concurrently
+        chunk_results = await asyncio.gather(*(batch_get_chunk(chunk) for chunk in chunks))
+        
+        # Match the returned items back to the input keys
+        results: dict[str, dict] = {
+            table_name: {signature: None for signature in keys}
+            for table_name, keys in keys_by_table.items()
+        }
+        unprocessed = []
+        for found, leftover in chunk_results:
+            for table_name, items in found.items():
+                key_names = next(iter(keys_by_table[table_name].values())).keys()
+                for item in items:
+                    signature = key_signature(from_dynamodb_key({k: item[k] for k in key_names if k in item}))
+                    results[table_name][signature] = dynamo_json.RawItem(item)
+            for table_name, table_request in leftover.items():
+                unprocessed.extend(
+                    {'table_name': table_name, 'key': from_dynamodb_key(k)} for k in table_request['Keys']
+                )
+        
+        output = {'items': results}
+        if unprocessed:
+            output['unprocessed'] = unprocessed
+        return dynamo_json.dumps(output, compact=compact)
+        
+    except ClientError as e:
+        error_message = e.response['Error']['Message']
+        logger.error(f"DynamoDB error: {error_message}")
+        return f"Error retrieving items: {error_message}"
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        return f"Error retrieving items: {str(e)}"
+
 @mcp.tool()
 async def place_grocery_order(items: list[dict]) -> str:
     """Place a grocery delivery order on Instacart.
@@ -150,24 +344,98 @@ async def place_grocery_order(items: list[dict]) -> str:
         }
         
         # Make API call to create recipe page
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f'{INSTACART_API_BASE}/products/recipe',
-                headers=headers,
-                json=recipe_data,
-                timeout=30.0
-            )
-            
-            if response.status_code != 200:
-                return f"Error placing order: {response.text}"
-            
-            recipe_response = response.json()
-            return f"Order placed successfully! Order ID: {recipe_response.get('products_link_url', 'Unknown')}"
+        client = http_clients.get(INSTACART_API_BASE)
+        response = await client.post(
+            '/products/recipe',
+            headers=headers,
+            json=recipe_data,
+            timeout=30.0
+        )
+        
+        if response.status_code != 200:
+            return f"Error placing order: {response.text}"
+        
+        recipe_response = response.json()
+        return f"Order placed successfully! Order ID: {recipe_response.get('products_link_url', 'Unknown')}"
             
     except Exception as e:
         logger.error(f"Error placing grocery order: {str(e)}")
         return f"Error placing order: {str(e)}"
 
+class UpstreamError(Exception):
+    """Raised when an upstream API answers with an error response."""
+
+async def fetch_spoonacular_body(endpoint: str, params: dict, api_key: Optional[str], tool: str) -> str:
+    """Call a Spoonacular recipes endpoint, answering from the response cache when possible.
+    
+    Returns the response body as Spoonacular sent it, so callers that pass it
+    on unchanged don't have to decode and re-encode it.
+    
+    Args:
+        endpoint: Name of the endpoint under /recipes (e.g. complexSearch)
+        params: Search parameters, without the API key
+        api_key: Spoonacular API key
+        tool: Name of the calling tool, used to pick its quota priority
+    """
+    # SQLite reads and writes (commits and LRU eviction included) run off the event loop
+    cached = await asyncio.to_thread(recipe_cache.get, endpoint, params)
+    if cached is not None:
+        return cached
+    if recipe_cache.offline:
+        raise UpstreamError("No cached response for this search (offline mode)")
+    
+    async def request() -> str:
+        # Wait for enough quota points, or shed the call if it can't be afforded
+        try:
+            await spoonacular_quota.acquire(estimate_points(endpoint, params), TOOL_PRIORITIES[tool])
+        except QuotaExceeded as e:
+            raise UpstreamError(str(e))
+        
+        client = http_clients.get(SPOONACULAR_API_BASE)
+        response = await client.get(
+            f'/recipes/{endpoint}',
+            headers={
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+            params={**params, 'apiKey': api_key},
+            timeout=30.0
+        )
+        spoonacular_quota.record_response(response.status_code, response.headers)
+        
+        if response.status_code != 200:
+            raise UpstreamError(response.text)
+        
+        await asyncio.to_thread(recipe_cache.set, endpoint, params, response.text)
+        # Index the new recipes here so callers sharing this request don't each decode and index them again
+        data = json.loads(response.text)
+        recipe_index.add_recipes(endpoint, data)
+        ingredient_index.add_recipes(endpoint, data, params)
+        return response.text
+    
+    # Identical searches already in flight share one request
+    return await inflight_requests.do(f"spoonacular:{make_cache_key(endpoint, params)}", request)
+
+async def fetch_spoonacular(endpoint: str, params: dict, api_key: Optional[str], tool: str) -> Any:
+    """Call a Spoonacular recipes endpoint like fetch_spoonacular_body and decode the response."""
+    return json.loads(await fetch_spoonacular_body(endpoint, params, api_key, tool))
+
+async def send_progress(ctx: Context, progress: float, total: Optional[float], message: str) -> None:
+    """Send a progress notification that also carries a message (Context.report_progress can't)."""
+    meta = ctx.request_context.meta
+    if meta is None or meta.progressToken is None:
+        return
+    await ctx.request_context.session.send_notification(
+        ServerNotification(
+            ProgressNotification(
+                method='notifications/progress',
+                params=ProgressNotificationParams(
+                    progressToken=meta.progressToken, progress=progress, total=total, message=message
+                ),
+            )
+        )
+    )
+
 class RecipeSearchParams(TypedDict, total=False):
     query: NotRequired[str]
     cuisine: NotRequired[str]
@@ -269,7 +537,13 @@ class RecipeSearchParams(TypedDict, total=False):
     number: NotRequired[int]
 
 @mcp.tool()
-async def search_recipes(params: RecipeSearchParams) -> str:
+async def search_recipes(
+    params: RecipeSearchParams,
+    fields: Optional[List[str]] = None,
+    compact: bool = False,
+    max_results: Optional[int] = None,
+    ctx: Context = None,
+) -> Union[str, List[TextContent]]:
     """Search for recipes using the Spoonacular API with advanced filtering and ranking.
     
     Args:
@@ -301,35 +575,42 @@ async def search_recipes(params: RecipeSearchParams) -> str:
             - Various min/max nutrient parameters (carbs, protein, calories, etc.)
             - offset: Number of results to skip (0-900)
             - number: Number of results to return (1-100)
+        fields: Optional recipe fields to return, with dots for nested ones
+            (e.g. ["id", "title", "nutrition.nutrients"]); everything else is dropped
+        compact: Return JSON without indentation, faster to encode and smaller to read
+            (with either option, a second block reports the bytes saved)
+        max_results: Fetch up to this many recipes (at most 1000 past the offset) by
+            requesting the 100-result pages concurrently instead of one call per page.
+            Duplicates are dropped and each page is reported as a progress update as it
+            arrives; params' number is ignored.
     """
     try:
         # Get Spoonacular API key from environment
         api_key = os.environ.get('SPOONACULAR_API_KEY')
-        if not api_key:
+        if not api_key and not recipe_cache.offline:
             return "Error: Spoonacular API key not found. Please set SPOONACULAR_API_KEY environment variable."
         
-        # Initialize API client
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        
-        # Make API call
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                'https://api.spoonacular.com/recipes/complexSearch',
-                headers=headers,
-                params={**params, 'apiKey': api_key},
-                timeout=30.0
-            )
+        if max_results:
+            async def fetch_page(page_params: dict) -> Any:
+                return await fetch_spoonacular('complexSearch', page_params, api_key, 'search_recipes')
             
-            if response.status_code != 200:
-                return f"Error searching recipes: {response.text}"
-            
-            # Return formatted results
-            results = response.json()
-            return json.dumps(results, indent=2)
+            async def report(received: int, expected: int, batch: list[dict]) -> None:
+                if ctx is not None:
+                    titles = ', '.join(str(recipe.get('title')) for recipe in batch)
+                    await send_progress(ctx, received, expected, f"{len(batch)} recipes: {titles}")
             
+            # Fetch the pages concurrently and merge them into one result set
+            results = await recipe_pages.fetch_pages(fetch_page, dict(params), max_results, on_batch=report)
+            return recipe_response(results, fields=fields, compact=compact)
+        
+        # Make API call (or answer from the response cache)
+        body = await fetch_spoonacular_body('complexSearch', params, api_key, 'search_recipes')
+        
+        # Return formatted results
+        return recipe_response(body=body, fields=fields, compact=compact)
+    
+    except UpstreamError as e:
+        return f"Error searching recipes: {str(e)}"
     except Exception as e:
         logger.error(f"Error searching recipes: {str(e)}")
         return f"Error searching recipes: {str(e)}"
@@ -403,56 +684,44 @@ def validate_height_and_calculate_bmi(age: int, weight_kg: float, height_cm: flo
     Please thank the user for providing their information and share these results with them.
     """
 
-def load_template(template_path: str = "templates/default.html") -> str:
-    """Load a template from a file."""
-    try:
-        with open(template_path, 'r') as f:
-            return f.read()
-    except Exception as e:
-        logger.error(f"Error loading template: {str(e)}")
-        return ""
-
 @mcp.tool()
-async def serve_html_page(data: dict, template_path: str = "templates/default.html", port: int = 8001) -> str:
+async def serve_html_page(
+    data: dict,
+    template_path: str = "templates/default.html",
+    port: int = 8001,
+    lazy: bool = False,
+) -> str:
     """Generate and serve an HTML webpage using Jinja2 templating.
     
+    Each page gets its own URL and stays available for an hour.
+    
     Args:
         data: A dictionary containing the data to be rendered in the template
         template_path: Path to the Jinja2 template file (default: templates/default.html)
-        port: The port number to serve the page on (default: 8001)
+        port: The port number to serve pages on (default: 8001); only used when the page server first starts
+        lazy: For the weekly meal planner: ship a small page and load each day's meals and the
+            swap options as JSON when needed, with daily nutrition totals computed on the server.
+            Use this for large plans. Uses templates/meal_planner_lazy.html unless another
+            template is given.
     """
     try:
-        # Load and create a Jinja2 template
-        template_content = load_template(template_path)
-        if not template_content:
-            return "Error: Could not load template file"
-            
-        template = Template(template_content)
-        html_content = template.render(**data)
-        
-        # Create a temporary HTML file
-        temp_file = "temp_page.html"
-        with open(temp_file, "w") as f:
-            f.write(html_content)
+        resources = None
+        if lazy:
+            data, resources = build_lazy_meal_plan(data)
+            if template_path == "templates/default.html":
+                template_path = "templates/meal_planner_lazy.html"
         
-        # Create a custom handler that serves our HTML file
-        class CustomHandler(http.server.SimpleHTTPRequestHandler):
-            def do_GET(self):
-                if self.path == '/':
-                    self.path = f'/{temp_file}'
-                return http.server.SimpleHTTPRequestHandler.do_GET(self)
-        
-        # Start the server in a separate thread
-        def run_server():
-            with socketserver.TCPServer(("", port), CustomHandler) as httpd:
-                print(f"Serving at port {port}")
-                httpd.serve_forever()
-        
-        server_thread = threading.Thread(target=run_server, daemon=True)
-        server_thread.start()
+        # Render with the shared Jinja2 environment, which compiles each template once
+        try:
+            html_content = template_renderer.render(template_path, data)
+        except TemplateNotFound:
+            logger.error(f"Error loading template: {template_path} not found")
+            return "Error: Could not load template file"
         
-        # Generate the localhost URL
-        url = f"http://localhost:{port}"
+        # Serve the rendered page from memory on the shared page server
+        await page_server.start(port)
+        page_id = await page_server.publish(html_content, resources)
+        url = page_server.url(page_id)
         
         # Try to open the browser automatically
         try:
@@ -543,9 +812,16 @@ class NutrientSearchParams(TypedDict, total=False):
     random: NotRequired[bool]
 
 @mcp.tool()
-async def search_recipes_by_nutrients(params: NutrientSearchParams) -> str:
+async def search_recipes_by_nutrients(
+    params: NutrientSearchParams,
+    fields: Optional[List[str]] = None,
+    compact: bool = False,
+) -> Union[str, List[TextContent]]:
     """Search for recipes based on nutritional requirements using the Spoonacular API.
     
+    Searches are answered from recipes already fetched (with their nutrition) when
+    enough of them match, and only go to the API otherwise.
+    
     Args:
         params: A dictionary containing any of the following search parameters:
             - minCarbs/maxCarbs: Carbohydrate limits in grams
@@ -556,35 +832,32 @@ async def search_recipes_by_nutrients(params: NutrientSearchParams) -> str:
             - offset: Number of results to skip (0-900)
             - number: Number of results to return (1-100)
             - random: Whether to return random results within limits
+        fields: Optional recipe fields to return, with dots for nested ones
+            (e.g. ["id", "title", "nutrition.nutrients"]); everything else is dropped
+        compact: Return JSON without indentation, faster to encode and smaller to read
+            (with either option, a second block reports the bytes saved)
     """
     try:
+        # Answer from recipes we already hold when enough of them match
+        if not recipe_index.loaded:
+            await asyncio.to_thread(lambda: recipe_index.load(recipe_cache.iter_bodies(INDEXED_ENDPOINTS)))
+        local = recipe_index.search(params, allow_partial=recipe_cache.offline)
+        if local is not None:
+            return recipe_response(local, fields=fields, compact=compact)
+        
         # Get Spoonacular API key from environment
         api_key = os.environ.get('SPOONACULAR_API_KEY')
-        if not api_key:
+        if not api_key and not recipe_cache.offline:
             return "Error: Spoonacular API key not found. Please set SPOONACULAR_API_KEY environment variable."
         
-        # Initialize API client
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
+        # Make API call (or answer from the response cache)
+        body = await fetch_spoonacular_body('findByNutrients', params, api_key, 'search_recipes_by_nutrients')
         
-        # Make API call
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                'https://api.spoonacular.com/recipes/findByNutrients',
-                headers=headers,
-                params={**params, 'apiKey': api_key},
-                timeout=30.0
-            )
-            
-            if response.status_code != 200:
-                return f"Error searching recipes: {response.text}"
-            
-            # Return formatted results
-            results = response.json()
-            return json.dumps(results, indent=2)
-            
+        # Return formatted results
+        return recipe_response(body=body, fields=fields, compact=compact)
+    
+    except UpstreamError as e:
+        return f"Error searching recipes: {str(e)}"
     except Exception as e:
         logger.error(f"Error searching recipes by nutrients: {str(e)}")
         return f"Error searching recipes by nutrients: {str(e)}"
@@ -596,52 +869,122 @@ class IngredientSearchParams(TypedDict, total=False):
     ignorePantry: NotRequired[bool]  # Whether to ignore pantry items
 
 @mcp.tool()
-async def search_recipes_by_ingredients(params: IngredientSearchParams) -> str:
+async def search_recipes_by_ingredients(
+    params: IngredientSearchParams,
+    fields: Optional[List[str]] = None,
+    compact: bool = False,
+) -> Union[str, List[TextContent]]:
     """Search for recipes based on available ingredients using the Spoonacular API.
     
+    Searches are answered from the ingredient lists of recipes already fetched when
+    enough of them use the ingredients, and only go to the API otherwise.
+    
     Args:
         params: A dictionary containing:
             - ingredients: Comma-separated list of ingredients to search for
             - number: Optional number of results to return (1-100, default: 10)
             - ranking: Optional ranking strategy (1: maximize used ingredients, 2: minimize missing ingredients)
             - ignorePantry: Optional flag to ignore pantry items (default: false)
+        fields: Optional recipe fields to return, with dots for nested ones
+            (e.g. ["id", "title", "nutrition.nutrients"]); everything else is dropped
+        compact: Return JSON without indentation, faster to encode and smaller to read
+            (with either option, a second block reports the bytes saved)
     """
     try:
-        # Get Spoonacular API key from environment
-        api_key = os.environ.get('SPOONACULAR_API_KEY')
-        if not api_key:
-            return "Error: Spoonacular API key not found. Please set SPOONACULAR_API_KEY environment variable."
-        
         # Validate required parameters
         if 'ingredients' not in params:
             return "Error: 'ingredients' parameter is required"
         
-        # Initialize API client
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
+        # Answer from recipes we already hold when enough of them use these ingredients
+        if not ingredient_index.loaded:
+            await asyncio.to_thread(lambda: ingredient_index.load(recipe_cache.iter_bodies(INGREDIENT_ENDPOINTS)))
+        local = ingredient_index.search(params, allow_partial=recipe_cache.offline)
+        if local is not None:
+            return recipe_response(local, fields=fields, compact=compact)
         
-        # Make API call
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                'https://api.spoonacular.com/recipes/findByIngredients',
-                headers=headers,
-                params={**params, 'apiKey': api_key},
-                timeout=30.0
-            )
-            
-            if response.status_code != 200:
-                return f"Error searching recipes: {response.text}"
-            
-            # Return formatted results
-            results = response.json()
-            return json.dumps(results, indent=2)
-            
+        # Get Spoonacular API key from environment
+        api_key = os.environ.get('SPOONACULAR_API_KEY')
+        if not api_key and not recipe_cache.offline:
+            return "Error: Spoonacular API key not found. Please set SPOONACULAR_API_KEY environment variable."
+        
+        # Make API call (or answer from the response cache)
+        body = await fetch_spoonacular_body('findByIngredients', params, api_key, 'search_recipes_by_ingredients')
+        
+        # Return formatted results
+        return recipe_response(body=body, fields=fields, compact=compact)
+    
+    except UpstreamError as e:
+        return f"Error searching recipes: {str(e)}"
     except Exception as e:
         logger.error(f"Error searching recipes by ingredients: {str(e)}")
         return f"Error searching recipes by ingredients: {str(e)}"
 
+@mcp.tool()
+async def optimize_meal_plan(
+    targets: dict[str, float],
+    recipes: Optional[List[dict]] = None,
+    search: Optional[RecipeSearchParams] = None,
+    meals_per_day: int = 3,
+    diet: Optional[str] = None,
+    max_ready_time: Optional[int] = None,
+    max_ingredients: Optional[int] = None,
+    top_k: int = 3,
+    weights: Optional[dict[str, float]] = None,
+) -> str:
+    """Find the meal combinations for a day that come closest to daily macro targets, in one call.
+    
+    Instead of searching recipe by recipe, give the daily targets and a pool of candidate
+    recipes; every combination of meals_per_day distinct recipes is scored and the best
+    top_k plans are returned with their totals and how far off target each macro is.
+    
+    Args:
+        targets: Daily targets, any of calories, protein, carbs and fat (grams), e.g.
+            {"calories": 2000, "protein": 150, "carbs": 200, "fat": 65}
+        recipes: Candidate recipes, e.g. results from search_recipes with addRecipeNutrition,
+            search_recipes_by_nutrients, or meals from a meal plan
+        search: If recipes is not given, search parameters for one complexSearch call (up to
+            100 results with nutrition) that supplies the candidates; diet and max_ready_time
+            are passed along
+        meals_per_day: Number of distinct recipes in each plan (default: 3)
+        diet: Comma-separated diets every recipe must follow, e.g. "vegetarian"
+        max_ready_time: Maximum preparation time per recipe in minutes
+        max_ingredients: Maximum number of ingredients per recipe, when the recipe lists them
+        top_k: Number of plans to return (default: 3)
+        weights: Relative importance of each macro (default: 1 each)
+    """
+    try:
+        if recipes is None:
+            api_key = os.environ.get('SPOONACULAR_API_KEY')
+            if not api_key and not recipe_cache.offline:
+                return "Error: Spoonacular API key not found. Please set SPOONACULAR_API_KEY environment variable."
+            params = {'number': 100, **(search or {}), 'addRecipeNutrition': True}
+            if diet and 'diet' not in params:
+                params['diet'] = diet
+            if max_ready_time and 'maxReadyTime' not in params:
+                params['maxReadyTime'] = max_ready_time
+            results = await fetch_spoonacular('complexSearch', params, api_key, 'optimize_meal_plan')
+            recipes = results.get('results', [])
+        
+        # Scoring up to MAX_COMBINATIONS plans takes most of a second, so keep it off the event loop
+        result = await asyncio.to_thread(
+            optimize_meals,
+            recipes,
+            targets,
+            meals_per_day=meals_per_day,
+            top_k=top_k,
+            diet=diet,
+            max_ready_time=max_ready_time,
+            max_ingredients=max_ingredients,
+            weights=weights,
+        )
+        return json.dumps(result, indent=2)
+    
+    except UpstreamError as e:
+        return f"Error optimizing meal plan: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error optimizing meal plan: {str(e)}")
+        return f"Error optimizing meal plan: {str(e)}"
+
 @mcp.tool()
 async def send_sms_message(phone_number: str, message: str) -> str:
     """Send an SMS message using AWS SNS.
@@ -650,40 +993,98 @@ async def send_sms_message(phone_number: str, message: str) -> str:
         phone_number: The phone number to send the message to (in E.164 format, e.g., +1234567890)
         message: The text message to send
     """
-    try:
-        # Initialize SNS client using the same session as DynamoDB
-        session = boto3.Session(profile_name='default')
-        sns = session.client('sns')
-        
-        # Send the message
-        response = sns.publish(
-            PhoneNumber=phone_number,
-            Message=message,
-            MessageAttributes={
-                'AWS.SNS.SMS.SenderID': {
-                    'DataType': 'String',
-                    'StringValue': 'WeatherApp'
-                },
-                'AWS.SNS.SMS.SMSType': {
-                    'DataType': 'String',
-                    'StringValue': 'Transactional'
-                }
-            }
-        )
-        
-        # Check if message was sent successfully
-        if response['ResponseMetadata']['HTTPStatusCode'] == 200:
-            return f"Message sent successfully! Message ID: {response['MessageId']}"
-        else:
-            return f"Failed to send message. Response: {response}"
-            
-    except ClientError as e:
-        error_message = e.response['Error']['Message']
-        logger.error(f"AWS SNS error: {error_message}")
-        return f"Error sending message: {error_message}"
-    except Exception as e:
-        logger.error(f"Unexpected error sending SMS: {str(e)}")
-        return f"Error sending message: {str(e)}"
+    normalized = normalize_phone_number(phone_number)
+    if normalized is None:
+        return f"Error sending message: {phone_number} is not an E.164 phone number (e.g. +12065550100)"
+    
+    # Send with the shared SNS client, within the account's SMS rate limit
+    result = await publish_sms(aws, sms_limiter, normalized, message)
+    if result['status'] == 'sent':
+        return f"Message sent successfully! Message ID: {result['message_id']}"
+    logger.error(f"AWS SNS error: {result['error']}")
+    return f"Error sending message: {result['error']}"
+
+@mcp.tool()
+async def send_bulk_sms_messages(
+    phone_numbers: Optional[List[str]] = None,
+    message: str = "",
+    messages: Optional[dict[str, str]] = None,
+) -> str:
+    """Send SMS messages to many recipients at once using AWS SNS.
+    
+    Numbers are validated before anything is sent, sends run concurrently
+    within the account's SMS rate limit, and throttled sends are retried.
+    Returns a status for every recipient.
+    
+    Args:
+        phone_numbers: Phone numbers to send the same message to (in E.164 format, e.g., +1234567890)
+        message: The text message to send to every number in phone_numbers
+        messages: Per-recipient messages, mapping each phone number to its own text
+    """
+    recipients = {phone_number: message for phone_number in phone_numbers or []}
+    recipients.update(messages or {})
+    if not recipients:
+        return "Error sending messages: no recipients given"
+    
+    result = await send_bulk_sms(aws, sms_limiter, recipients)
+    return json.dumps(result, indent=2)
+
+@mcp.tool()
+def get_recipe_cache_stats() -> str:
+    """Report hit/miss counters and size of the Spoonacular response cache and the local recipe indexes."""
+    return json.dumps(
+        {**recipe_cache.stats(), 'nutrient_index': recipe_index.stats(), 'ingredient_index': ingredient_index.stats()},
+        indent=2,
+    )
+
+@mcp.tool()
+def get_request_coalescing_stats() -> str:
+    """Report how many upstream calls were coalesced into requests already in flight."""
+    return json.dumps(inflight_requests.stats(), indent=2)
+
+@mcp.tool()
+def get_spoonacular_quota_status() -> str:
+    """Report Spoonacular quota, token bucket level, queue depths and shed calls."""
+    return json.dumps(spoonacular_quota.stats(), indent=2)
+
+@mcp.tool()
+def get_server_health() -> str:
+    """Report AWS readiness and setup timings, SMS pacing, the page server, template render timings
+    and, when serving over HTTP, this worker's sessions and tool call limit, and any tool call trace."""
+    return json.dumps(
+        {'aws': aws.status(), 'sms': sms_limiter.stats(), 'page_server': page_server.stats(),
+         'templates': template_renderer.stats(), 'http_worker': http_worker.stats() if http_worker else None,
+         'trace': trace_recorder.stats() if trace_recorder else None},
+        indent=2,
+    )
+
+def collect_cache_metrics() -> list:
+    """Report the hit rates of the caches and local indexes, and the current queue depths."""
+    cache = recipe_cache.stats()
+    templates = template_renderer.stats()
+    coalescing = inflight_requests.stats()
+    pages = page_server.stats()
+    samples = [
+        *cache_samples('spoonacular_responses', cache['hits'] + cache['stale_hits'], cache['misses']),
+        *cache_samples('nutrient_index', recipe_index.hits, recipe_index.misses),
+        *cache_samples('ingredient_index', ingredient_index.hits, ingredient_index.misses),
+        *cache_samples('template_bytecode', templates['bytecode_cache_hits'], templates['bytecode_cache_misses']),
+        *cache_samples('request_coalescing', coalescing['coalesced'], coalescing['calls'] - coalescing['coalesced']),
+        *cache_samples('page_not_modified', pages['not_modified'], pages['requests'] - pages['not_modified']),
+    ]
+    for service, count in aws.status()['waiting'].items():
+        samples.append(('aws_calls_waiting', 'gauge', "AWS calls waiting for a concurrency slot.", {'service': service}, count))
+    if http_worker is not None:
+        samples.append(('mcp_tool_calls_waiting', 'gauge', "Tool calls waiting for a slot in this worker.", {},
+                        http_worker.tools_waiting))
+    return samples
+
+metrics.add_collector(collect_cache_metrics)
+
+@mcp.resource("metrics://server", mime_type="text/plain")
+def server_metrics() -> str:
+    """Tool latencies, error counts, upstream timings and cache hit rates in the Prometheus text format."""
+    return metrics.render()
 
 @mcp.prompt()
 def photo_booth_prompt() -> str:
@@ -694,37 +1095,68 @@ def photo_booth_prompt() -> str:
     Instructions:
     1. First, open OBS by running the command: open -a "OBS"
     2. Wait for the user to take a photo or video
-    3. After the user indicates they're done, find the newest file in the Movies directory using:
-       ls -t "/Users/andrewdoyon/Movies" | head -n 1
-    4. Upload the newest file to the S3 bucket 'vlog-journal' using the full path
-    5. Confirm the upload was successful
-    6. Close OBS by running the command: killall OBS
+    3. After the user indicates they're done, sync the Movies directory "/Users/andrewdoyon/Movies"
+       to the S3 bucket 'vlog-journal' with sync_directory_to_s3. Files that were already
+       uploaded are skipped, so this uploads the new recording and any earlier ones that were missed.
+    4. Confirm which files were uploaded
+    5. Close OBS by running the command: killall OBS
     
     Start by saying: "I'll help you take a photo or video using OBS. Let me open the app for you..."
     """
 
 @mcp.tool()
-async def upload_to_s3(file_path: str, bucket_name: str = "vlog-journal") -> str:
+async def upload_to_s3(
+    file_path: str,
+    bucket_name: str = "vlog-journal",
+    large_file: Optional[bool] = None,
+    part_size_mb: int = 64,
+    concurrency: int = 8,
+    ctx: Context = None,
+) -> str:
     """Upload a file to an S3 bucket.
     
     Args:
         file_path: Local path to the file to upload
         bucket_name: Name of the S3 bucket (default: vlog-journal)
+        large_file: Use a parallel, resumable multipart upload with progress updates
+            (default: automatically for files over 100 MB). An interrupted upload of the
+            same file resumes from the last completed part.
+        part_size_mb: Size of each part in MB for large-file uploads (minimum 5)
+        concurrency: Number of parts to upload at the same time for large-file uploads
     """
     try:
-        # Initialize S3 client using the same session as DynamoDB
-        session = boto3.Session(profile_name='default')
-        s3 = session.client('s3')
-        
         # Get the filename from the path
         file_name = os.path.basename(file_path)
         
-        # Upload the file
-        s3.upload_file(file_path, bucket_name, file_name)
-        
         # Generate the S3 URL
         s3_url = f"s3://{bucket_name}/{file_name}"
         
+        if large_file is None:
+            large_file = os.path.getsize(file_path) > s3_uploads.LARGE_FILE_THRESHOLD
+        
+        if large_file:
+            async def report(uploaded: int, total: int) -> None:
+                if ctx is not None:
+                    await ctx.report_progress(uploaded, total)
+            
+            result = await s3_uploads.upload_large_file(
+                aws,
+                file_path,
+                bucket_name,
+                file_name,
+                part_size=part_size_mb * s3_uploads.MB,
+                concurrency=concurrency,
+                on_progress=report,
+            )
+            resumed = f", resumed {result['resumed_parts']} parts" if result['resumed_parts'] else ""
+            return (
+                f"File uploaded successfully to {s3_url} "
+                f"({result['parts']} parts, {result['throughput_mb_s']} MB/s{resumed})"
+            )
+        
+        # Upload the file with the shared S3 client, off the event loop
+        await aws.run('s3', lambda: aws.client('s3').upload_file(file_path, bucket_name, file_name))
+        
         return f"File uploaded successfully to {s3_url}"
         
     except ClientError as e:
@@ -735,8 +1167,81 @@ async def upload_to_s3(file_path: str, bucket_name: str = "vlog-journal") -> str
         logger.error(f"Unexpected error uploading to S3: {str(e)}")
         return f"Error uploading file: {str(e)}"
 
+@mcp.tool()
+async def sync_directory_to_s3(
+    directory: str,
+    bucket_name: str = "vlog-journal",
+    prefix: str = "",
+    concurrency: int = 4,
+    refresh: bool = False,
+    dry_run: bool = False,
+    ctx: Context = None,
+) -> str:
+    """Upload every new or changed file in a local directory to an S3 bucket.
+    
+    Unchanged files are skipped using a cached manifest of what was already
+    uploaded, so re-syncing a directory only sends the files that are new.
+    
+    Args:
+        directory: Local directory to sync (hidden files are skipped)
+        bucket_name: Name of the S3 bucket (default: vlog-journal)
+        prefix: Key prefix to upload under, e.g. "2025/05" (default: bucket root)
+        concurrency: Number of files to upload at the same time
+        refresh: Re-read the bucket listing instead of trusting the cached manifest
+        dry_run: Only report which files would be uploaded
+    """
+    try:
+        if not os.path.isdir(directory):
+            return f"Error syncing directory: {directory} is not a directory"
+        
+        async def report(done: int, total: int) -> None:
+            if ctx is not None:
+                await ctx.report_progress(done, total)
+        
+        result = await s3_uploads.sync_directory(
+            aws,
+            directory,
+            bucket_name,
+            prefix=prefix,
+            concurrency=concurrency,
+            refresh=refresh,
+            dry_run=dry_run,
+            on_progress=report,
+        )
+        return json.dumps(result, indent=2)
+        
+    except ClientError as e:
+        error_message = e.response['Error']['Message']
+        logger.error(f"AWS S3 error: {error_message}")
+        return f"Error syncing directory: {error_message}"
+    except Exception as e:
+        logger.error(f"Unexpected error syncing to S3: {str(e)}")
+        return f"Error syncing directory: {str(e)}"
+
+def create_http_app():
+    """Build the HTTP app of one worker process; uvicorn calls this in every worker."""
+    global http_worker
+    app, http_worker = http_transport.create_app(mcp, shared_resources, metrics)
+    if http_transport.WORKERS > 1:
+        # Every worker uses the same accounts, so each one gets its share of the rate limits
+        spoonacular_quota.split(http_transport.WORKERS)
+        sms_limiter.split(http_transport.WORKERS)
+        # Pages live in one worker's memory, so each worker serves its own on a free port
+        page_server.ephemeral = True
+    return app
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Weather MCP server")
+    parser.add_argument('--transport', choices=['stdio', 'sse'], default=os.environ.get('MCP_TRANSPORT', 'stdio'))
+    parser.add_argument('--host', default=mcp.settings.host, help="Address to listen on over HTTP")
+    parser.add_argument('--port', type=int, default=PORT, help="Port to listen on over HTTP")
+    parser.add_argument('--workers', type=int, default=http_transport.WORKERS, help="Worker processes over HTTP")
+    args = parser.parse_args()
+    
     # Initialize and run the server
-    logger.info(f"Starting weather server on port {PORT}")
+    logger.info(f"Starting weather server on port {args.port}")
     logger.info(f"Liggubg ssdft")
-    mcp.run(transport='stdio')
+    if args.transport == 'sse':
+        http_transport.run('weather:create_http_app', args.host, args.port, args.workers)
+    else:
+        mcp.run(transport='stdio')